@@ -7,7 +7,8 @@ import tempfile
 from config.database import get_db
 from models.models import User
 from utils.auth import get_current_active_user
-from services.queue_service import get_queue_length, get_job_status, enqueue_scan
+from services.queue_service import get_queue_length, get_dead_letter_length, get_job_status, enqueue_scan
+from services.scan_outbox import outbox_stats
 from services.imagekit_qr_service import ImageKitQRService
 from services.scan_helpers import SCAN_COST, get_supabase_admin
 
@@ -15,11 +16,15 @@ router = APIRouter(prefix="/api/batch-scans", tags=["Batch Scans"])
 
 @router.get("/queue-length")
 async def get_batch_queue_info(current_user: User = Depends(get_current_active_user)):
-    """Get current Redis queue depth."""
+    """Get current Redis queue depth and the Supabase outbox lag."""
     try:
-        return {"queue_length": get_queue_length()}
+        return {
+            "queue_length": get_queue_length(),
+            "dead_letter_length": get_dead_letter_length(),
+            "outbox": outbox_stats(),
+        }
     except Exception as e:
-        return {"queue_length": 0, "error": str(e)}
+        return {"queue_length": 0, "dead_letter_length": 0, "error": str(e)}
 
 
 @router.get("/status/{job_id}")
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta, date as dt_date
 from typing import Optional
 from utils.auth import get_current_user, supabase, supabase_admin
 from services.scan_helpers import get_supabase_admin as _get_sa
+from services.credit_service import deduct_credits, MAX_CREDITS
 
 router = APIRouter()
 
@@ -123,21 +124,20 @@ async def deduct_credit(user = Depends(get_current_user)):
     Deduct 1 credit from user's balance
     """
     try:
-        if not supabase:
-            raise HTTPException(status_code=503, detail="Supabase client not configured")
+        sa = _get_sa()
+        if not sa:
+            raise HTTPException(status_code=503, detail="Supabase admin not configured")
 
         user_id = str(user.id)
         
-        # Get current credits
-        user_data = supabase.table("users").select("credits").eq("id", user_id).execute()
-        current_credits = user_data.data[0].get("credits", 10) if user_data.data else 10
-        
-        if current_credits <= 0:
-            raise HTTPException(status_code=403, detail="Insufficient credits")
-        
-        # Deduct 1 credit
-        new_credits = current_credits - 1
-        supabase.table("users").update({"credits": new_credits}).eq("id", user_id).execute()
+        # Atomic check-and-deduct (single round trip, no lost updates)
+        new_credits = deduct_credits(sa, user_id, 1, table="users")
+        if new_credits is None:
+            row = sa.table("users").select("id").eq("id", user_id).limit(1).execute()
+            if row.data:
+                raise HTTPException(status_code=403, detail="Insufficient credits")
+            # No users row: default balance of MAX_CREDITS, as before
+            new_credits = MAX_CREDITS - 1
         
         return {
             "success": True,
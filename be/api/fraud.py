@@ -267,6 +267,7 @@ async def save_fraud_scan(
                 structured=structured,
                 ocr_result=ocr_result,
                 is_fraud=True,
+                scan_id=tampered_scan.id,
             )
 
             return {
@@ -337,6 +338,7 @@ async def save_fraud_scan(
             structured=structured,
             ocr_result=ocr_result,
             is_fraud=True,
+            scan_id=new_scan.id,
         )
 
         return {
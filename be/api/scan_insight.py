@@ -3,7 +3,6 @@ Scan Insight API — OtaruBot AI analysis for DGTNZ & Fraud scan results.
 Provides contextual business intelligence and fraud scoring explanations.
 """
 
-import os
 import re
 import time
 import hashlib
@@ -15,21 +14,16 @@ from utils.auth import get_current_active_user
 
 router = APIRouter()
 
-# ── Sumopod / OpenAI client ────────────────────────────────────────────────
+# ── LLM providers (Gemini proxy + Groq fallback, ranked by the router) ─────
 
-from openai import AsyncOpenAI
+from services.llm_router import llm_router, llm_candidates
 
-_client = None
 
-def _get_ai_client():
-    global _client
-    if _client is None:
-        api_key = os.getenv("GEMINI_API_KEY")
-        base_url = os.getenv("GEMINI_BASE_URL", "https://ai.sumopod.com/v1")
-        if not api_key:
-            raise ValueError("No AI API key configured")
-        _client = AsyncOpenAI(base_url=base_url if base_url else None, api_key=api_key)
-    return _client
+def _get_ai_candidates() -> list:
+    candidates = llm_candidates()
+    if not candidates:
+        raise ValueError("No AI API key configured")
+    return candidates
 
 # ── Request model ──────────────────────────────────────────────────────────
 
@@ -114,7 +108,7 @@ async def analyze_scan(
     Send scan data to OtaruBot AI for deep analysis.
     Returns markdown-formatted insights.
     """
-    client = _get_ai_client()
+    candidates = _get_ai_candidates()
 
     cache_payload = {
         "scan_type": req.scan_type,
@@ -181,8 +175,9 @@ async def analyze_scan(
     system_prompt = FRAUD_SYSTEM_PROMPT if req.scan_type == "fraud" else DGTNZ_SYSTEM_PROMPT
 
     try:
-        completion = await client.chat.completions.create(
-            model=os.getenv("GEMINI_MODEL", "gemini/gemini-2.5-flash"),
+        _, completion = await llm_router.complete(
+            candidates,
+            label="scan insight",
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_message},
@@ -13,23 +13,27 @@ from datetime import datetime, timedelta
 
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     File,
     Form,
     HTTPException,
+    Query,
     Request,
+    Response,
     UploadFile,
 )
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.orm import Session, load_only
+from typing import List, Optional
 
 from config.database import get_db
 from models.models import User, Scan, CreditHistory
-from schemas.schemas import ScanResponse, ScanUpdate
+from schemas.schemas import ScanListItem, ScanResponse, ScanUpdate
 from utils.auth import get_current_active_user
 from utils.file_handler import FileHandler
+from utils.pagination import estimated_count, keyset_page
 from services.ocr_service import OCRService
+from services.queue_service import get_job_status, scan_ocr_job_id
+from services.scan_jobs import submit_upload_scan
 from services.scan_helpers import (
     SCAN_COST,
     check_and_deduct_credits,
@@ -41,37 +45,15 @@ from services.scan_helpers import (
 router = APIRouter()
 
 
-# ── Background helper ────────────────────────────────────────────────────────
-
-async def process_scan_background(scan_id: int, file_path: str, db: Session):
-    """Background task to process OCR on an uploaded file."""
-    try:
-        result = await OCRService.process_image(file_path, use_ai_enhancement=True)
-        scan = db.query(Scan).filter(Scan.id == scan_id).first()
-        if scan:
-            setattr(scan, "extracted_text", result["enhanced_text"])
-            setattr(scan, "confidence_score", result["confidence_score"])
-            setattr(scan, "processing_time", result["processing_time"])
-            setattr(scan, "status", "completed")
-            db.commit()
-    except Exception as e:
-        scan = db.query(Scan).filter(Scan.id == scan_id).first()
-        if scan:
-            setattr(scan, "status", "failed")
-            setattr(scan, "error_message", str(e))
-            db.commit()
-
-
 # ── POST /upload ──────────────────────────────────────────────────────────────
 
 @router.post("/upload", response_model=ScanResponse, status_code=201)
 async def upload_scan(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ):
-    """Upload and process document scan (background OCR)."""
+    """Upload a document scan; OCR runs on the scan worker (poll /{scan_id}/status)."""
     # 1. Check and deduct credits (will sync with Supabase profiles and deduct SCAN_COST)
     await check_and_deduct_credits(user=current_user, db=db, action="scan")
 
@@ -103,50 +85,113 @@ async def upload_scan(
         last_log.reference_id = new_scan.id
         db.commit()
 
-    background_tasks.add_task(process_scan_background, new_scan.id, file_path, db)
+    submit_upload_scan(str(current_user.id), new_scan.id, file_path)
     return new_scan
 
 
-# ── GET / ─────────────────────────────────────────────────────────────────────
+# ── Listing helpers ──────────────────────────────────────────────────────────
 
-@router.get("/", response_model=List[ScanResponse])
-async def get_user_scans(
-    skip: int = 0,
-    limit: int = 50,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
-):
-    """Get all scans for current user."""
-    scans = (
+# Fields of GET / (ScanListItem). extracted_text is the large one and is only
+# returned when asked for with ?fields=.
+LIST_FIELDS = (
+    "id", "user_id", "original_filename", "extracted_text", "confidence_score",
+    "processing_time", "status", "created_at", "imagekit_url", "signature_url",
+    "recipient_name", "file_path", "is_fraud_scan", "fraud_fields",
+)
+HISTORY_FIELDS = (
+    "id", "original_filename", "imagekit_url", "extracted_text", "confidence_score",
+    "status", "created_at", "recipient_name", "signature_url",
+)
+FRAUD_COLUMNS = (
+    "is_fraud_scan", "fraud_nominal_total", "fraud_nama_klien",
+    "fraud_nomor_surat_jalan", "fraud_tanggal_jatuh_tempo", "fraud_confidence",
+)
+COUNT_MODES = ("none", "estimated", "exact")
+
+
+def _select_fields(fields: Optional[str], allowed: tuple) -> List[str]:
+    """Requested fields in `allowed` order; id and created_at (the cursor) are always included."""
+    if not fields:
+        return [f for f in allowed if f != "extracted_text"]
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested |= {"id", "created_at"}
+    return [f for f in allowed if f in requested]
+
+
+def _scan_query(db: Session, user_id, fields: List[str]):
+    """Scans of one user, loading only the columns `fields` needs."""
+    columns = set()
+    for f in fields:
+        columns.update(FRAUD_COLUMNS if f == "fraud_fields" else (f,))
+    return (
         db.query(Scan)
-        .filter(Scan.user_id == current_user.id)
-        .order_by(Scan.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+        .options(load_only(*(getattr(Scan, c) for c in sorted(columns))))
+        .filter(Scan.user_id == user_id)
     )
 
-    results = []
-    for scan in scans:
-        d = {
-            k: str(v) if k == "user_id" else v
-            for k, v in scan.__dict__.items()
-            if not k.startswith("_")
-        }
-        d["is_fraud_scan"] = bool(scan.is_fraud_scan) if scan.is_fraud_scan is not None else False
-        if d["is_fraud_scan"]:
-            d["fraud_fields"] = {
+
+def _count(db: Session, user_id, mode: str) -> Optional[int]:
+    if mode not in COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"count must be one of: {', '.join(COUNT_MODES)}")
+    if mode == "none":
+        return None
+    query = db.query(Scan.id).filter(Scan.user_id == user_id)
+    return estimated_count(db, query) if mode == "estimated" else query.count()
+
+
+def _list_item(scan: Scan, fields: List[str]) -> dict:
+    d = {}
+    for f in fields:
+        if f == "user_id":
+            d[f] = str(scan.user_id)
+        elif f == "is_fraud_scan":
+            d[f] = bool(scan.is_fraud_scan) if scan.is_fraud_scan is not None else False
+        elif f == "fraud_fields":
+            d[f] = {
                 "nominal_total": scan.fraud_nominal_total,
                 "nama_klien": scan.fraud_nama_klien,
                 "nomor_surat_jalan": scan.fraud_nomor_surat_jalan,
                 "tanggal_jatuh_tempo": scan.fraud_tanggal_jatuh_tempo,
                 "confidence": scan.fraud_confidence or "low",
-            }
+            } if scan.is_fraud_scan else None
         else:
-            d["fraud_fields"] = None
-        results.append(d)
+            d[f] = getattr(scan, f)
+    return d
+
 
-    return results
+# ── GET / ─────────────────────────────────────────────────────────────────────
+
+@router.get("/", response_model=List[ScanListItem], response_model_exclude_unset=True)
+async def get_user_scans(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    count: str = "none",
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Scans of the current user, newest first.
+    ?cursor= continues after the previous page (X-Next-Cursor header; absent
+    on the last page). ?fields=a,b,... picks the fields; extracted_text is
+    left out unless requested. ?count=estimated|exact sets X-Total-Count.
+    """
+    selected = _select_fields(fields, LIST_FIELDS)
+    scans, next_cursor = keyset_page(
+        _scan_query(db, current_user.id, selected), Scan.created_at, Scan.id,
+        limit, cursor=cursor, skip=skip,
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    total = _count(db, current_user.id, count)
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+    return [_list_item(scan, selected) for scan in scans]
 
 
 # ── GET /history ──────────────────────────────────────────────────────────────
@@ -154,35 +199,32 @@ async def get_user_scans(
 @router.get("/history")
 async def get_scan_history(
     skip: int = 0,
-    limit: int = 50,
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    count: str = "exact",
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ):
-    """Get scan history with metadata."""
-    scans = (
-        db.query(Scan)
-        .filter(Scan.user_id == current_user.id)
-        .order_by(Scan.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    """
+    Scan history with metadata, newest first. Same ?cursor= / ?fields=
+    parameters as GET /; "next_cursor" is null on the last page.
+    ?count=estimated|none makes "total" cheap or skips it.
+    """
+    selected = _select_fields(fields, HISTORY_FIELDS)
+    scans, next_cursor = keyset_page(
+        _scan_query(db, current_user.id, selected), Scan.created_at, Scan.id,
+        limit, cursor=cursor, skip=skip,
     )
+    items = []
+    for s in scans:
+        d = {f: getattr(s, f) for f in selected}
+        d["created_at"] = s.created_at.isoformat() if s.created_at else None
+        items.append(d)
     return {
-        "total": db.query(Scan).filter(Scan.user_id == current_user.id).count(),
-        "scans": [
-            {
-                "id": s.id,
-                "original_filename": s.original_filename,
-                "imagekit_url": s.imagekit_url,
-                "extracted_text": s.extracted_text,
-                "confidence_score": s.confidence_score,
-                "status": s.status,
-                "created_at": s.created_at.isoformat() if s.created_at else None,
-                "recipient_name": s.recipient_name,
-                "signature_url": s.signature_url,
-            }
-            for s in scans
-        ],
+        "total": _count(db, current_user.id, count),
+        "next_cursor": next_cursor,
+        "scans": items,
     }
 
 
@@ -208,6 +250,38 @@ async def get_scan(
     }
 
 
+@router.get("/{scan_id:int}/status")
+async def get_scan_status(
+    scan_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """Processing status of an uploaded scan, with its OCR job while it is queued or running."""
+    scan = db.query(Scan).filter(Scan.id == scan_id, Scan.user_id == current_user.id).first()
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+
+    job = None
+    if scan.status == "processing":
+        try:
+            job = get_job_status(scan_ocr_job_id(scan_id))
+        except Exception:
+            job = None
+    return {
+        "scan_id": scan.id,
+        "status": scan.status,
+        "error_message": scan.error_message,
+        "confidence_score": scan.confidence_score,
+        "processing_time": scan.processing_time,
+        "job": {
+            "job_id": job["job_id"],
+            "status": job.get("status"),
+            "attempts": job.get("attempts", 0),
+            "error": job.get("error"),
+        } if job else None,
+    }
+
+
 @router.delete("/{scan_id:int}")
 async def delete_scan(
     scan_id: int,
@@ -0,0 +1 @@
+"""Offline benchmarks for the scan pipeline. See benchmarks/run.py."""
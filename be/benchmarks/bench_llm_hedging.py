@@ -0,0 +1,69 @@
+"""
+Offline check of the hedged LLM policy in services.ocr_service.
+
+Spins up local fake OpenAI-compatible servers with different latencies and
+compares hedged vs strictly sequential provider fallback.
+
+Run with: python -m benchmarks.bench_llm_hedging
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from openai import AsyncOpenAI
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from services.ocr_service import _hedged_completion, _parse_json_object
+
+HEDGE_DELAY = 0.5
+
+SCENARIOS = [
+    # (label, [(latency, status), ...] in priority order)
+    ("primary fast", [(0.2, 200), (0.2, 200)]),
+    ("primary slow", [(4.0, 200), (0.3, 200)]),
+    ("primary down", [(0.1, 500), (0.3, 200)]),
+    ("two slow", [(4.0, 200), (3.0, 200), (0.3, 200)]),
+]
+
+
+def _client(base_url: str) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key="fake", base_url=base_url, max_retries=0,
+        http_client=httpx.AsyncClient(timeout=30.0),
+    )
+
+
+async def _run(candidates, hedge_delay: float):
+    start = time.perf_counter()
+    winner = await _hedged_completion(
+        candidates,
+        [{"role": "user", "content": "OCR TEXT:\nTOTAL Rp 150.000"}],
+        parse=_parse_json_object,
+        temperature=0.1,
+        json_mode=True,
+        label="bench",
+        hedge_delay=hedge_delay,
+    )
+    return (winner[0] if winner else None), time.perf_counter() - start
+
+
+async def main():
+    print(f"{'scenario':<14} {'sequential':>12} {'hedged':>12}  winner")
+    for label, specs in SCENARIOS:
+        servers = [FakeOpenAIServer(latency=lat, status=st) for lat, st in specs]
+        candidates = [(f"P{i+1}", _client(srv.start()), "fake-model") for i, srv in enumerate(servers)]
+        try:
+            _, t_seq = await _run(candidates, hedge_delay=0)
+            name, t_hedge = await _run(candidates, hedge_delay=HEDGE_DELAY)
+            print(f"{label:<14} {t_seq:>10.2f} s {t_hedge:>10.2f} s  {name}")
+        finally:
+            for srv in servers:
+                srv.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
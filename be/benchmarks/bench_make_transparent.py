@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: stamp_service._make_transparent (NumPy) vs the previous
+pure-Python per-pixel loop, on synthetic 3000x2000 signature-like images.
+
+Run with: python -m benchmarks.bench_make_transparent
+Fails loudly if the two implementations ever disagree byte-for-byte.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from services.stamp_service import _make_transparent
+
+WIDTH, HEIGHT = 3000, 2000
+ROUNDS = 3
+
+
+def _make_transparent_legacy(img: Image.Image, threshold: int = 220, softness: int = 30) -> Image.Image:
+    """The original getdata()-based implementation, kept as the reference."""
+    img = img.convert("RGBA")
+    r, g, b, a = img.split()
+    new_a = []
+    low = threshold - softness
+    for rv, gv, bv, av in zip(r.getdata(), g.getdata(), b.getdata(), a.getdata()):
+        lum = int(0.299 * rv + 0.587 * gv + 0.114 * bv)
+        if lum >= threshold:
+            new_a.append(0)
+        elif lum <= low:
+            new_a.append(av)
+        else:
+            new_a.append(int(av * (threshold - lum) / max(softness, 1)))
+    a2 = a.copy()
+    a2.putdata(new_a)
+    return Image.merge("RGBA", (r.copy(), g.copy(), b.copy(), a2))
+
+
+def _synthetic_images() -> dict:
+    rng = np.random.default_rng(42)
+
+    # Paper-white background with faint noise and dark "ink" strokes
+    sig = Image.fromarray(
+        (235 + rng.integers(-20, 20, (HEIGHT, WIDTH, 3))).clip(0, 255).astype(np.uint8), "RGB"
+    )
+    draw = ImageDraw.Draw(sig)
+    for _ in range(60):
+        x0, y0 = rng.integers(0, WIDTH), rng.integers(0, HEIGHT)
+        x1, y1 = rng.integers(0, WIDTH), rng.integers(0, HEIGHT)
+        draw.line([(x0, y0), (x1, y1)], fill=(20, 20, 60), width=int(rng.integers(2, 12)))
+
+    # Full 0-255 range with random alpha, exercises every branch
+    noise = Image.fromarray(rng.integers(0, 256, (HEIGHT, WIDTH, 4), dtype=np.uint8), "RGBA")
+
+    return {"signature": sig, "noise_rgba": noise}
+
+
+def _best_of(fn, img, **kwargs) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn(img, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"_make_transparent on {WIDTH}x{HEIGHT} ({ROUNDS} rounds, best time)")
+    for name, img in _synthetic_images().items():
+        for kwargs in ({}, {"threshold": 245, "softness": 10}, {"softness": 0}):
+            new = _make_transparent(img, **kwargs).tobytes()
+            old = _make_transparent_legacy(img, **kwargs).tobytes()
+            assert new == old, f"output mismatch for {name} {kwargs}"
+
+        t_old = _best_of(_make_transparent_legacy, img)
+        t_new = _best_of(_make_transparent, img)
+        print(f"  {name:<12} legacy {t_old * 1000:8.1f} ms   numpy {t_new * 1000:7.1f} ms   x{t_old / t_new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
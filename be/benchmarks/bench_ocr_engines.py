@@ -0,0 +1,61 @@
+"""
+Per-document Tesseract latency for each OCR engine in services.ocr_pool
+(pytesseract subprocess per call vs CLI over stdin vs persistent tesserocr).
+
+Runs in-process and sequentially on generated receipts, so the numbers are
+per-document engine cost without pool or queue overhead. Also reports a
+text similarity score against the ground truth so a faster engine cannot
+silently lose accuracy.
+
+Run with: python -m benchmarks.bench_ocr_engines [-n 100] [--engines cli,tesserocr]
+"""
+import argparse
+import difflib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import generate_receipts
+from benchmarks.run import summarize
+from services import ocr_pool
+
+
+def _similarity(ocr_text: str, truth: str) -> float:
+    return difflib.SequenceMatcher(None, ocr_text.split(), truth.split()).ratio()
+
+
+def bench_engine(engine: str, receipts: list) -> dict:
+    if engine == "tesserocr" and not ocr_pool._tesserocr_api():
+        return {"skipped": "tesserocr not installed"}
+
+    ocr_pool.tesseract_bytes(receipts[0]["image"], 0, engine)  # warm-up / model load
+    samples, scores = [], []
+    for receipt in receipts:
+        start = time.perf_counter()
+        text, _ = ocr_pool.tesseract_bytes(receipt["image"], 0, engine)
+        samples.append(time.perf_counter() - start)
+        scores.append(_similarity(text, receipt["text"]))
+    return summarize(samples, similarity=round(sum(scores) / len(scores), 4))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR engine latency benchmark")
+    parser.add_argument("-n", type=int, default=100, help="generated receipts")
+    parser.add_argument("--engines", default=",".join(ocr_pool.ENGINES))
+    args = parser.parse_args()
+
+    receipts = generate_receipts(args.n)
+    print(f"{'engine':<12} {'mean':>9} {'median':>9} {'p95':>9} {'docs/s':>8} {'similarity':>11}")
+    for engine in [e.strip() for e in args.engines.split(",") if e.strip()]:
+        stats = bench_engine(engine, receipts)
+        if "skipped" in stats:
+            print(f"{engine:<12} skipped: {stats['skipped']}")
+            continue
+        print(f"{engine:<12} {stats['mean_ms']:>7.0f}ms {stats['median_ms']:>7.0f}ms {stats['p95_ms']:>7.0f}ms "
+              f"{stats['per_second']:>8.2f} {stats['similarity']:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Paper crop + deskew (services.ocr_preprocess) on rotated "phone photo"
+receipts: generated receipts rotated by up to --max-angle degrees, pasted on
+a larger noisy table background and scaled up to phone-camera size.
+
+Always reports the preprocessing cost and how well the skew angle and paper
+box are recovered. When the tesseract binary is available it also OCRs every
+photo with preprocessing off and on (ocr_pool.tesseract_bytes, in-process)
+and reports OCR time, text similarity and field accuracy of the regex
+extraction (document number, date, total, payment method).
+
+Run with: python -m benchmarks.bench_ocr_preprocess [-n 40] [--max-angle 12] [--engine cli]
+"""
+import argparse
+import difflib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fakes
+
+fakes.configure_env()
+
+import numpy as np
+import pytesseract
+from PIL import Image, ImageFilter
+
+from benchmarks.corpus import generate_receipts, render_lines
+from benchmarks.run import summarize
+from services import ocr_pool
+from services.ocr_preprocess import analyze, crop_and_deskew
+from services.ocr_service import _regex_fallback_extraction
+
+PHOTO_DIM = 3000
+FIELDS = ("nomor_dokumen", "tanggal_terbit", "nominal_total", "metode_bayar")
+
+
+def _photo(receipt: dict, rng: random.Random, max_angle: float) -> dict:
+    paper = render_lines(receipt["text"].splitlines()).convert("L")
+    angle = rng.uniform(-max_angle, max_angle)
+    rotated = paper.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=0)
+    mask = Image.new("L", paper.size, 255).rotate(angle, expand=True, fillcolor=0)
+
+    w, h = int(rotated.width * rng.uniform(1.4, 2.2)), int(rotated.height * rng.uniform(1.2, 1.8))
+    noise = np.random.default_rng(rng.randint(0, 2**31)).integers(-30, 30, (h, w))
+    shade = np.linspace(rng.randint(40, 90), rng.randint(60, 120), w)[None, :]
+    table = Image.fromarray((shade + noise).clip(0, 255).astype(np.uint8), "L").filter(ImageFilter.BoxBlur(1))
+    x, y = rng.randint(0, w - rotated.width), rng.randint(0, h - rotated.height)
+    table.paste(rotated, (x, y), mask)
+
+    scale = PHOTO_DIM / max(table.size)
+    photo = table.resize((int(table.width * scale), int(table.height * scale)), Image.BICUBIC)
+    buf = io.BytesIO()
+    photo.save(buf, format="JPEG", quality=90)
+    paper_share = paper.width * paper.height / (table.width * table.height)
+    return {"image": buf.getvalue(), "angle": angle, "paper_share": paper_share}
+
+
+def _similarity(ocr_text: str, truth: str) -> float:
+    return difflib.SequenceMatcher(None, ocr_text.split(), truth.split()).ratio()
+
+
+def _field_accuracy(ocr_text: str, truth: dict) -> float:
+    fields = _regex_fallback_extraction(ocr_text)
+    return sum(1 for k in FIELDS if fields.get(k) == truth.get(k)) / len(FIELDS)
+
+
+def bench_preprocess(photos: list) -> dict:
+    """crop_and_deskew vs the plain downscale _prepare did before."""
+    samples, baseline, angle_err, kept = [], [], [], []
+    for photo in photos:
+        img = Image.open(io.BytesIO(photo["image"])).convert("L")
+        start = time.perf_counter()
+        crop_and_deskew(img, ocr_pool.MAX_DIM)
+        samples.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        ratio = ocr_pool.MAX_DIM / max(img.size)
+        img.resize((int(img.width * ratio), int(img.height * ratio)), Image.LANCZOS)
+        baseline.append(time.perf_counter() - start)
+
+        angle, bounds, _ = analyze(img)
+        angle_err.append(abs(angle + photo["angle"]))
+        kept.append((bounds[2] - bounds[0]) * (bounds[3] - bounds[1]) if bounds else 1.0)
+    return summarize(
+        samples,
+        resize_only_ms=round(float(np.mean(baseline)) * 1000, 1),
+        angle_err_mean=round(float(np.mean(angle_err)), 2),
+        angle_err_max=round(float(np.max(angle_err)), 2),
+        frame_kept=round(float(np.mean(kept)), 3),
+    )
+
+
+def bench_ocr(photos: list, receipts: list, engine: str, preprocess: bool) -> dict:
+    ocr_pool._preprocess = preprocess
+    samples, sims, accs = [], [], []
+    for photo, receipt in zip(photos, receipts):
+        start = time.perf_counter()
+        text, _ = ocr_pool.tesseract_bytes(photo["image"], 0, engine)
+        samples.append(time.perf_counter() - start)
+        sims.append(_similarity(text, receipt["text"]))
+        accs.append(_field_accuracy(text, receipt["truth"]))
+    return summarize(samples, similarity=round(float(np.mean(sims)), 3), field_acc=round(float(np.mean(accs)), 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR crop/deskew benchmark")
+    parser.add_argument("-n", type=int, default=40, help="generated receipts")
+    parser.add_argument("--max-angle", type=float, default=12.0)
+    parser.add_argument("--engine", default="cli", choices=ocr_pool.ENGINES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    receipts = generate_receipts(args.n, seed=args.seed, with_images=False)
+    photos = [_photo(r, rng, args.max_angle) for r in receipts]
+    share = np.mean([p["paper_share"] for p in photos])
+    print(f"{len(photos)} photos, skew up to ±{args.max_angle}°, paper ≈{share:.0%} of the frame\n")
+
+    stats = bench_preprocess(photos)
+    print(f"crop+deskew   mean {stats['mean_ms']:.0f}ms  p95 {stats['p95_ms']:.0f}ms  "
+          f"(resize only {stats['resize_only_ms']:.0f}ms)")
+    print(f"skew error    mean {stats['angle_err_mean']}°  max {stats['angle_err_max']}°")
+    print(f"paper bounds  {stats['frame_kept']:.0%} of the frame kept for OCR")
+
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception:
+        print("\ntesseract not installed: OCR time / field accuracy skipped")
+        return
+
+    print(f"\n{'preprocess':<12} {'mean':>9} {'p95':>9} {'similarity':>11} {'field acc':>10}")
+    for preprocess in (False, True):
+        stats = bench_ocr(photos, receipts, args.engine, preprocess)
+        print(f"{'on' if preprocess else 'off':<12} {stats['mean_ms']:>7.0f}ms {stats['p95_ms']:>7.0f}ms "
+              f"{stats['similarity']:>11.3f} {stats['field_acc']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Latency vs accuracy matrix for the OCR profiles in services.ocr_pool.
+
+Every generated receipt is OCR'd in-process with each full-page profile;
+rows are (profile, document kind) with mean/p95 latency, word similarity to
+the ground-truth text and regex field accuracy (document number, date,
+total, payment method). The "digits" profile is measured on the TOTAL line
+cropped out of each receipt: share of crops whose digits contain the total.
+
+Run with: python -m benchmarks.bench_ocr_profiles [-n 40] [--engine cli]
+          [--profiles default,receipt,document,id_card,digits] [--out matrix.json]
+"""
+import argparse
+import difflib
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fakes
+
+fakes.configure_env()
+
+import pytesseract
+
+from benchmarks.corpus import KINDS, generate_receipts, render_lines
+from benchmarks.run import summarize
+from services import ocr_pool
+from services.ocr_service import _regex_fallback_extraction
+
+FIELDS = ("nomor_dokumen", "tanggal_terbit", "nominal_total", "metode_bayar")
+FONT_SIZE = 26  # render_lines defaults
+LINE_H = int(FONT_SIZE * 1.5)
+
+
+def _similarity(ocr_text: str, truth: str) -> float:
+    return difflib.SequenceMatcher(None, ocr_text.split(), truth.split()).ratio()
+
+
+def _field_accuracy(ocr_text: str, truth: dict) -> float:
+    fields = _regex_fallback_extraction(ocr_text)
+    return sum(1 for k in FIELDS if fields.get(k) == truth.get(k)) / len(FIELDS)
+
+
+def _total_crop(receipt: dict):
+    lines = receipt["text"].splitlines()
+    index = next(i for i, line in enumerate(lines) if line.startswith("TOTAL"))
+    img = render_lines(lines, font_size=FONT_SIZE)
+    top = 40 + index * LINE_H
+    return img.crop((0, top - 8, img.width, top + LINE_H))
+
+
+def bench_page(profile: str, receipts: list, engine: str) -> dict:
+    rows = {}
+    for kind in KINDS:
+        samples, sims, accs = [], [], []
+        for receipt in (r for r in receipts if r["kind"] == kind):
+            start = time.perf_counter()
+            text, _ = ocr_pool.tesseract_bytes(receipt["image"], 0, engine, profile)
+            samples.append(time.perf_counter() - start)
+            sims.append(_similarity(text, receipt["text"]))
+            accs.append(_field_accuracy(text, receipt["truth"]))
+        if samples:
+            rows[kind] = summarize(
+                samples,
+                similarity=round(sum(sims) / len(sims), 3),
+                field_acc=round(sum(accs) / len(accs), 3),
+            )
+    return rows
+
+
+def bench_digits(profile: str, receipts: list, engine: str) -> dict:
+    samples, hits = [], 0
+    for receipt in receipts:
+        crop = _total_crop(receipt)
+        start = time.perf_counter()
+        text, _ = ocr_pool.tesseract_bytes(crop, 0, engine, profile)
+        samples.append(time.perf_counter() - start)
+        hits += str(receipt["truth"]["nominal_total"]) in re.sub(r"\D", "", text)
+    return {"total_line": summarize(samples, amount_acc=round(hits / len(receipts), 3))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR profile latency/accuracy matrix")
+    parser.add_argument("-n", type=int, default=40, help="generated receipts (spread over the kinds)")
+    parser.add_argument("--engine", default="cli", choices=ocr_pool.ENGINES)
+    parser.add_argument("--profiles", default=",".join(ocr_pool.PROFILES))
+    parser.add_argument("--out", help="write the matrix as JSON")
+    args = parser.parse_args()
+
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception:
+        print("tesseract not installed: nothing to measure")
+        return
+
+    receipts = generate_receipts(args.n)
+    profiles = [p.strip() for p in args.profiles.split(",") if p.strip() in ocr_pool.PROFILES]
+    matrix = {}
+    for profile in profiles:
+        bench = bench_digits if profile == "digits" else bench_page
+        bench(profile, receipts[:2], args.engine)  # warm-up / model load
+        matrix[profile] = bench(profile, receipts, args.engine)
+
+    print(f"{'profile':<10} {'input':<12} {'mean':>9} {'p95':>9} {'similarity':>11} {'field acc':>10}")
+    for profile, rows in matrix.items():
+        for kind, stats in rows.items():
+            acc = stats.get("field_acc", stats.get("amount_acc"))
+            sim = f"{stats['similarity']:>11.3f}" if "similarity" in stats else f"{'-':>11}"
+            print(f"{profile:<10} {kind:<12} {stats['mean_ms']:>7.0f}ms {stats['p95_ms']:>7.0f}ms {sim} {acc:>10.3f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"engine": args.engine, "n": args.n, "matrix": matrix}, f, indent=2)
+        print(f"\nwrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Micro-benchmark: ocr_service._regex_fallback_extraction (precompiled,
+keyword-anchored patterns) vs the previous re.search-per-call version.
+
+Inputs are generated receipts in three shapes (as OCR'd, flattened onto one
+line, upper-cased) plus hand-written edge cases. Outputs are checked against
+both the legacy implementation and the golden file
+benchmarks/fixtures/regex_fallback_golden.json; any difference fails loudly.
+
+Run with: python -m benchmarks.bench_regex_fallback [-n 300] [--update-golden]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fakes
+
+fakes.configure_env()
+
+from benchmarks.corpus import generate_receipts
+from services.ocr_service import _regex_fallback_extraction
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "regex_fallback_golden.json")
+GOLDEN_RECEIPTS = 40
+ROUNDS = 5
+
+_EDGE_CASES = [
+    "",
+    "FAKTUR PAJAK\nNo. Faktur: 010.000-25.00000123\nNPWP: 01.234.567.8-901.000\nPT. Sumber Makmur Abadi\n"
+    "Kepada Yth. CV Karya Mandiri\nTanggal: 05/03/2025\nDPP: Rp 1.000.000\nPPN 11%: Rp 110.000\n"
+    "Grand Total: Rp 1.110.000\nJatuh Tempo: 2025-04-05",
+    "SURAT JALAN\nNo. SJ: SJ/2025/0042\nDari: Gudang Cikarang\nPenerima: Toko Maju Jaya\nTgl 12-01-2025",
+    "KUITANSI\nNo. Kuitansi: KW-7781\nTelah diterima dari: Budi Santoso\nUang sebesar Rp 2.500.000\n"
+    "Untuk pembayaran sewa gudang",
+    "QRIS\nMerchant: Kopi Kenangan Senja\nNo. Transaksi: QR88213377\nTotal Rp 45.000\nGoPay\nRef: 99AB12CD",
+    "BANK MANDIRI EDC\nTID: 12345678\nMID: 000987654321\nDEBIT\nApproval Code: A1B2C3\nAMOUNT Rp 350.000",
+    "İSTANBUL DÖNER\nToplam Rp 75.000\nKasir: Ayşe\nTgl: 1.2.2025",
+    "ſtruk bon toko\nJumlah 12.500\ntunai",
+    "total: Rp 12\ntotal 99.500\nRp. 1,250,000",
+]
+
+
+def _normalize_date_legacy(raw_date: str) -> str:
+    """Normalize various date formats to YYYY-MM-DD."""
+    parts = re.split(r'[/\-\.]', raw_date.strip())
+    if len(parts) == 3:
+        try:
+            if len(parts[2]) == 4:  # DD/MM/YYYY
+                return f"{parts[2]}-{parts[1].zfill(2)}-{parts[0].zfill(2)}"
+            elif len(parts[0]) == 4:  # YYYY-MM-DD
+                return raw_date.strip()
+        except Exception:
+            pass
+    return raw_date.strip()
+
+
+def _regex_fallback_legacy(text: str) -> dict:
+    """The original re.search-per-pattern implementation, kept as the reference."""
+    result: dict = {
+        "doc_type": "unknown",
+        "nomor_dokumen": None,
+        "tanggal_terbit": None,
+        "tanggal_jatuh_tempo": None,
+        "nama_penjual": None,
+        "nama_klien": None,
+        "nominal_subtotal": None,
+        "nominal_ppn": None,
+        "nominal_total": None,
+        "metode_bayar": None,
+        "terminal_id": None,
+        "no_referensi": None,
+        "confidence": "low",
+    }
+
+    # ── Document type detection ──────────────────────────────────────────────
+    text_lower = text.lower()
+    if re.search(r'faktur\s*pajak|npwp|pkp', text_lower):
+        result["doc_type"] = "faktur_pajak"
+    elif re.search(r'surat\s*jalan|delivery\s*order|\bsj\b', text_lower):
+        result["doc_type"] = "surat_jalan"
+    elif re.search(r'tid\s*:|mid\s*:|terminal\s*id|approval\s*code|auth\s*code|debit|kredit\s*card', text_lower):
+        result["doc_type"] = "struk_edc"
+    elif re.search(r'qris|gopay|ovo\b|dana\b|shopeepay|linkaja|e-?wallet', text_lower):
+        result["doc_type"] = "qris"
+    elif re.search(r'kuitansi|telah\s*diterima\s*dari|yang\s*membayar', text_lower):
+        result["doc_type"] = "kuitansi"
+    elif re.search(r'invoice|faktur|bill\s*to|due\s*date|jatuh\s*tempo', text_lower):
+        result["doc_type"] = "invoice"
+    elif re.search(r'\bkasir\b|\bstruk\b|\bnota\b|\bbon\b|minimarket|indomaret|alfamart', text_lower):
+        result["doc_type"] = "nota_toko"
+    else:
+        result["doc_type"] = "bon_manual"
+
+    # ── Nominal total ────────────────────────────────────────────────────────
+    nominal_patterns = [
+        r'(?:grand\s*total|total\s*tagihan|total\s*bayar|total\s*pembayaran)[:\s]*Rp\.?\s*([\d.,]+)',
+        r'(?:total|jumlah|amount|tagihan)[:\s]*Rp\.?\s*([\d.,]+)',
+        r'(?:telah\s*diterima|sebesar\s*Rp)[:\s]*Rp?\.?\s*([\d.,]+)',
+        r'Rp\.?\s*([\d.,]+)',
+        r'(?:total|jumlah)[:\s]*([\d.,]+)',
+    ]
+    for pat in nominal_patterns:
+        match = re.search(pat, text, re.IGNORECASE)
+        if match:
+            raw = match.group(1).replace('.', '').replace(',', '').strip()
+            if raw.isdigit() and len(raw) >= 3:
+                result["nominal_total"] = int(raw)
+                break
+
+    # ── Subtotal + PPN ───────────────────────────────────────────────────────
+    sub_match = re.search(r'(?:subtotal|sub\s*total|dpp)[:\s]*Rp?\.?\s*([\d.,]+)', text, re.IGNORECASE)
+    if sub_match:
+        raw = sub_match.group(1).replace('.', '').replace(',', '')
+        if raw.isdigit():
+            result["nominal_subtotal"] = int(raw)
+
+    ppn_match = re.search(r'(?:ppn|vat|tax)[\s\d%]*[:\s]*Rp?\.?\s*([\d.,]+)', text, re.IGNORECASE)
+    if ppn_match:
+        raw = ppn_match.group(1).replace('.', '').replace(',', '')
+        if raw.isdigit():
+            result["nominal_ppn"] = int(raw)
+
+    # ── Document number ──────────────────────────────────────────────────────
+    doc_num_patterns = [
+        r'(?:no\.?\s*faktur|invoice\s*no\.?|no\.?\s*invoice)[:\s]*([A-Z0-9/\-\.]+)',
+        r'(?:no\.?\s*sj|nomor\s*sj|surat\s*jalan\s*no\.?)[:\s]*([A-Z0-9/\-\.]+)',
+        r'(?:no\.?\s*kuitansi|receipt\s*no\.?)[:\s]*([A-Z0-9/\-\.]+)',
+        r'(?:no\.?\s*transaksi|transaction\s*id)[:\s]*([A-Z0-9/\-\.]+)',
+        r'(?:no\.|nomor)[:\s]*([A-Z0-9/\-\.]{5,25})',
+    ]
+    for pat in doc_num_patterns:
+        match = re.search(pat, text, re.IGNORECASE)
+        if match:
+            result["nomor_dokumen"] = match.group(1).strip()[:50]
+            break
+
+    # ── Seller / merchant name ───────────────────────────────────────────────
+    seller_patterns = [
+        r'(?:merchant|toko|nama\s*toko|penjual|dari\s*:)[:\s]*([^\n]{3,60})',
+        r'^([A-Z][^\n]{3,50})(?:\s*\n)',  # first line often merchant name
+        r'(?:PT\.|CV\.|UD\.|Toko\s|PD\.\s)([^\n]{2,50})',
+    ]
+    for pat in seller_patterns:
+        match = re.search(pat, text, re.IGNORECASE | re.MULTILINE)
+        if match:
+            result["nama_penjual"] = match.group(1).strip()[:100]
+            break
+
+    # ── Client / buyer name ──────────────────────────────────────────────────
+    client_patterns = [
+        r'(?:kepada\s*yth\.?|kepada|penerima|customer|client|bill\s*to|ditujukan\s*kepada|yang\s*membayar)[:\s]*([^\n]{3,80})',
+        r'(?:PT\.|CV\.|UD\.|Toko\s|PD\.\s)([^\n]{2,50})',
+    ]
+    for pat in client_patterns:
+        match = re.search(pat, text, re.IGNORECASE)
+        if match:
+            result["nama_klien"] = match.group(1).strip()[:100]
+            break
+
+    # ── Dates ────────────────────────────────────────────────────────────────
+    issue_date_patterns = [
+        r'(?:tanggal|tgl\.?|date|tanggal\s*terbit)[:\s]*(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4})',
+        r'(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{4})',
+    ]
+    for pat in issue_date_patterns:
+        match = re.search(pat, text, re.IGNORECASE)
+        if match:
+            result["tanggal_terbit"] = _normalize_date_legacy(match.group(1))
+            break
+
+    due_date_patterns = [
+        r'(?:jatuh\s*tempo|due\s*date|tgl\.?\s*tempo|batas\s*pembayaran)[:\s]*(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4})',
+        r'(?:jatuh\s*tempo|due\s*date)[:\s]*(\d{4}-\d{2}-\d{2})',
+    ]
+    for pat in due_date_patterns:
+        match = re.search(pat, text, re.IGNORECASE)
+        if match:
+            result["tanggal_jatuh_tempo"] = _normalize_date_legacy(match.group(1))
+            break
+
+    # ── Payment method ───────────────────────────────────────────────────────
+    pay_match = re.search(
+        r'\b(tunai|cash|debit|kredit|credit|transfer|qris|gopay|ovo|dana|shopeepay|linkaja)\b',
+        text, re.IGNORECASE
+    )
+    if pay_match:
+        result["metode_bayar"] = pay_match.group(1).upper()
+
+    # ── EDC-specific ─────────────────────────────────────────────────────────
+    tid_match = re.search(r'(?:tid|terminal\s*id|mid|merchant\s*id)[:\s]*([A-Z0-9]{4,20})', text, re.IGNORECASE)
+    if tid_match:
+        result["terminal_id"] = tid_match.group(1).strip()
+
+    ref_match = re.search(
+        r'(?:approval|auth\s*code|authorization|kode\s*autorisasi|trace|ref(?:erence)?)[:\s#]*([A-Z0-9]{4,20})',
+        text, re.IGNORECASE
+    )
+    if ref_match:
+        result["no_referensi"] = ref_match.group(1).strip()
+
+    # ── Confidence score ─────────────────────────────────────────────────────
+    core_keys = ["nomor_dokumen", "nama_penjual", "nama_klien", "nominal_total",
+                 "tanggal_terbit", "metode_bayar", "no_referensi", "terminal_id"]
+    found = sum(1 for k in core_keys if result.get(k) is not None)
+    result["confidence"] = "high" if found >= 4 else ("medium" if found >= 2 else "low")
+    return result
+
+
+def _inputs(n: int) -> list:
+    texts = []
+    for receipt in generate_receipts(n, with_images=False):
+        text = receipt["text"]
+        texts.extend([text, re.sub(r"\s*\n\s*", " ", text), text.upper()])
+    return texts
+
+
+def _golden_inputs() -> list:
+    return _inputs(GOLDEN_RECEIPTS) + _EDGE_CASES
+
+
+def _best_of(fn, texts: list) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regex fallback extraction benchmark")
+    parser.add_argument("-n", type=int, default=300, help="generated receipts (x3 shapes)")
+    parser.add_argument("--update-golden", action="store_true", help="rewrite the golden file from the legacy code")
+    args = parser.parse_args()
+
+    golden_inputs = _golden_inputs()
+    if args.update_golden:
+        golden = [{"text": t, "fields": _regex_fallback_legacy(t)} for t in golden_inputs]
+        with open(GOLDEN_PATH, "w") as f:
+            json.dump(golden, f, indent=1, ensure_ascii=False)
+        print(f"wrote {len(golden)} cases to {GOLDEN_PATH}")
+
+    with open(GOLDEN_PATH) as f:
+        golden = json.load(f)
+    for i, case in enumerate(golden):
+        assert _regex_fallback_extraction(case["text"]) == case["fields"], f"golden mismatch in case {i}"
+
+    texts = _inputs(args.n) + _EDGE_CASES
+    for i, text in enumerate(texts):
+        assert _regex_fallback_extraction(text) == _regex_fallback_legacy(text), f"legacy mismatch on input {i}"
+    print(f"{len(golden)} golden cases and {len(texts)} inputs match the legacy implementation")
+
+    t_old = _best_of(_regex_fallback_legacy, texts)
+    t_new = _best_of(_regex_fallback_extraction, texts)
+    per = 1e6 / len(texts)
+    print(f"  legacy   {t_old * per:8.1f} us/doc")
+    print(f"  compiled {t_new * per:8.1f} us/doc   x{t_old / t_new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+GET /api/scans and /api/scans/history: offset pagination + COUNT(*) with
+full rows (the previous implementation, kept below as the reference) vs
+keyset pagination (?cursor=) with the default projection (no
+extracted_text) on an account seeded with --scans local scans.
+
+Pages are fetched at increasing depth; every keyset page is checked to hold
+the same scans as the offset page at that depth. Reports latency per page
+and response size.
+
+Uses a throwaway SQLite file by default; pass --database-url with an empty
+Postgres database to measure there (count=estimated then comes from the
+planner instead of COUNT(*)).
+
+Run with: python -m benchmarks.bench_scan_listing [--scans 100000] [--database-url postgresql://...]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fakes
+
+fakes.configure_env()
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from starlette.responses import Response
+
+from api import scans as scans_api
+from benchmarks.run import summarize
+from config.database import Base
+from models.models import Scan, User
+
+USER_ID = "bench-user"
+OTHER_USERS = 20
+PAGE = 50
+WORDS = "TOTAL SUBTOTAL PPN INVOICE NO TANGGAL PT CV JL KOTA RP TUNAI QRIS DEBIT TERIMA KASIH".split()
+
+
+def _offset_list(db, user, skip: int, limit: int) -> list:
+    """The original GET / body, kept as the reference."""
+    scans = (
+        db.query(Scan)
+        .filter(Scan.user_id == user.id)
+        .order_by(Scan.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    results = []
+    for scan in scans:
+        d = {
+            k: str(v) if k == "user_id" else v
+            for k, v in scan.__dict__.items()
+            if not k.startswith("_")
+        }
+        d["is_fraud_scan"] = bool(scan.is_fraud_scan) if scan.is_fraud_scan is not None else False
+        d["fraud_fields"] = None
+        results.append(d)
+    return results
+
+
+def _offset_history(db, user, skip: int, limit: int) -> dict:
+    """The original GET /history body, kept as the reference."""
+    scans = (
+        db.query(Scan)
+        .filter(Scan.user_id == user.id)
+        .order_by(Scan.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return {
+        "total": db.query(Scan).filter(Scan.user_id == user.id).count(),
+        "scans": [
+            {
+                "id": s.id,
+                "original_filename": s.original_filename,
+                "imagekit_url": s.imagekit_url,
+                "extracted_text": s.extracted_text,
+                "confidence_score": s.confidence_score,
+                "status": s.status,
+                "created_at": s.created_at.isoformat() if s.created_at else None,
+                "recipient_name": s.recipient_name,
+                "signature_url": s.signature_url,
+            }
+            for s in scans
+        ],
+    }
+
+
+def seed(engine, n: int, seed: int = 0):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        users = [USER_ID] + [f"other-{i}" for i in range(OTHER_USERS)]
+        conn.execute(User.__table__.insert(), [
+            {"id": u, "email": f"{u}@bench.invalid", "username": u, "full_name": u, "hashed_password": "x"}
+            for u in users
+        ])
+        rows = []
+        for i in range(n + n // 5):
+            user = USER_ID if i < n else rng.choice(users[1:])
+            rows.append({
+                "user_id": user,
+                "original_filename": f"scan_{i}.jpg",
+                "file_path": f"uploads/{user}/scan_{i}.jpg",
+                "file_size": rng.randint(80_000, 900_000),
+                "file_type": "image/jpeg",
+                "recipient_name": f"PT Penerima {i % 97}",
+                "imagekit_url": f"https://ik.example.invalid/scan_{i}.jpg",
+                "extracted_text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(150, 400))),
+                "confidence_score": rng.uniform(40, 99),
+                "processing_time": rng.uniform(0.5, 4),
+                "status": "completed",
+                "is_fraud_scan": False,
+                # Bursts share a timestamp so (created_at, id) ties are exercised
+                "created_at": start + timedelta(seconds=(i // 3) * 7),
+            })
+            if len(rows) == 5000:
+                conn.execute(Scan.__table__.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(Scan.__table__.insert(), rows)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE scans"))
+
+
+class _User:
+    id = USER_ID
+
+
+_LOOP = asyncio.new_event_loop()  # the endpoints are async; one loop so loop setup is not timed
+
+
+def _size(payload) -> int:
+    return len(json.dumps(payload, default=str))
+
+
+def _time(fn, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan listing pagination benchmark")
+    parser.add_argument("--scans", type=int, default=100_000, help="scans of the benchmark user")
+    parser.add_argument("--database-url", help="empty database to seed (default: temporary SQLite file)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = None
+    url = args.database_url
+    if not url:
+        tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        url = f"sqlite:///{tmp.name}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine, tables=[User.__table__, Scan.__table__])
+    start = time.perf_counter()
+    seed(engine, args.scans)
+    print(f"seeded {args.scans} scans (+{args.scans // 5} of other users) on {engine.dialect.name} "
+          f"in {time.perf_counter() - start:.1f}s\n")
+
+    db = sessionmaker(bind=engine)()
+    user = _User()
+    depths = [d for d in (0, 1_000, 10_000, 50_000, args.scans - PAGE) if 0 <= d <= args.scans - PAGE]
+
+    # Walk the listing once with cursors to get the cursor at each depth
+    cursors, cursor, walked = {0: None}, None, 0
+    while walked < max(depths):
+        page = _LOOP.run_until_complete(scans_api.get_scan_history(
+            skip=0, limit=1000, cursor=cursor, fields="id", count="none", current_user=user, db=db))
+        cursor, walked = page["next_cursor"], walked + len(page["scans"])
+        cursors[walked] = cursor
+        db.expunge_all()
+    for depth in depths:
+        if depth not in cursors:
+            page = _LOOP.run_until_complete(scans_api.get_scan_history(
+                skip=0, limit=depth % 1000, cursor=cursors[depth - depth % 1000], fields="id",
+                count="none", current_user=user, db=db))
+            cursors[depth] = page["next_cursor"]
+
+    print(f"{'endpoint':<9} {'depth':>7} {'offset+full':>12} {'keyset':>9} {'speedup':>8} {'bytes old':>10} {'bytes new':>10}")
+    for endpoint in ("/", "/history"):
+        for depth in depths:
+            if endpoint == "/":
+                old = lambda: _offset_list(db, user, depth, PAGE)
+                new = lambda: _LOOP.run_until_complete(scans_api.get_user_scans(
+                    response=Response(), skip=0, limit=PAGE, cursor=cursors[depth], fields=None,
+                    count="none", current_user=user, db=db))
+            else:
+                old = lambda: _offset_history(db, user, depth, PAGE)
+                new = lambda: _LOOP.run_until_complete(scans_api.get_scan_history(
+                    skip=0, limit=PAGE, cursor=cursors[depth], fields=None, count="none",
+                    current_user=user, db=db))
+            old_page, new_page = old(), new()
+            old_ids = [s["id"] for s in (old_page if endpoint == "/" else old_page["scans"])]
+            new_ids = [s["id"] for s in (new_page if endpoint == "/" else new_page["scans"])]
+            assert old_ids == new_ids, f"{endpoint} depth {depth}: pages differ"
+            db.expunge_all()
+
+            t_old = summarize(_time(lambda: (old(), db.expunge_all()), args.repeat))["median_ms"]
+            t_new = summarize(_time(lambda: (new(), db.expunge_all()), args.repeat))["median_ms"]
+            print(f"{endpoint:<9} {depth:>7} {t_old:>10.1f}ms {t_new:>7.1f}ms {t_old / t_new:>7.1f}x "
+                  f"{_size(old_page):>10} {_size(new_page):>10}")
+
+    print("\ncount for /history (total):")
+    for mode in ("exact", "estimated"):
+        samples = _time(lambda: scans_api._count(db, USER_ID, mode), args.repeat)
+        print(f"  {mode:<10} {scans_api._count(db, USER_ID, mode):>8}  {summarize(samples)['median_ms']:.1f}ms")
+
+    db.close()
+    engine.dispose()
+    if tmp:
+        os.unlink(tmp.name)
+
+
+if __name__ == "__main__":
+    main()
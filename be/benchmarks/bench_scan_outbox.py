@@ -0,0 +1,155 @@
+"""
+Supabase scan outbox (services.scan_outbox): request-path latency of
+sync_to_supabase with the outbox off (direct write) and on (XADD), then
+consumer throughput and delivery checks against fakeredis + FakeSupabase:
+
+- drain: records written per Supabase call
+- outage: Supabase fails for a while; every record still lands exactly once
+- redelivery: the same records delivered again are acked as duplicates
+- crash: a consumer reads a batch and dies; another one claims and writes it
+
+Supabase latency is --latency seconds per call with --spike-rate calls
+taking --spike seconds, to show the tail moving off the request path.
+
+Run with: python -m benchmarks.bench_scan_outbox [-n 300] [--latency 0.08] [--spike 1.5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fakes
+
+fakes.configure_env()
+
+from benchmarks.run import summarize
+from config.settings import settings
+from services import scan_helpers, scan_outbox
+
+
+class _Supabase:
+    """save_scan_records_batch with latency, tail spikes and an outage switch."""
+
+    def __init__(self, sb: fakes.FakeSupabase, latency: float, spike: float, spike_rate: float, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.down = False
+        self.batches = []
+        write = sb.functions["save_scan_records_batch"]
+
+        def save_scan_records_batch(db, **params):
+            time.sleep(spike if self.rng.random() < spike_rate else latency)
+            if self.down:
+                raise ConnectionError("Supabase unavailable")
+            self.batches.append(len(params["p_records"]))
+            return write(db, **params)
+
+        sb.functions["save_scan_records_batch"] = save_scan_records_batch
+
+
+def _sync(i: int, user: str = "u-bench") -> float:
+    start = time.perf_counter()
+    scan_helpers.sync_to_supabase(
+        user_id=user, filename=f"scan_{i}.jpg", image_url=f"https://ik.example.invalid/scan_{i}.jpg",
+        content_hash=f"hash-{i:06d}", recipient_name="PT Bench", signature_url="",
+        structured={"nominal_total": 1000 * (i + 1), "confidence": "high", "doc_type": "invoice"},
+        ocr_result={"enhanced_text": "TOTAL"}, is_fraud=i % 2 == 0, scan_id=f"bench-{i}",
+    )
+    return time.perf_counter() - start
+
+
+def _p99(samples: list) -> float:
+    ms = sorted(s * 1000 for s in samples)
+    return round(ms[min(len(ms) - 1, int(len(ms) * 0.99))], 1)
+
+
+def _drain(consumer: str = "bench", max_rounds: int = 10_000) -> dict:
+    """run_consumer without the sleeps: drain until the stream is empty."""
+    totals = {"saved": 0, "duplicate": 0, "failed": 0, "dead": 0, "errors": 0}
+    for _ in range(max_rounds):
+        try:
+            stats = scan_outbox.drain_once(consumer, block_ms=1)
+        except ConnectionError:
+            totals["errors"] += 1
+            continue
+        for k in ("saved", "duplicate", "failed", "dead"):
+            totals[k] += stats[k]
+        if not scan_outbox.outbox_stats()["length"]:
+            break
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supabase scan outbox benchmark")
+    parser.add_argument("-n", type=int, default=300, help="scan records")
+    parser.add_argument("--latency", type=float, default=0.08, help="Supabase call latency (s)")
+    parser.add_argument("--spike", type=float, default=1.5, help="latency of slow Supabase calls (s)")
+    parser.add_argument("--spike-rate", type=float, default=0.03)
+    args = parser.parse_args()
+
+    sb = fakes.FakeSupabase()
+    redis = fakes.install(sb)[1]
+    supabase = _Supabase(sb, args.latency, args.spike, args.spike_rate)
+    settings.SCAN_OUTBOX_RETRY_BASE_DELAY = 0
+
+    # ── request path ──
+    settings.SCAN_OUTBOX_ENABLED = False
+    direct = [_sync(i, "u-direct") for i in range(args.n)]
+    settings.SCAN_OUTBOX_ENABLED = True
+    queued = [_sync(i) for i in range(args.n)]
+    print(f"sync_to_supabase, {args.n} scans, Supabase {args.latency * 1000:.0f}ms "
+          f"(+{args.spike_rate:.0%} at {args.spike * 1000:.0f}ms)")
+    for name, samples in (("direct write", direct), ("outbox", queued)):
+        s = summarize(samples)
+        print(f"  {name:<13} median {s['median_ms']:8.2f}ms  p95 {s['p95_ms']:8.2f}ms  p99 {_p99(samples):8.1f}ms")
+    print(f"  lag after enqueue: {scan_outbox.outbox_stats()}")
+
+    # ── drain ──
+    supabase.batches.clear()
+    start = time.perf_counter()
+    totals = _drain()
+    elapsed = time.perf_counter() - start
+    print(f"\ndrain        {totals['saved']} saved in {len(supabase.batches)} Supabase calls "
+          f"({elapsed:.1f}s, {totals['saved'] / elapsed:.0f} records/s)")
+    assert totals["saved"] == args.n and not totals["failed"]
+
+    # ── outage ──
+    supabase.down = True
+    for i in range(args.n, args.n + 100):
+        _sync(i)
+    scan_outbox._last_claim = 0.0
+    for _ in range(5):
+        _drain(max_rounds=1)
+    lag = scan_outbox.outbox_stats()
+    supabase.down = False
+    totals = _drain()
+    docs = [d for d in sb.tables["documents"] if d["user_id"] == "u-bench"]
+    keys = [d["idempotency_key"] for d in docs]
+    print(f"outage       lag during outage {lag}; after recovery {totals['saved']} saved, "
+          f"{len(keys)} rows, {len(keys) - len(set(keys))} duplicated")
+    assert totals["saved"] == 100 and len(keys) == len(set(keys)) == args.n + 100
+
+    # ── redelivery ──
+    for i in range(50):
+        _sync(i)
+    totals = _drain()
+    rows = len([d for d in sb.tables["documents"] if d["user_id"] == "u-bench"])
+    print(f"redelivery   {totals['duplicate']} duplicates acked, rows unchanged: {rows == args.n + 100}")
+    assert totals["duplicate"] == 50 and rows == args.n + 100
+
+    # ── consumer crash ──
+    for i in range(args.n + 100, args.n + 140):
+        _sync(i)
+    redis.xreadgroup(scan_outbox.GROUP, "crashed", {scan_outbox.STREAM_KEY: ">"}, count=40)
+    settings.SCAN_OUTBOX_CLAIM_IDLE = 0
+    scan_outbox._last_claim = 0.0
+    totals = _drain("survivor")
+    print(f"crash        {totals['saved']} records claimed from the stopped consumer and written")
+    assert totals["saved"] == 40
+    print(f"\nfinal        {scan_outbox.outbox_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Parity check: combined single-call extraction vs the two-step path.
+
+Replays recorded provider responses (benchmarks/fixtures/
+llm_extraction_responses.json) through a local fake OpenAI server and
+checks that OCRService.enhance_and_extract returns the same cleaned text
+and structured fields as enhance_with_openai + extract_fields_structured,
+with half the LLM round trips. Also checks that both paths degrade to the
+raw text + regex fallback when every provider fails.
+
+Run with: python -m benchmarks.check_combined_extraction
+Exits non-zero on any mismatch.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fakes
+
+fakes.configure_env()
+
+import httpx
+from openai import AsyncOpenAI
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from services import ocr_service
+from services.ocr_service import OCRService, STRUCTURED_EXTRACTION_PROMPT, COMBINED_EXTRACTION_PROMPT
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "llm_extraction_responses.json")
+LATENCY = 0.2  # per fake LLM call
+
+
+def _responder(responses: dict):
+    def respond(body: dict) -> str:
+        system = body["messages"][0]["content"]
+        if system == COMBINED_EXTRACTION_PROMPT:
+            return responses["combined"]
+        if system == STRUCTURED_EXTRACTION_PROMPT:
+            return responses["structured"]
+        return responses["cleanup"]
+    return respond
+
+
+def _use_server(server: FakeOpenAIServer):
+    ocr_service.groq_clients = []
+    ocr_service.openai_client = AsyncOpenAI(
+        api_key="fake", base_url=server.base_url, max_retries=0,
+        http_client=httpx.AsyncClient(timeout=30.0),
+    )
+
+
+async def _two_step(text: str):
+    enhanced = await OCRService.enhance_with_openai(text)
+    return enhanced, await OCRService.extract_fields_structured(enhanced)
+
+
+async def _check_case(case: dict) -> bool:
+    server = FakeOpenAIServer(latency=LATENCY, responder=_responder(case["responses"]))
+    server.start()
+    _use_server(server)
+    try:
+        start = time.perf_counter()
+        two_step = await _two_step(case["raw_text"])
+        t_two, calls_two = time.perf_counter() - start, len(server.requests)
+
+        start = time.perf_counter()
+        combined = await OCRService.enhance_and_extract(case["raw_text"])
+        t_one, calls_one = time.perf_counter() - start, len(server.requests) - calls_two
+    finally:
+        server.stop()
+
+    ok = two_step == combined
+    print(f"{case['name']:<12} {'OK' if ok else 'MISMATCH':<9} "
+          f"two-step {calls_two} call(s) {t_two:.2f}s | combined {calls_one} call(s) {t_one:.2f}s")
+    if not ok:
+        print(f"  two-step: {json.dumps(two_step, ensure_ascii=False)}")
+        print(f"  combined: {json.dumps(combined, ensure_ascii=False)}")
+    return ok
+
+
+async def _check_all_providers_down(case: dict) -> bool:
+    server = FakeOpenAIServer(status=500)
+    server.start()
+    _use_server(server)
+    try:
+        ok = await _two_step(case["raw_text"]) == await OCRService.enhance_and_extract(case["raw_text"])
+    finally:
+        server.stop()
+    print(f"{'providers down':<12} {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+async def main() -> int:
+    with open(FIXTURES) as f:
+        cases = json.load(f)
+    results = [await _check_case(case) for case in cases]
+    results.append(await _check_all_providers_down(cases[0]))
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,214 @@
+"""
+Concurrency check for atomic credit deduction
+(database/credit_deduction_migration.sql via services.credit_service).
+
+Loads the migration into an empty Postgres database and fires 100
+concurrent deductions at one balance through credit_service.deduct_credits
+(sharing --connections database connections), for profiles (deduct_credits,
+UUID) and the legacy users table (deduct_user_credits, TEXT id cast to UUID):
+
+- enough credits: every call succeeds and each returns a distinct balance
+- 60 credits for 100 calls: exactly 60 succeed, the rest get None
+- allow_partial: the balance is clamped at 0, never negative
+- a users id that is not a UUID matches nothing instead of raising
+
+The previous read-then-write deduction runs the same 100 calls first to
+show the lost updates it had.
+
+Run with: python -m benchmarks.check_credit_deduction --database-url postgresql://...
+Exits non-zero on any failure.
+"""
+import argparse
+import os
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fakes
+
+fakes.configure_env()
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+from services.credit_service import deduct_credits
+
+MIGRATION = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                         "database", "credit_deduction_migration.sql")
+CALLS = 100
+
+SCHEMA = """
+DO $$ BEGIN
+    CREATE ROLE anon NOLOGIN;
+EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+DO $$ BEGIN
+    CREATE ROLE authenticated NOLOGIN;
+EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+DO $$ BEGIN
+    CREATE ROLE service_role NOLOGIN;
+EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+CREATE TABLE IF NOT EXISTS profiles (id UUID PRIMARY KEY, credits INTEGER DEFAULT 10);
+CREATE TABLE IF NOT EXISTS users (id UUID PRIMARY KEY, credits INTEGER DEFAULT 10);
+"""
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Pool:
+    """ThreadedConnectionPool that waits for a free connection instead of raising."""
+
+    def __init__(self, url: str, size: int):
+        self.pool = ThreadedConnectionPool(1, size, url)
+        self.slots = threading.BoundedSemaphore(size)
+
+    def getconn(self):
+        self.slots.acquire()
+        return self.pool.getconn()
+
+    def putconn(self, conn):
+        self.pool.putconn(conn)
+        self.slots.release()
+
+
+class _Rpc:
+    def __init__(self, pool: _Pool, name: str, params: dict):
+        self.pool, self.name, self.params = pool, name, params
+
+    def execute(self):
+        conn = self.pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                args = ", ".join(f"{k} => %({k})s" for k in self.params)
+                cur.execute(f"SELECT {self.name}({args})", self.params)
+                return _Result(cur.fetchone()[0])
+        finally:
+            self.pool.putconn(conn)
+
+
+class PgClient:
+    """The supabase-py rpc() surface credit_service uses, on a psycopg2 pool."""
+
+    def __init__(self, pool: _Pool):
+        self.pool = pool
+
+    def rpc(self, name: str, params: dict) -> _Rpc:
+        return _Rpc(self.pool, name, params)
+
+
+def _legacy_deduct(pool: _Pool, user_id: str, amount: int):
+    """The read-then-write deduction the RPC replaced, kept as the reference."""
+    conn = pool.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT credits FROM profiles WHERE id = %s", (user_id,))
+            current = cur.fetchone()[0]
+        if current < amount:
+            return None
+        with conn, conn.cursor() as cur:
+            cur.execute("UPDATE profiles SET credits = %s WHERE id = %s", (current - amount, user_id))
+        return current - amount
+    finally:
+        pool.putconn(conn)
+
+
+def _concurrently(fn, n: int) -> list:
+    """Run fn() n times on n threads released together."""
+    barrier = threading.Barrier(n)
+
+    def call(_):
+        barrier.wait()
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=n) as ex:
+        return list(ex.map(call, range(n)))
+
+
+def _balance(pool: _Pool, table: str, user_id: str) -> int:
+    conn = pool.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(f"SELECT credits FROM {table} WHERE id = %s", (user_id,))
+            return cur.fetchone()[0]
+    finally:
+        pool.putconn(conn)
+
+
+def _new_row(pool: _Pool, table: str, credits: int) -> str:
+    user_id = str(uuid.uuid4())
+    conn = pool.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(f"INSERT INTO {table} (id, credits) VALUES (%s, %s)", (user_id, credits))
+    finally:
+        pool.putconn(conn)
+    return user_id
+
+
+def _check(name: str, ok: bool, detail: str) -> bool:
+    print(f"{name:<34} {'OK' if ok else 'FAIL':<5} {detail}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Atomic credit deduction concurrency check")
+    parser.add_argument("--database-url", required=True, help="empty Postgres database to load the migration into")
+    parser.add_argument("--connections", type=int, default=50, help="database connections shared by the calls")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.database_url)
+    with conn, conn.cursor() as cur:
+        cur.execute(SCHEMA)
+        with open(MIGRATION) as f:
+            cur.execute(f.read())
+    conn.close()
+
+    pool = _Pool(args.database_url, min(args.connections, CALLS))
+    sb = PgClient(pool)
+    results = []
+
+    user = _new_row(pool, "profiles", CALLS)
+    _concurrently(lambda: _legacy_deduct(pool, user, 1), CALLS)
+    print(f"{'read-then-write (previous)':<34} {'':<5} {CALLS} deductions from {CALLS} left "
+          f"{_balance(pool, 'profiles', user)} credits (lost updates)")
+
+    for table in ("profiles", "users"):
+        user = _new_row(pool, table, CALLS)
+        out = _concurrently(lambda: deduct_credits(sb, user, 1, table=table), CALLS)
+        results.append(_check(
+            f"{table}: {CALLS} x 1 from {CALLS}",
+            sorted(out) == list(range(CALLS)) and _balance(pool, table, user) == 0,
+            f"balance {_balance(pool, table, user)}, {len(set(out))} distinct results",
+        ))
+
+        user = _new_row(pool, table, 60)
+        out = _concurrently(lambda: deduct_credits(sb, user, 1, table=table), CALLS)
+        granted = [b for b in out if b is not None]
+        results.append(_check(
+            f"{table}: {CALLS} x 1 from 60",
+            len(granted) == 60 and sorted(granted) == list(range(60)) and _balance(pool, table, user) == 0,
+            f"{len(granted)} succeeded, {out.count(None)} refused, balance {_balance(pool, table, user)}",
+        ))
+
+        user = _new_row(pool, table, CALLS)
+        out = _concurrently(lambda: deduct_credits(sb, user, 3, allow_partial=True, table=table), CALLS)
+        results.append(_check(
+            f"{table}: {CALLS} x 3 partial from {CALLS}",
+            _balance(pool, table, user) == 0 and min(out) == 0 and None not in out,
+            f"balance {_balance(pool, table, user)}",
+        ))
+
+    out = deduct_credits(sb, "legacy-local-id", 1, table="users")
+    results.append(_check("users: non-UUID id", out is None, f"result {out}"))
+
+    pool.pool.closeall()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
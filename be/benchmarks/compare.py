@@ -0,0 +1,51 @@
+"""
+Compare two benchmark result files written by benchmarks.run.
+
+    python -m benchmarks.compare before.json after.json
+
+Prints per-stage median/p95 and the relative change; a negative change is
+faster.
+"""
+import json
+import sys
+
+METRICS = ["median_ms", "p95_ms", "mean_ms"]
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _change(old, new) -> str:
+    if not old or new is None:
+        return "   n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def compare(before: dict, after: dict) -> list:
+    rows = []
+    for stage in sorted(set(before["stages"]) | set(after["stages"])):
+        old = before["stages"].get(stage, {})
+        new = after["stages"].get(stage, {})
+        for metric in METRICS:
+            rows.append((stage, metric, old.get(metric), new.get(metric), _change(old.get(metric), new.get(metric))))
+    return rows
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if len(argv) != 2:
+        print(__doc__)
+        sys.exit(2)
+    before, after = _load(argv[0]), _load(argv[1])
+    print(f"before: {before.get('commit')}  ({before.get('timestamp')})")
+    print(f"after:  {after.get('commit')}  ({after.get('timestamp')})\n")
+    print(f"{'stage':<14}{'metric':<12}{'before':>12}{'after':>12}{'change':>10}")
+    for stage, metric, old, new, change in compare(before, after):
+        fmt = lambda v: f"{v:.2f}" if isinstance(v, (int, float)) else "-"
+        print(f"{stage:<14}{metric:<12}{fmt(old):>12}{fmt(new):>12}{change:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Synthetic receipt corpus for the benchmarks.
+
+Each receipt is a dict:
+    {
+        "kind":  "nota_toko" | "invoice" | "struk_edc" | "kuitansi",
+        "text":  ground-truth text (one string, newline separated),
+        "truth": {field: expected value} using the structured-extraction keys,
+        "image": PNG bytes of the rendered receipt,
+    }
+
+Generation is deterministic for a given seed so results are comparable
+between commits.
+"""
+import io
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+
+from workers.handlers.dummy_doc_generator import make_dummy_png
+
+KINDS = ["nota_toko", "invoice", "struk_edc", "kuitansi"]
+
+_VENDORS = [
+    "TOKO SUMBER REJEKI", "INDOMARET CIPUTAT", "ALFAMART PONDOK AREN",
+    "CV MAJU JAYA LOGISTIK", "PT SENTOSA ABADI", "WARUNG BU SITI",
+    "UD BERKAH TANI", "TOKO BANGUNAN SINAR",
+]
+_CLIENTS = ["PT OTARU NUSANTARA", "BUDI SANTOSO", "CV KARYA MANDIRI", "SITI RAHAYU"]
+_ITEMS = [
+    "Beras 5kg", "Minyak Goreng 2L", "Gula Pasir 1kg", "Semen 50kg", "Kardus Besar",
+    "Solar 20L", "Lakban Coklat", "Palet Kayu", "Air Mineral 600ml", "Tali Rafia",
+]
+_PAYMENTS = ["TUNAI", "DEBIT", "QRIS", "TRANSFER"]
+
+_FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationMono-Regular.ttf",
+    "cour.ttf",
+]
+
+
+def _font(size: int) -> ImageFont.ImageFont:
+    for path in _FONT_PATHS:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def _rupiah(value: int) -> str:
+    return f"{value:,}".replace(",", ".")
+
+
+def _receipt_lines(kind: str, rng: random.Random) -> tuple[list, dict]:
+    vendor = rng.choice(_VENDORS)
+    client = rng.choice(_CLIENTS)
+    issued = date(2025, 1, 1) + timedelta(days=rng.randint(0, 500))
+    doc_no = f"{rng.choice(['INV', 'TRX', 'NT', 'KW'])}-{issued.year}-{rng.randint(10000, 99999)}"
+    payment = rng.choice(_PAYMENTS)
+
+    items = []
+    for _ in range(rng.randint(2, 7)):
+        qty = rng.randint(1, 5)
+        price = rng.randint(5, 400) * 1000
+        items.append((rng.choice(_ITEMS), qty, price))
+    subtotal = sum(q * p for _, q, p in items)
+    ppn = subtotal * 11 // 100 if kind in ("invoice", "struk_edc") else 0
+    total = subtotal + ppn
+
+    truth = {
+        "doc_type": kind,
+        "nomor_dokumen": doc_no,
+        "tanggal_terbit": issued.isoformat(),
+        "nama_penjual": vendor,
+        "nama_klien": None,
+        "nominal_subtotal": subtotal,
+        "nominal_ppn": ppn or None,
+        "nominal_total": total,
+        "metode_bayar": payment,
+    }
+
+    lines = [vendor, "Jl. Raya Serpong No. %d, Tangerang" % rng.randint(1, 300), ""]
+    if kind == "invoice":
+        lines += [
+            "INVOICE",
+            f"Invoice No. : {doc_no}",
+            f"Tanggal : {issued.strftime('%d/%m/%Y')}",
+            f"Bill To : {client}",
+            f"Jatuh Tempo : {(issued + timedelta(days=30)).strftime('%d/%m/%Y')}",
+        ]
+        truth["nama_klien"] = client
+        truth["tanggal_jatuh_tempo"] = (issued + timedelta(days=30)).isoformat()
+    elif kind == "struk_edc":
+        lines += [
+            "STRUK EDC - SALE",
+            f"TID : {rng.randint(10000000, 99999999)}",
+            f"No. Transaksi : {doc_no}",
+            f"Tanggal : {issued.strftime('%d/%m/%Y')}",
+            f"Approval Code : {rng.randint(100000, 999999)}",
+        ]
+        truth["metode_bayar"] = payment = "DEBIT"
+    elif kind == "kuitansi":
+        lines += [
+            "KUITANSI",
+            f"No. Kuitansi : {doc_no}",
+            f"Tanggal : {issued.strftime('%d/%m/%Y')}",
+            f"Telah diterima dari : {client}",
+        ]
+        truth["nama_klien"] = client
+    else:
+        lines += [
+            "NOTA / STRUK BELANJA",
+            f"No. Transaksi : {doc_no}",
+            f"Tgl : {issued.strftime('%d/%m/%Y')}",
+            f"Kasir : {rng.choice(['ANI', 'DEDI', 'RINA'])}",
+        ]
+    lines.append("-" * 36)
+    for name, qty, price in items:
+        lines.append(f"{name:<20} {qty} x {_rupiah(price)}")
+    lines.append("-" * 36)
+    lines.append(f"Subtotal : Rp {_rupiah(subtotal)}")
+    if ppn:
+        lines.append(f"PPN 11% : Rp {_rupiah(ppn)}")
+    lines.append(f"TOTAL : Rp {_rupiah(total)}")
+    lines.append(f"Pembayaran : {payment}")
+    lines += ["", "Terima kasih atas kunjungan Anda"]
+    return lines, truth
+
+
+def render_lines(lines: list, width: int = 900, font_size: int = 26) -> Image.Image:
+    font = _font(font_size)
+    line_h = int(font_size * 1.5)
+    img = Image.new("RGB", (width, 80 + line_h * len(lines)), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(lines):
+        draw.text((40, 40 + i * line_h), line, fill=(20, 20, 20), font=font)
+    return img
+
+
+def _png_bytes(img: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def generate_receipts(n: int, seed: int = 0, with_images: bool = True) -> list:
+    """n deterministic synthetic receipts, cycling through KINDS."""
+    rng = random.Random(seed)
+    receipts = []
+    for i in range(n):
+        kind = KINDS[i % len(KINDS)]
+        lines, truth = _receipt_lines(kind, rng)
+        receipt = {"kind": kind, "text": "\n".join(lines), "truth": truth}
+        if with_images:
+            receipt["image"] = _png_bytes(render_lines(lines))
+        receipts.append(receipt)
+    return receipts
+
+
+def dummy_documents() -> list:
+    """The two fixed beta-test documents from workers.handlers.dummy_doc_generator."""
+    return [make_dummy_png("slip_gaji"), make_dummy_png("invoice")]
+
+
+def write_corpus(receipts: list, directory: str) -> list:
+    """Write receipt images to disk (for path-based OCR entry points)."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, receipt in enumerate(receipts):
+        path = os.path.join(directory, f"receipt_{i:04d}.png")
+        with open(path, "wb") as f:
+            f.write(receipt["image"])
+        paths.append(path)
+    return paths
@@ -0,0 +1,111 @@
+"""
+Offline evaluation: relevance-ranked line selection vs plain truncation for
+the structured-extraction prompt.
+
+Generated receipts are padded the way long real receipts look (store
+header boilerplate, many item lines, promo footer), then reduced to the
+same token budget by
+    truncate  the old text[:budget * CHARS_PER_TOKEN]
+    select    services.line_selection.select_relevant_lines
+and scored by field recall: the share of ground-truth field values (doc
+number, date, seller, subtotal/PPN/total amounts, payment method) still
+present in the prompt text. No LLM is called.
+
+Run with: python -m benchmarks.eval_line_selection [-n 200] [--budget 600]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fakes
+
+fakes.configure_env()
+
+from benchmarks.corpus import generate_receipts, _ITEMS
+from services.line_selection import CHARS_PER_TOKEN, estimate_tokens, select_relevant_lines
+
+_HEADER_NOISE = [
+    "Jl. Raya Serpong No. 88 Tangerang Selatan Banten 15310",
+    "Telp. (021) 555-0192 / WA 0812-3456-7890",
+    "Buka setiap hari pukul 07.00 - 22.00 WIB",
+    "Member Card: **** **** 1234",
+    "Selamat berbelanja, utamakan keselamatan",
+]
+_FOOTER_NOISE = [
+    "Barang yang sudah dibeli tidak dapat ditukar atau dikembalikan",
+    "Simpan struk ini sebagai bukti pembayaran yang sah",
+    "Layanan konsumen: halo@example.co.id",
+    "Kritik dan saran: www.example.co.id/feedback",
+    "Dapatkan poin ganda setiap hari Jumat",
+]
+
+
+def _rupiah(value: int) -> str:
+    return f"{value:,}".replace(",", ".")
+
+
+def _pad(text: str, rng: random.Random, extra_items: int) -> str:
+    lines = text.splitlines()
+    head, body = lines[:2], lines[2:]
+    # extra item lines go just before the closing separator ahead of the totals
+    sep = max(i for i, line in enumerate(body) if line.startswith("---"))
+    items = [
+        f"{rng.choice(_ITEMS):<20} {rng.randint(1, 5)} x {_rupiah(rng.randint(5, 400) * 1000)}"
+        for _ in range(extra_items)
+    ]
+    body = body[:sep] + items + body[sep:]
+    return "\n".join(head + _HEADER_NOISE + body + _FOOTER_NOISE)
+
+
+def _needles(truth: dict) -> list:
+    needles = [truth["nomor_dokumen"], truth["nama_penjual"], truth["metode_bayar"]]
+    needles.append(date.fromisoformat(truth["tanggal_terbit"]).strftime("%d/%m/%Y"))
+    for key in ("nominal_subtotal", "nominal_ppn", "nominal_total"):
+        if truth.get(key):
+            needles.append(f"Rp {_rupiah(truth[key])}")
+    return needles
+
+
+def recall(prompt: str, truth: dict) -> float:
+    needles = _needles(truth)
+    return sum(1 for n in needles if n in prompt) / len(needles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Line selection offline evaluation")
+    parser.add_argument("-n", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=600, help="token budget per prompt")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    receipts = generate_receipts(args.n, seed=args.seed, with_images=False)
+    methods = {
+        "full": lambda text: text,
+        "truncate": lambda text: text[: args.budget * CHARS_PER_TOKEN],
+        "select": lambda text: select_relevant_lines(text, args.budget),
+    }
+    totals = {name: {"recall": 0.0, "tokens": 0, "total_kept": 0} for name in methods}
+
+    for receipt in receipts:
+        text = _pad(receipt["text"], rng, extra_items=rng.randint(20, 120))
+        total_needle = f"Rp {_rupiah(receipt['truth']['nominal_total'])}"
+        for name, fn in methods.items():
+            prompt = fn(text)
+            totals[name]["recall"] += recall(prompt, receipt["truth"])
+            totals[name]["tokens"] += estimate_tokens(prompt)
+            totals[name]["total_kept"] += total_needle in prompt
+
+    n = len(receipts)
+    print(f"{n} padded receipts, budget {args.budget} tokens\n")
+    print(f"{'method':<10} {'field recall':>13} {'total kept':>11} {'avg tokens':>11}")
+    for name, t in totals.items():
+        print(f"{name:<10} {t['recall'] / n:>13.3f} {t['total_kept'] / n:>11.3f} {t['tokens'] / n:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
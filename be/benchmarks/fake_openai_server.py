@@ -0,0 +1,108 @@
+"""
+Local fake OpenAI-compatible chat server with configurable latency.
+
+Lets the LLM paths (hedging, provider fallback, batching) be exercised
+offline. Use in-process:
+
+    server = FakeOpenAIServer(latency=3.0, content='{"confidence": "high"}')
+    base_url = server.start()   # e.g. http://127.0.0.1:54321/v1
+    ...
+    server.stop()
+
+or standalone: python -m benchmarks.fake_openai_server --port 8900 --latency 2
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+
+class FakeOpenAIServer:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        content: str = '{"doc_type": "nota_toko", "nominal_total": 150000, "confidence": "medium"}',
+        status: int = 200,
+        port: int = 0,
+        responder: Optional[Callable[[dict], str]] = None,
+    ):
+        self.latency = latency
+        self.content = content
+        self.status = status
+        self.responder = responder  # optional: request body -> response content
+        self.requests: list[dict] = []
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                server.requests.append(body)
+                time.sleep(server.latency)
+
+                if server.status != 200:
+                    payload = {"error": {"message": "fake failure", "type": "server_error"}}
+                else:
+                    content = server.responder(body) if server.responder else server.content
+                    payload = {
+                        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                    }
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(server.status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client cancelled (e.g. a hedged request that lost)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--status", type=int, default=200)
+    args = parser.parse_args()
+    srv = FakeOpenAIServer(latency=args.latency, status=args.status, port=args.port)
+    print(f"Fake OpenAI server on {srv.base_url} (latency={args.latency}s, status={args.status})")
+    try:
+        srv._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,249 @@
+"""
+In-process stand-ins for the external services used by the scan pipeline,
+so benchmarks run offline:
+
+- FakeSupabase: the subset of the supabase-py query builder the backend
+  uses (table().select/insert/update/upsert/eq/order/limit/execute, rpc),
+  backed by plain lists with optional per-call latency.
+- fakeredis for Redis (queue, OCR cache, rate limits, credit locks).
+- FakeOpenAIServer (benchmarks.fake_openai_server) for the LLM providers.
+- A stub ImageKit upload.
+
+Call configure_env() before importing any backend module, then install().
+"""
+import hashlib
+import itertools
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def configure_env():
+    """Keep the backend from reaching real services at import time."""
+    os.environ["SUPABASE_URL"] = ""
+    os.environ["VITE_SUPABASE_URL"] = ""
+    os.environ["SUPABASE_ANON_KEY"] = ""
+    os.environ["VITE_SUPABASE_ANON_KEY"] = ""
+    os.environ["GEMINI_API_KEY"] = ""
+    for i in range(1, 5):
+        os.environ[f"GROQ_API_KEY_{i}"] = ""
+    os.environ.setdefault("DATABASE_URL", "postgresql://localhost/otaru_bench")  # engine is lazy, never connected
+    os.environ.setdefault("OCR_CACHE_TTL", "0")  # measure real work, not cache hits
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.filters: list = []
+        self._limit: Optional[int] = None
+        self._order: Optional[tuple] = None
+
+    def select(self, *_args, **_kwargs):
+        self.op = "select"
+        return self
+
+    def insert(self, row):
+        self.op, self.payload = "insert", row
+        return self
+
+    def update(self, values):
+        self.op, self.payload = "update", values
+        return self
+
+    def upsert(self, row, on_conflict: str = "id"):
+        self.op, self.payload = "upsert", (row, on_conflict)
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def order(self, column, desc: bool = False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def _match(self, row) -> bool:
+        return all(str(row.get(c)) == str(v) for c, v in self.filters)
+
+    def execute(self):
+        self.db.calls += 1
+        if self.db.latency:
+            time.sleep(self.db.latency)
+        rows = self.db.tables.setdefault(self.table, [])
+
+        if self.op == "insert":
+            new_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+            out = []
+            for row in new_rows:
+                row = {"id": next(self.db.ids), "created_at": datetime.now(timezone.utc).isoformat(), **row}
+                rows.append(row)
+                out.append(row)
+            return _Result(out)
+
+        if self.op == "upsert":
+            row, key = self.payload
+            for existing in rows:
+                if str(existing.get(key)) == str(row.get(key)):
+                    existing.update(row)
+                    return _Result([existing])
+            rows.append(dict(row))
+            return _Result([row])
+
+        matched = [r for r in rows if self._match(r)]
+        if self.op == "update":
+            for r in matched:
+                r.update(self.payload)
+            return _Result(matched)
+
+        if self._order:
+            column, desc = self._order
+            matched.sort(key=lambda r: r.get(column) or "", reverse=desc)
+        if self._limit is not None:
+            matched = matched[: self._limit]
+        return _Result([dict(r) for r in matched])
+
+
+class _Rpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: dict):
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self):
+        self.db.calls += 1
+        if self.db.latency:
+            time.sleep(self.db.latency)
+        fn = self.db.functions.get(self.name)
+        return _Result(fn(self.db, **self.params) if fn else None)
+
+
+def _deduct(db: "FakeSupabase", table: str, p_user_id, p_amount=1, p_allow_partial=False):
+    for row in db.tables.get(table, []):
+        if str(row.get("id")) == str(p_user_id):
+            credits = int(row.get("credits") or 0)
+            if p_allow_partial:
+                row["credits"] = max(credits - p_amount, 0)
+            elif credits >= p_amount:
+                row["credits"] = credits - p_amount
+            else:
+                return None
+            return row["credits"]
+    return None
+
+
+def _insert_row(db: "FakeSupabase", table: str, row: dict) -> dict:
+    row = {"id": next(db.ids), "created_at": datetime.now(timezone.utc).isoformat(), **row}
+    db.tables.setdefault(table, []).append(row)
+    return row
+
+
+def _save_scan_records(db: "FakeSupabase", p_document, p_finance, p_fraud=None, p_seal_salt=""):
+    """Mirror of save_scan_records (database/scan_persistence_migration.sql)."""
+    doc = _insert_row(db, "documents", p_document)
+    finance = _insert_row(db, "extracted_finance_data", {**p_finance, "document_id": doc["id"]})
+    fraud, seal = {}, None
+    if p_fraud is not None:
+        fraud = _insert_row(db, "fraud_scans", p_fraud)
+        nominal = float(fraud.get("nominal_total") or 0)
+        seal = hashlib.sha256(
+            f"{fraud.get('user_id')}|{fraud['id']}|{nominal}|{fraud['created_at']}|{p_seal_salt}".encode("utf-8")
+        ).hexdigest()
+        fraud["integrity_hash"] = seal
+    return {
+        "document_id": doc["id"],
+        "finance_id": finance["id"],
+        "fraud_scan_id": fraud.get("id"),
+        "created_at": fraud.get("created_at"),
+        "integrity_hash": seal,
+    }
+
+
+def _save_scan_records_batch(db: "FakeSupabase", p_records, p_seal_salt=""):
+    """Mirror of save_scan_records_batch (database/scan_outbox_migration.sql)."""
+    results = []
+    for rec in p_records:
+        key = rec.get("idempotency_key")
+        existing = next((d for d in db.tables.get("documents", []) if key and d.get("idempotency_key") == key), None)
+        if existing:
+            results.append({"idempotency_key": key, "status": "duplicate", "document_id": existing["id"]})
+            continue
+        saved = _save_scan_records(db, {**(rec.get("document") or {}), "idempotency_key": key},
+                                   rec.get("finance") or {}, rec.get("fraud"), p_seal_salt)
+        results.append({"idempotency_key": key, "status": "saved", **saved})
+    return results
+
+
+class FakeSupabase:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.tables: dict = {}
+        self.ids = itertools.count(1)
+        self.functions = {
+            "deduct_credits": lambda db, **kw: _deduct(db, "profiles", **kw),
+            "deduct_user_credits": lambda db, **kw: _deduct(db, "users", **kw),
+            "save_scan_records": _save_scan_records,
+            "save_scan_records_batch": _save_scan_records_batch,
+        }
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: dict) -> _Rpc:
+        return _Rpc(self, name, params)
+
+
+def fake_imagekit_upload(file=None, file_name: str = "scan.jpg", folder: str = "/", **_kwargs) -> dict:
+    return {"url": f"https://ik.example.invalid{folder}/{file_name}", "file_id": "fake"}
+
+
+def install(supabase: Optional[FakeSupabase] = None, llm_base_url: Optional[str] = None):
+    """
+    Point the already-imported backend modules at the fakes.
+    Returns (supabase, redis).
+    """
+    import fakeredis
+    import httpx
+    from openai import AsyncOpenAI
+
+    from config.redis_client import RedisClient
+    from services import ocr_service, queue_service, scan_helpers
+    from services.imagekit_qr_service import ImageKitQRService
+    import utils.auth
+
+    supabase = supabase or FakeSupabase()
+    redis = fakeredis.FakeRedis(decode_responses=True)
+
+    RedisClient._instance = redis
+    RedisClient._sliding_window_script = None
+    queue_service._redis_client = redis
+
+    utils.auth.supabase_admin = supabase
+    scan_helpers.get_supabase_admin = lambda: supabase
+    try:
+        import workers.scan_worker as scan_worker
+        scan_worker.supabase_admin = supabase
+    except ImportError:
+        pass
+
+    ImageKitQRService.upload_file = staticmethod(fake_imagekit_upload)
+
+    ocr_service.groq_clients = []
+    ocr_service.openai_client = None
+    if llm_base_url:
+        ocr_service.openai_client = AsyncOpenAI(
+            api_key="fake", base_url=llm_base_url, max_retries=0,
+            http_client=httpx.AsyncClient(timeout=30.0),
+        )
+    return supabase, redis
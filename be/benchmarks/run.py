@@ -0,0 +1,283 @@
+"""
+Offline benchmark suite for the scan pipeline.
+
+Stages:
+    ocr          OCRService.extract_text_tesseract on generated receipts
+                 (+ the dummy_doc_generator beta documents)
+    regex        _regex_fallback_extraction on the receipts' text
+    stamp        stamp_service.stamp_original_image (image download stubbed)
+    pdf          pdf_service.generate_kasbon_pdf
+    process_job  workers.scan_worker.process_job end-to-end against fakeredis,
+                 FakeSupabase and a local fake LLM server
+
+Run with:
+    python -m benchmarks.run                      # all stages
+    python -m benchmarks.run --stages regex,pdf -n 20 --out bench.json
+    python -m benchmarks.compare before.json after.json
+
+Results are written as JSON (per-stage latency stats in milliseconds plus
+throughput) so runs from different commits can be compared.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fakes
+
+fakes.configure_env()
+
+from benchmarks.corpus import generate_receipts, dummy_documents, write_corpus
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+ALL_STAGES = ["ocr", "regex", "stamp", "pdf", "process_job"]
+
+
+# ── Timing helpers ───────────────────────────────────────────────────────────
+
+def summarize(samples: list, **extra) -> dict:
+    """Latency stats (ms) for a list of per-call durations in seconds."""
+    ms = sorted(s * 1000 for s in samples)
+    total = sum(samples)
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "min_ms": round(ms[0], 3),
+        "max_ms": round(ms[-1], 3),
+        "per_second": round(len(ms) / total, 3) if total else None,
+        **extra,
+    }
+
+
+def time_calls(fn, inputs: list, warmup: int = 1) -> list:
+    for item in inputs[:warmup]:
+        fn(item)
+    samples = []
+    for item in inputs:
+        start = time.perf_counter()
+        fn(item)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def time_async_calls(fn, inputs: list, warmup: int = 1) -> list:
+    for item in inputs[:warmup]:
+        await fn(item)
+    samples = []
+    for item in inputs:
+        start = time.perf_counter()
+        await fn(item)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+# ── Stages ───────────────────────────────────────────────────────────────────
+
+def bench_ocr(receipts: list, workdir: str) -> dict:
+    from services.ocr_service import OCRService
+
+    paths = write_corpus(receipts, os.path.join(workdir, "ocr"))
+    for i, png in enumerate(dummy_documents()):
+        path = os.path.join(workdir, "ocr", f"dummy_{i}.png")
+        with open(path, "wb") as f:
+            f.write(png)
+        paths.append(path)
+
+    samples = asyncio.run(time_async_calls(OCRService.extract_text_tesseract, paths))
+    return summarize(samples)
+
+
+def bench_regex(receipts: list) -> dict:
+    from services.ocr_service import _regex_fallback_extraction
+
+    texts = [r["text"] for r in receipts] * max(1, 200 // max(1, len(receipts)))
+    return summarize(time_calls(_regex_fallback_extraction, texts, warmup=5))
+
+
+def bench_stamp(receipts: list) -> dict:
+    import base64
+    import io
+    from PIL import Image
+    from services import stamp_service
+
+    images = {f"bench://{i}": r["image"] for i, r in enumerate(receipts)}
+    original_download = stamp_service._download_image
+    stamp_service._download_image = lambda url: Image.open(io.BytesIO(images[url])).convert("RGBA")
+
+    sig = Image.new("RGB", (600, 240), (255, 255, 255))
+    from PIL import ImageDraw
+    ImageDraw.Draw(sig).line([(40, 180), (200, 60), (360, 190), (560, 70)], fill=(10, 10, 40), width=8)
+    buf = io.BytesIO()
+    sig.save(buf, format="PNG")
+    sig_b64 = "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+
+    try:
+        samples = time_calls(
+            lambda url: stamp_service.stamp_original_image(
+                url, admin_signature_b64=sig_b64, sha256_hash="0" * 64, nominal=150000,
+            ),
+            list(images),
+        )
+    finally:
+        stamp_service._download_image = original_download
+    return summarize(samples)
+
+
+def bench_pdf(n: int) -> dict:
+    from services.pdf_service import generate_kasbon_pdf
+
+    loans = [
+        {
+            "id": f"loan-{i:05d}",
+            "nik": "3201010101010001",
+            "nominal_pengajuan": 500000 + i * 1000,
+            "status": ["APPROVED", "REJECTED", "PENDING"][i % 3],
+            "submitted_at": "2026-05-10T08:00:00+00:00",
+            "reviewed_at": "2026-05-11T09:30:00+00:00",
+            "ocr_raw": {"tenor_bulan": 3, "cicilan_sistem": 170000, "dsr_status": "AMAN"},
+        }
+        for i in range(n)
+    ]
+    profile = {"full_name": "Budi Santoso", "divisi": "Gudang", "email": "budi@example.com"}
+    return summarize(time_calls(lambda loan: generate_kasbon_pdf(loan, profile, sha256_hash="0" * 64), loans))
+
+
+def bench_process_job(receipts: list, workdir: str, llm_latency: float, supabase_latency: float,
+                      concurrency: int) -> dict:
+    from services.queue_service import enqueue_scan, dequeue_scan, get_job_status
+
+    llm = FakeOpenAIServer(latency=llm_latency)
+    base_url = llm.start()
+    supabase = fakes.FakeSupabase(latency=supabase_latency)
+    fakes.install(supabase=supabase, llm_base_url=base_url)
+
+    import workers.scan_worker as scan_worker
+    user_id = "00000000-0000-0000-0000-000000000001"
+    supabase.tables["profiles"] = [{"id": user_id, "credits": 10_000}]
+
+    job_ids = []
+
+    async def _drain(paths: list) -> list:
+        for path in paths:
+            job_ids.append(enqueue_scan(
+                user_id, path, os.path.basename(path), "Bench", "", "https://ik.example.invalid/x.png",
+            ))
+
+        slots = asyncio.Semaphore(concurrency)
+        durations = []
+
+        async def _one(job):
+            start = time.perf_counter()
+            await scan_worker.process_job(job)
+            durations.append(time.perf_counter() - start)
+            slots.release()
+
+        tasks = []
+        while True:
+            await slots.acquire()
+            job = dequeue_scan(timeout=1)
+            if not job:
+                break
+            tasks.append(asyncio.create_task(_one(job)))
+        await asyncio.gather(*tasks)
+        return durations
+
+    try:
+        # process_job deletes its input file, so write a fresh copy of the corpus
+        paths = write_corpus(receipts, os.path.join(workdir, "jobs"))
+        wall_start = time.perf_counter()
+        samples = asyncio.run(_drain(paths))
+        wall = time.perf_counter() - wall_start
+    finally:
+        llm.stop()
+
+    statuses = {}
+    for job_id in job_ids:
+        status = (get_job_status(job_id) or {}).get("status", "missing")
+        statuses[status] = statuses.get(status, 0) + 1
+    return summarize(
+        samples,
+        concurrency=concurrency,
+        wall_s=round(wall, 3),
+        jobs_per_minute=round(len(samples) / wall * 60, 2) if wall else None,
+        llm_requests=len(llm.requests),
+        supabase_calls=supabase.calls,
+        statuses=statuses,
+    )
+
+
+# ── Entry point ──────────────────────────────────────────────────────────────
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline scan pipeline benchmarks")
+    parser.add_argument("--stages", default=",".join(ALL_STAGES))
+    parser.add_argument("-n", type=int, default=20, help="receipts per stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake LLM latency (s)")
+    parser.add_argument("--supabase-latency", type=float, default=0.02, help="fake Supabase latency per call (s)")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("SCAN_WORKER_CONCURRENCY", "4")))
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(ALL_STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    receipts = generate_receipts(args.n, seed=args.seed)
+    results = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+        "stages": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="otaru-bench-") as workdir:
+        for stage in stages:
+            print(f"▶ {stage} ...", file=sys.stderr)
+            if stage == "ocr":
+                results["stages"][stage] = bench_ocr(receipts, workdir)
+            elif stage == "regex":
+                results["stages"][stage] = bench_regex(receipts)
+            elif stage == "stamp":
+                results["stages"][stage] = bench_stamp(receipts)
+            elif stage == "pdf":
+                results["stages"][stage] = bench_pdf(args.n)
+            elif stage == "process_job":
+                results["stages"][stage] = bench_process_job(
+                    receipts, workdir, args.llm_latency, args.supabase_latency, args.concurrency
+                )
+
+    payload = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(payload)
+        print(f"Results written to {args.out}", file=sys.stderr)
+    else:
+        print(payload)
+    return results
+
+
+if __name__ == "__main__":
+    main()
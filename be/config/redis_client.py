@@ -3,12 +3,54 @@ Redis Client Configuration
 """
 import redis
 import os
+import math
+import time
+import uuid
 from typing import Optional
 import json
 
+# Sliding-window log over N sorted sets, evaluated atomically in Redis.
+# KEYS: one zset per window. ARGV: now_ms, member, then limit, window_ms per key.
+# Returns {allowed, remaining_1, reset_ms_1, remaining_2, reset_ms_2, ...}
+SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local member = ARGV[2]
+local allowed = 1
+local counts = {}
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[1 + i * 2])
+    local window = tonumber(ARGV[2 + i * 2])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    counts[i] = redis.call('ZCARD', key)
+    if counts[i] >= limit then
+        allowed = 0
+    end
+end
+local result = {allowed}
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[1 + i * 2])
+    local window = tonumber(ARGV[2 + i * 2])
+    if allowed == 1 then
+        redis.call('ZADD', key, now, member)
+        counts[i] = counts[i] + 1
+    end
+    local reset = 0
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    if oldest[2] then
+        reset = tonumber(oldest[2]) + window - now
+        redis.call('PEXPIRE', key, window)
+    end
+    table.insert(result, limit - counts[i])
+    table.insert(result, reset)
+end
+return result
+"""
+
+
 class RedisClient:
     _instance: Optional[redis.Redis] = None
     _fallback_cache: dict[str, any] = {}
+    _sliding_window_script = None
     
     @classmethod
     def get_client(cls) -> redis.Redis:
@@ -96,6 +138,42 @@ class RedisClient:
             print(f"⚠️ Redis delete error: {e}")
         return False
     
+    @classmethod
+    def hit_sliding_windows(cls, windows: list[tuple[str, int, int]]) -> Optional[dict]:
+        """
+        Sliding-window-log rate limit over one or more windows, in a single
+        EVALSHA round trip. The request is admitted (and recorded in every
+        window) only if all windows have room.
+
+        - windows: [(key, limit, window_seconds), ...]
+
+        Returns {"allowed": bool, "windows": [{"key", "limit", "remaining", "reset"}]}
+        (reset = seconds until a slot frees up), or None if Redis is unavailable.
+        """
+        client = cls.get_client()
+        if not client:
+            return None
+
+        if cls._sliding_window_script is None:
+            cls._sliding_window_script = client.register_script(SLIDING_WINDOW_LUA)
+
+        now_ms = int(time.time() * 1000)
+        args: list = [now_ms, f"{now_ms}-{uuid.uuid4().hex[:8]}"]
+        for _, limit, window in windows:
+            args.extend([int(limit), int(window) * 1000])
+
+        raw = cls._sliding_window_script(keys=[w[0] for w in windows], args=args)
+        result = {"allowed": bool(raw[0]), "windows": []}
+        for i, (key, limit, _) in enumerate(windows):
+            remaining, reset_ms = int(raw[1 + i * 2]), int(raw[2 + i * 2])
+            result["windows"].append({
+                "key": key,
+                "limit": int(limit),
+                "remaining": max(0, remaining),
+                "reset": max(0, math.ceil(reset_ms / 1000)),
+            })
+        return result
+
     @classmethod
     def check_rate_limit(cls, user_id: int, action: str, limit: int = 5, window: int = 60) -> bool:
         """
@@ -108,48 +186,36 @@ class RedisClient:
         Returns: True if allowed, False if rate limited
         """
         try:
-            client = cls.get_client()
-            if not client:
+            result = cls.hit_sliding_windows([(f"rl:user:{user_id}:{action}", limit, window)])
+            if result is None:
                 return True  # Allow if Redis unavailable
-            
-            key = f"rate_limit:{user_id}:{action}"
-            current = client.get(key)
-            
-            if current is None:
-                # First request
-                client.setex(key, window, 1)
-                return True
-            
-            count = int(current)
-            if count >= limit:
-                return False  # Rate limited
-            
-            # Increment counter
-            client.incr(key)
-            return True
-            
+            return result["allowed"]
         except Exception as e:
             print(f"⚠️ Rate limit check error: {e}")
             return True  # Allow on error
     
     @classmethod
-    def get_rate_limit_info(cls, user_id: int, action: str) -> dict:
-        """Get rate limit info for user"""
+    def get_rate_limit_info(cls, user_id: int, action: str, limit: int = 5, window: int = 60) -> dict:
+        """Get rate limit info for user (read-only, does not count as a request)"""
         try:
             client = cls.get_client()
             if not client:
                 return {"remaining": -1, "reset_in": 0}
             
-            key = f"rate_limit:{user_id}:{action}"
-            current = client.get(key)
-            ttl = client.ttl(key)
-            
-            if current is None:
-                return {"remaining": 5, "reset_in": 0}
+            key = f"rl:user:{user_id}:{action}"
+            now_ms = int(time.time() * 1000)
+            pipe = client.pipeline()
+            pipe.zremrangebyscore(key, "-inf", now_ms - window * 1000)
+            pipe.zcard(key)
+            pipe.zrange(key, 0, 0, withscores=True)
+            _, count, oldest = pipe.execute()
             
+            reset_in = 0
+            if oldest:
+                reset_in = max(0, math.ceil((oldest[0][1] + window * 1000 - now_ms) / 1000))
             return {
-                "remaining": max(0, 5 - int(current)),
-                "reset_in": ttl if ttl > 0 else 0
+                "remaining": max(0, limit - int(count)),
+                "reset_in": reset_in
             }
         except:
             return {"remaining": -1, "reset_in": 0}
@@ -113,12 +113,36 @@ class Settings:
     
     # Tesseract
     TESSERACT_CMD: str = os.getenv('TESSERACT_CMD', r'C:\Program Files\Tesseract-OCR\tesseract.exe')
+    OCR_POOL_SIZE: int = int(os.getenv('OCR_POOL_SIZE', '2'))  # 0 = run OCR on a thread instead
+    OCR_ENGINE: str = os.getenv('OCR_ENGINE', 'cli')  # cli | tesserocr (optional package, models stay loaded) | pytesseract
+    OCR_DEFAULT_PROFILE: str = os.getenv('OCR_DEFAULT_PROFILE', 'default')  # default | receipt | document | id_card | digits
+    OCR_TESSDATA_FAST_DIR: str = os.getenv('OCR_TESSDATA_FAST_DIR', '')  # tessdata_fast models; empty = installed tessdata
+    OCR_TESSDATA_BEST_DIR: str = os.getenv('OCR_TESSDATA_BEST_DIR', '')  # tessdata_best models; empty = installed tessdata
+    OCR_PREPROCESS: bool = os.getenv('OCR_PREPROCESS', 'true').lower() == 'true'  # crop to the paper + deskew before Tesseract
+    OCR_PDF_DPI: int = int(os.getenv('OCR_PDF_DPI', '200'))  # rasterization DPI for PDF uploads
+    OCR_PDF_MAX_PAGES: int = int(os.getenv('OCR_PDF_MAX_PAGES', '10'))
+    OCR_PDF_MAX_PIXELS: int = int(os.getenv('OCR_PDF_MAX_PIXELS', str(40_000_000)))  # total across pages; 0 = no cap
+    OCR_TASK_TIMEOUT: int = int(os.getenv('OCR_TASK_TIMEOUT', '60'))  # seconds per Tesseract call (per page), counted while it runs
+    OCR_CACHE_TTL: int = int(os.getenv('OCR_CACHE_TTL', str(7 * 24 * 3600)))  # 0 = disable OCR result cache
+    OCR_CACHE_FALLBACK_TTL: int = int(os.getenv('OCR_CACHE_FALLBACK_TTL', '300'))  # results built without the LLM (providers down); 0 = don't cache them
+    SCAN_WORKER_CONCURRENCY: int = int(os.getenv('SCAN_WORKER_CONCURRENCY', '4'))  # jobs in flight per worker
+    SCAN_LLM_BATCH_SIZE: int = int(os.getenv('SCAN_LLM_BATCH_SIZE', '4'))  # documents per extraction request; 1 = no batching
+    SCAN_LLM_BATCH_WAIT: float = float(os.getenv('SCAN_LLM_BATCH_WAIT', '0.5'))  # seconds to wait for more documents
+    SCAN_VISIBILITY_TIMEOUT: int = int(os.getenv('SCAN_VISIBILITY_TIMEOUT', '300'))  # seconds a worker may hold a job
+    SCAN_MAX_ATTEMPTS: int = int(os.getenv('SCAN_MAX_ATTEMPTS', '3'))
+    SCAN_RETRY_BASE_DELAY: int = int(os.getenv('SCAN_RETRY_BASE_DELAY', '5'))  # seconds, doubled per attempt
+    SCAN_OUTBOX_ENABLED: bool = os.getenv('SCAN_OUTBOX_ENABLED', 'false').lower() == 'true'  # write scan records via the Redis Stream outbox; needs scan_outbox_migration.sql
+    SCAN_OUTBOX_BATCH_SIZE: int = int(os.getenv('SCAN_OUTBOX_BATCH_SIZE', '50'))  # records per Supabase call
+    SCAN_OUTBOX_MAX_ATTEMPTS: int = int(os.getenv('SCAN_OUTBOX_MAX_ATTEMPTS', '5'))  # rejected by the database this often -> dead stream
+    SCAN_OUTBOX_RETRY_BASE_DELAY: int = int(os.getenv('SCAN_OUTBOX_RETRY_BASE_DELAY', '5'))  # seconds, doubled per attempt
+    SCAN_OUTBOX_CLAIM_IDLE: int = int(os.getenv('SCAN_OUTBOX_CLAIM_IDLE', '60'))  # seconds before a stopped consumer's records are taken over
     
     # Supabase (Cari VITE_ atau Biasa)
     SUPABASE_URL: str = os.getenv('SUPABASE_URL') or os.getenv('VITE_SUPABASE_URL', '')
     SUPABASE_ANON_KEY: str = os.getenv('SUPABASE_ANON_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY', '')
     SUPABASE_SERVICE_ROLE_KEY: str = os.getenv('SUPABASE_SERVICE_ROLE_KEY', '')
     SUPABASE_JWT_SECRET: str = os.getenv('SUPABASE_JWT_SECRET', '')
+    AUTH_USER_CACHE_TTL: int = int(os.getenv('AUTH_USER_CACHE_TTL', '60'))  # seconds; 0 = resolve user on every request
     
     # Google Drive API
     GOOGLE_API_KEY: str = os.getenv('GOOGLE_API_KEY', '')
@@ -139,6 +163,12 @@ class Settings:
     GEMINI_API_KEY: str = os.getenv('GEMINI_API_KEY', '')
     GEMINI_BASE_URL: str = os.getenv('GEMINI_BASE_URL', '')
     GEMINI_MODEL: str = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+    LLM_HEDGE_DELAY: float = float(os.getenv('LLM_HEDGE_DELAY', '2.0'))  # seconds before firing the next provider; 0 = sequential
+    OCR_COMBINED_EXTRACTION: bool = os.getenv('OCR_COMBINED_EXTRACTION', 'false').lower() == 'true'  # one LLM call for cleanup + fields; takes precedence over the scan worker's SCAN_LLM_BATCH_SIZE batching
+    LLM_FIELD_TOKEN_BUDGET: int = int(os.getenv('LLM_FIELD_TOKEN_BUDGET', '600'))  # OCR text tokens sent for field extraction; 0 = no limit
+    LLM_CIRCUIT_FAILURES: int = int(os.getenv('LLM_CIRCUIT_FAILURES', '3'))  # consecutive failures before a provider is skipped
+    LLM_CIRCUIT_OPEN_SECONDS: float = float(os.getenv('LLM_CIRCUIT_OPEN_SECONDS', '30'))
+    LLM_RATE_LIMIT_COOLDOWN: float = float(os.getenv('LLM_RATE_LIMIT_COOLDOWN', '20'))  # after a 429 without Retry-After
 
     # Kasbon fast queue mode (testing): skip OCR and push directly to approval queue
     KASBON_FAST_QUEUE: bool = os.getenv('KASBON_FAST_QUEUE', 'false').lower() == 'true'
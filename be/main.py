@@ -55,7 +55,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type", "Accept", "Origin", "X-Requested-With", "x-api-key"],
-    expose_headers=["Content-Disposition", "Content-Length"],
+    expose_headers=["Content-Disposition", "Content-Length", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After", "X-Next-Cursor", "X-Total-Count"],
 )
 
 # Global exception handler — ensures CORS headers are present even on 500 crashes.
@@ -127,6 +127,46 @@ app.include_router(kasbon_admin.router, tags=["Kasbon Admin"])
 
 app.include_router(gamification.router)  # /api/v1/gamification/* — badge progress
 
+@app.on_event("startup")
+async def warm_ocr_pool():
+    """Spawn the Tesseract process pool up front so the first scans don't pay for it."""
+    import asyncio
+    from services.ocr_pool import warm_pool
+    await asyncio.to_thread(warm_pool)
+
+
+@app.on_event("shutdown")
+async def stop_ocr_pool():
+    from services.ocr_pool import shutdown_pool
+    shutdown_pool()
+
+
+_outbox_task = None
+
+
+@app.on_event("startup")
+async def start_scan_outbox():
+    """Drain the Supabase scan outbox (services.scan_outbox) from every API process."""
+    global _outbox_task
+    if settings.SCAN_OUTBOX_ENABLED:
+        import asyncio
+        from services.scan_outbox import run_consumer
+        _outbox_task = asyncio.create_task(run_consumer())
+
+
+@app.on_event("shutdown")
+async def stop_scan_outbox():
+    """Let the batch in flight finish; anything left pending is claimed by another consumer."""
+    if _outbox_task is not None:
+        import asyncio
+        from services.scan_outbox import stop_consumer
+        stop_consumer()
+        try:
+            await asyncio.wait_for(_outbox_task, timeout=10)
+        except asyncio.TimeoutError:
+            _outbox_task.cancel()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
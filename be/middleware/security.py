@@ -5,7 +5,6 @@ from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from config.redis_client import RedisClient
-import time
 from typing import Callable
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
@@ -30,6 +29,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     
     # Global rate limit (per IP)
     GLOBAL_LIMIT = 100  # 100 req/min per IP
+    WINDOW_SECONDS = 60  # sliding window length for all limits above
     
     async def dispatch(self, request: Request, call_next: Callable):
         # Skip rate limiting for health checks
@@ -42,80 +42,51 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         if forwarded:
             client_ip = forwarded.split(",")[0].strip()
         
-        # Check global rate limit (per IP)
-        if not self._check_global_rate_limit(client_ip):
+        # Global window (per IP) + endpoint-specific window, checked in one round trip
+        path = request.url.path
+        windows = [(f"rl:global:{client_ip}", self.GLOBAL_LIMIT, self.WINDOW_SECONDS)]
+        if path in self.RATE_LIMITS:
+            # Sanitize path for Redis key
+            path_key = path.replace("/", "_").replace("-", "_")
+            windows.append((f"rl:endpoint:{client_ip}:{path_key}", self.RATE_LIMITS[path], self.WINDOW_SECONDS))
+
+        try:
+            result = RedisClient.hit_sliding_windows(windows)
+        except Exception as e:
+            print(f"⚠️ Rate limit check error: {e}")
+            result = None
+        if result is None:
+            return await call_next(request)  # Allow if Redis unavailable / on error
+
+        headers = self._rate_limit_headers(result["windows"])
+
+        if not result["allowed"]:
+            blocked = next(w for w in result["windows"] if w["remaining"] <= 0)
+            retry_after = max(1, blocked["reset"])
+            if blocked is result["windows"][0]:
+                detail = "Too many requests. Please slow down."
+            else:
+                detail = f"Rate limit exceeded for {path}. Max {blocked['limit']} requests per minute."
             return JSONResponse(
                 status_code=429,
-                content={
-                    "detail": "Too many requests. Please slow down.",
-                    "retry_after": 60
-                }
+                content={"detail": detail, "retry_after": retry_after},
+                headers={**headers, "Retry-After": str(retry_after)},
             )
         
-        # Check endpoint-specific rate limit
-        path = request.url.path
-        if path in self.RATE_LIMITS:
-            limit = self.RATE_LIMITS[path]
-            if not self._check_endpoint_rate_limit(client_ip, path, limit):
-                return JSONResponse(
-                    status_code=429,
-                    content={
-                        "detail": f"Rate limit exceeded for {path}. Max {limit} requests per minute.",
-                        "retry_after": 60
-                    }
-                )
-        
         # Process request
         response = await call_next(request)
+        response.headers.update(headers)
         return response
     
-    def _check_global_rate_limit(self, ip: str) -> bool:
-        """Check global rate limit per IP"""
-        try:
-            client = RedisClient.get_client()
-            if not client:
-                return True  # Allow if Redis unavailable
-            
-            key = f"global_rate:{ip}"
-            current = client.get(key)
-            
-            if current is None:
-                client.setex(key, 60, 1)
-                return True
-            
-            count = int(current)
-            if count >= self.GLOBAL_LIMIT:
-                return False
-            
-            client.incr(key)
-            return True
-        except:
-            return True  # Allow on error
-    
-    def _check_endpoint_rate_limit(self, ip: str, path: str, limit: int) -> bool:
-        """Check endpoint-specific rate limit"""
-        try:
-            client = RedisClient.get_client()
-            if not client:
-                return True
-            
-            # Sanitize path for Redis key
-            path_key = path.replace("/", "_").replace("-", "_")
-            key = f"endpoint_rate:{ip}:{path_key}"
-            current = client.get(key)
-            
-            if current is None:
-                client.setex(key, 60, 1)
-                return True
-            
-            count = int(current)
-            if count >= limit:
-                return False
-            
-            client.incr(key)
-            return True
-        except:
-            return True
+    @staticmethod
+    def _rate_limit_headers(windows: list) -> dict:
+        """Standard RateLimit-* headers for the most restrictive window."""
+        tightest = min(windows, key=lambda w: (w["remaining"], -w["reset"]))
+        return {
+            "RateLimit-Limit": str(tightest["limit"]),
+            "RateLimit-Remaining": str(tightest["remaining"]),
+            "RateLimit-Reset": str(tightest["reset"]),
+        }
 
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
     """Add security headers to all responses"""
@@ -0,0 +1,14 @@
+-- ============================================================
+-- Migration 008: Index for keyset pagination of scans
+--
+-- Problem: GET /api/scans and /api/scans/history paged with
+-- OFFSET over ORDER BY created_at DESC, so every deep page
+-- sorted and skipped all newer scans of the user.
+--
+-- Fix: ?cursor= pages on (created_at, id) after the last row
+-- returned; this index serves both the user filter and the
+-- order, and the cursor condition starts the scan in place.
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS ix_scans_user_created_id
+  ON scans (user_id, created_at, id);
@@ -2,7 +2,7 @@
 Database models using SQLAlchemy
 Updated to include Teams and Community features
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from config.database import Base
@@ -65,6 +65,11 @@ class Scan(Base):
     # Relationships
     user = relationship("User", back_populates="scans")
 
+    __table_args__ = (
+        # Keyset pagination of a user's scans, newest first (migrations/008)
+        Index("ix_scans_user_created_id", "user_id", "created_at", "id"),
+    )
+
 
 class Invoice(Base):
     """Invoice model for invoice.wtf"""
@@ -54,6 +54,24 @@ class ScanResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ScanListItem(BaseModel):
+    """ScanResponse for GET /api/scans: only the requested `fields` are returned."""
+    id: int
+    user_id: Optional[str] = None
+    original_filename: Optional[str] = None
+    extracted_text: Optional[str] = None
+    confidence_score: Optional[float] = None
+    processing_time: Optional[float] = None
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    imagekit_url: Optional[str] = None
+    signature_url: Optional[str] = None
+    recipient_name: Optional[str] = None
+    file_path: Optional[str] = None
+    is_fraud_scan: Optional[bool] = None
+    fraud_fields: Optional[dict] = None
+
 # Review Schemas
 class ReviewCreate(BaseModel):
     rating: int = Field(ge=1, le=5)
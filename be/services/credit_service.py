@@ -1,13 +1,43 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Optional
 
 from config.redis_client import RedisClient
 
 MAX_CREDITS = 10
 DAILY_CREDIT_BONUS = 1
 
+# Postgres functions from database/credit_deduction_migration.sql
+_DEDUCT_RPC = {"profiles": "deduct_credits", "users": "deduct_user_credits"}
+
+
+def deduct_credits(
+    sb: Any,
+    user_id: str,
+    amount: int = 1,
+    *,
+    allow_partial: bool = False,
+    table: str = "profiles",
+) -> Optional[int]:
+    """
+    Atomically deduct `amount` credits in a single round trip.
+    Returns the new balance, or None when the row is missing or has fewer
+    than `amount` credits (nothing is deducted then). With allow_partial the
+    balance is clamped at 0 instead of refusing.
+    """
+    res = sb.rpc(_DEDUCT_RPC[table], {
+        "p_user_id": str(user_id),
+        "p_amount": int(amount),
+        "p_allow_partial": allow_partial,
+    }).execute()
+    data = getattr(res, "data", None)
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if isinstance(data, dict):
+        data = next(iter(data.values()), None)
+    return int(data) if data is not None else None
+
 
 def grant_daily_credit_bonus(sb: Any, user_id: str) -> dict:
     """
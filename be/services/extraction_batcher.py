@@ -0,0 +1,74 @@
+"""
+Micro-batcher for structured field extraction in the scan worker.
+
+During a batch-scan burst several jobs reach the extraction step within a
+second of each other. Instead of one LLM request per document (each paying
+request overhead and the full system prompt), jobs wait up to
+SCAN_LLM_BATCH_WAIT seconds for company and up to SCAN_LLM_BATCH_SIZE texts
+go out in one OCRService.extract_fields_batch request. Documents the model
+does not answer for fall back to per-document calls there.
+
+    batcher = FieldExtractionBatcher()
+    fields = await batcher.extract(text, job_id)
+"""
+import asyncio
+from typing import Optional
+
+from config.settings import settings
+from services.ocr_service import OCRService
+
+
+class FieldExtractionBatcher:
+    def __init__(self, max_batch: Optional[int] = None, max_wait: Optional[float] = None):
+        self.max_batch = max(1, max_batch if max_batch is not None else settings.SCAN_LLM_BATCH_SIZE)
+        self.max_wait = max_wait if max_wait is not None else settings.SCAN_LLM_BATCH_WAIT
+        self._pending: list = []  # (job_id, text, future)
+        self._timer: Optional[asyncio.Task] = None
+        self._running: set[asyncio.Task] = set()  # the loop only keeps weak references to tasks
+
+    async def extract(self, text: str, job_id: str) -> dict:
+        if self.max_batch == 1:
+            return await OCRService.extract_fields_structured(text)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((job_id, text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_wait)
+        self._timer = None
+        self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: list):
+        texts = {job_id: text for job_id, text, _ in batch}
+        try:
+            results = await OCRService.extract_fields_batch(texts)
+        except Exception as e:
+            print(f"Batch extraction error: {e}")
+            results = {}
+
+        for job_id, text, future in batch:
+            if future.done():
+                continue
+            fields = results.get(job_id)
+            if fields is None:
+                try:
+                    fields = await OCRService.extract_fields_structured(text)
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+            future.set_result(fields)
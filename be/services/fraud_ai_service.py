@@ -16,34 +16,36 @@ approve / reject decisions.
 from __future__ import annotations
 
 import json
-import os
 import re
 import traceback
 from typing import TypedDict
 
-# ── Gemini SDK ────────────────────────────────────────────────────────────────
+# ── LLM providers ─────────────────────────────────────────────────────────────
+# Gemini proxy first, Groq keys as fallback, ranked by services.llm_router.
 
-_gemini_client = None
+llm_router = None
 
 try:
-    import openai
+    from services.llm_router import llm_router, llm_candidates
 
-    _GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
-    _GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
-    _GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-
-    if _GEMINI_API_KEY:
-        _gemini_client = openai.OpenAI(
-            api_key=_GEMINI_API_KEY,
-            base_url=_GEMINI_BASE_URL if _GEMINI_BASE_URL else None
-        )
-        print("✅ Gemini AI initialized via OpenAI Proxy for Fraud Detection")
+    if llm_candidates():
+        print("✅ AI Fraud Detection initialized via LLM router (Gemini proxy + Groq fallback)")
     else:
-        print("⚠️  GEMINI_API_KEY not set — AI Fraud Detection disabled")
+        print("⚠️  GEMINI_API_KEY / GROQ_API_KEY_* not set — AI Fraud Detection disabled")
 except ImportError:
     print("⚠️  openai package not installed — AI Fraud Detection disabled")
 except Exception as exc:
-    print(f"⚠️  Gemini proxy init failed: {exc}")
+    print(f"⚠️  LLM router init failed: {exc}")
+
+
+def _fraud_candidates() -> list:
+    if not llm_router:
+        return []
+    try:
+        return llm_candidates()
+    except Exception as exc:
+        print(f"[FraudAI] LLM providers unavailable: {exc}")
+        return []
 
 
 # ── Types ─────────────────────────────────────────────────────────────────────
@@ -84,7 +86,8 @@ async def analyze_fraud_with_gemini(
     ``NEEDS_REVIEW`` with a descriptive reason so the queue is never blocked.
     """
 
-    if not _gemini_client:
+    candidates = _fraud_candidates()
+    if not candidates:
         return FraudResult(
             status="NEEDS_REVIEW",
             reason="Analisis AI tidak tersedia (API key belum dikonfigurasi). Admin harus review manual.",
@@ -106,8 +109,9 @@ async def analyze_fraud_with_gemini(
     user_prompt = f"{context_label}\n\nOCR TEXT:\n{trimmed}"
 
     try:
-        response = _gemini_client.chat.completions.create(
-            model=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+        _, response = await llm_router.complete(
+            candidates,
+            label="fraud analysis",
             messages=[
                 {"role": "system", "content": FRAUD_SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt}
@@ -386,7 +386,7 @@ async def kasbon_process_document(sb, image_url: str, telegram_chat_id: Optional
                     tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
                     tmp.write(resp_img.content)
                     tmp.close()
-                    raw_text_fb, _, _ = await OCRService.extract_text_tesseract(tmp.name)
+                    raw_text_fb, _, _ = await OCRService.extract_text_tesseract(tmp.name, profile="receipt")
                     os.unlink(tmp.name)
                     _, nominal_ocr = extract_nik_and_nominal(raw_text_fb or "")
                     if nominal_ocr and nominal_ocr > 0:
@@ -439,7 +439,7 @@ async def kasbon_process_document(sb, image_url: str, telegram_chat_id: Optional
         tmp.write(resp.content)
         tmp.close()
         tmp_name = tmp.name
-        raw_text_extracted, conf_score, _ = await OCRService.extract_text_tesseract(tmp_name)
+        raw_text_extracted, conf_score, _ = await OCRService.extract_text_tesseract(tmp_name, profile="id_card")
     except Exception as exc:
         raise HTTPException(status_code=422, detail=f"OCR gagal: {exc}")
     finally:
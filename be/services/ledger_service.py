@@ -6,6 +6,10 @@ any manual tampering in the Supabase database.
 
 Hash formula:
   SHA-256( user_id | scan_id | nominal_total | created_at | LEDGER_SECRET_SALT )
+
+New scans are sealed by the database at insert time (save_scan_records in
+database/scan_persistence_migration.sql computes the same formula); keep the
+two in sync. seal_scan is for re-sealing and backfilling older rows.
 """
 
 import hashlib
@@ -81,7 +85,7 @@ def verify_row_integrity(row: dict) -> dict:
 def seal_scan(supabase_admin, scan_row: dict) -> Optional[str]:
     """
     Compute and store the integrity_hash on a fraud_scans row.
-    Called right after insert.  Returns the hash string or None on failure.
+    Used to (re-)seal existing rows.  Returns the hash string or None on failure.
     """
     if not supabase_admin:
         return None
@@ -0,0 +1,110 @@
+"""
+Relevance-ranked line selection for LLM prompts.
+
+extract_fields_structured used to send text[:3000]: headers and boilerplate
+ate the budget and totals printed late on long receipts were cut off. Here
+each OCR line is scored locally (field keywords, Rupiah amounts, dates,
+NPWP, document codes, digit density, header position, minus item lines and
+boilerplate) and the best lines are kept within a token budget, in their
+original order.
+
+Text that already fits the budget is returned unchanged.
+"""
+import re
+from typing import Optional
+
+from config.settings import settings
+
+CHARS_PER_TOKEN = 4  # rough estimate for mixed Indonesian/English OCR text
+HEADER_LINES = 3     # merchant name / address usually sit at the top
+PSEUDO_LINE_WORDS = 12
+
+_STRONG_KEYWORDS = re.compile(
+    r'grand\s*total|\btotal\b|jumlah|tagihan|sub\s*total|\bppn\b|\bdpp\b|npwp|faktur|invoice|'
+    r'jatuh\s*tempo|due\s*date|kuitansi|surat\s*jalan|telah\s*diterima|sebesar|bill\s*to',
+    re.IGNORECASE,
+)
+_MEDIUM_KEYWORDS = re.compile(
+    r'\bno\b\.?|nomor|tanggal|\btgl\b|\bdate\b|kepada|\byth\b|penerima|customer|pembayaran|'
+    r'tunai|cash|debit|kredit|credit|transfer|qris|gopay|\bovo\b|\bdana\b|\btid\b|\bmid\b|'
+    r'transaksi|approval|auth|ref|trace|merchant|kasir|\bpt\b|\bcv\b|\bud\b|toko',
+    re.IGNORECASE,
+)
+_AMOUNT = re.compile(r'\bRp\.?\s*\d|\d{1,3}(?:[.,]\d{3})+(?!\d)')
+_DATE = re.compile(r'\b\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4}\b|\b\d{4}-\d{2}-\d{2}\b')
+_DOC_CODE = re.compile(r'\b[A-Z]{2,}[-/]?\d[\w/\-]*')  # INV-2025-001, SJ/0042
+_ITEM_LINE = re.compile(r'\d+\s*[xX@]\s*(?:Rp\.?\s*)?\d')  # "2 x 15.000": line items rarely hold fields
+_NPWP = re.compile(r'\b\d{2}\.\d{3}\.\d{3}\.\d[-.]\d{3}\.\d{3}\b')
+_BOILERPLATE = re.compile(
+    r'terima\s*kasih|thank\s*you|barang\s*yang\s*sudah|tidak\s*dapat\s*(?:ditukar|dikembalikan)|'
+    r'simpan\s*struk|layanan\s*konsumen|kritik|saran|www\.|https?://|@|selamat\s*berbelanja',
+    re.IGNORECASE,
+)
+_SEPARATOR = re.compile(r'^[\W_]+$')
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def score_line(line: str, index: int) -> float:
+    """Higher = more likely to carry an extractable field."""
+    stripped = line.strip()
+    if not stripped or _SEPARATOR.match(stripped):
+        return -10.0
+
+    score = 0.0
+    score += 3.0 * len(_STRONG_KEYWORDS.findall(stripped))
+    score += 1.0 * min(len(_MEDIUM_KEYWORDS.findall(stripped)), 3)
+    if _AMOUNT.search(stripped):
+        score += 2.0
+    if _DATE.search(stripped):
+        score += 2.0
+    if _NPWP.search(stripped):
+        score += 3.0
+    if _DOC_CODE.search(stripped):
+        score += 1.5
+    if _ITEM_LINE.search(stripped):
+        score -= 2.0
+    digits = sum(ch.isdigit() for ch in stripped)
+    score += 2.0 * min(digits / len(stripped), 0.5)
+    if index < HEADER_LINES:
+        score += 1.5
+    if _BOILERPLATE.search(stripped):
+        score -= 3.0
+    return score
+
+
+def _split_lines(text: str) -> list:
+    lines = text.splitlines()
+    if len(lines) > 1:
+        return lines
+    # Single-line OCR output: fall back to fixed-size word windows
+    words = text.split()
+    return [" ".join(words[i:i + PSEUDO_LINE_WORDS]) for i in range(0, len(words), PSEUDO_LINE_WORDS)]
+
+
+def select_relevant_lines(text: str, token_budget: Optional[int] = None) -> str:
+    """
+    Keep the highest-scoring lines that fit in token_budget
+    (settings.LLM_FIELD_TOKEN_BUDGET), in their original order.
+    """
+    if token_budget is None:
+        token_budget = settings.LLM_FIELD_TOKEN_BUDGET
+    if not text or token_budget <= 0 or estimate_tokens(text) <= token_budget:
+        return text
+
+    lines = _split_lines(text)
+    scores = [score_line(line, i) for i, line in enumerate(lines)]
+    ranked = sorted(range(len(lines)), key=lambda i: (-scores[i], i))
+
+    chosen, used = [], 0
+    for i in ranked:
+        if scores[i] <= -10.0:
+            break
+        cost = estimate_tokens(lines[i])
+        if used + cost > token_budget:
+            continue
+        chosen.append(i)
+        used += cost
+    return "\n".join(lines[i].strip() for i in sorted(chosen))
@@ -0,0 +1,217 @@
+"""
+Latency-aware routing across the LLM providers (Gemini proxy + Groq keys).
+
+Every caller used to try providers in a fixed or shuffled order, so a key
+that was rate-limited or down kept being tried first on a share of requests
+and burned a full client timeout each time. The router keeps per-provider
+health, shared by every service in the process:
+
+- EWMA latency and EWMA error rate -> expected latency used for ordering
+- 429 cool-down (Retry-After when the provider sends one)
+- circuit breaker: after LLM_CIRCUIT_FAILURES consecutive failures the
+  provider is skipped for LLM_CIRCUIT_OPEN_SECONDS, then gets one probe
+
+Providers are identified by name ("GeminiProxy", "Groq-1", ...), so stats
+for the same key are shared between OCR, fraud analysis, Telegram and
+scan insight.
+
+Usage:
+    from services.llm_router import llm_router, llm_candidates
+
+    name, response = await llm_router.complete(llm_candidates(), messages=[...], temperature=0.2)
+
+or, for callers with their own fallback loop, llm_router.order(candidates)
+plus record_success()/record_failure().
+"""
+import inspect
+import threading
+import time
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from config.settings import settings
+
+EWMA_ALPHA = 0.3
+DEFAULT_LATENCY = 2.0  # prior (seconds) for providers without samples yet
+GEMINI_DEFAULT_BASE_URL = "https://ai.sumopod.com/v1"  # Gemini proxy when GEMINI_BASE_URL is unset
+
+
+class ProviderHealth:
+    """Rolling health stats for one provider."""
+
+    def __init__(self):
+        self.latency: Optional[float] = None  # EWMA seconds
+        self.error_rate = 0.0                 # EWMA of failures, 0..1
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0             # 429 back-off (monotonic time)
+        self.open_until = 0.0                 # circuit breaker (monotonic time)
+        self.calls = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until and now >= self.open_until
+
+    def expected_latency(self) -> float:
+        latency = self.latency if self.latency is not None else DEFAULT_LATENCY
+        return latency / max(1.0 - self.error_rate, 0.1)
+
+    def _observe(self, latency: Optional[float], failed: bool):
+        self.calls += 1
+        if latency is not None:
+            self.latency = latency if self.latency is None else (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency
+            )
+        self.error_rate = EWMA_ALPHA * (1.0 if failed else 0.0) + (1 - EWMA_ALPHA) * self.error_rate
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMRouter:
+    def __init__(self):
+        self._health: dict = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str) -> ProviderHealth:
+        health = self._health.get(name)
+        if health is None:
+            health = self._health[name] = ProviderHealth()
+        return health
+
+    def order(self, candidates: list) -> list:
+        """
+        Sort (name, client, model) candidates by expected latency, dropping
+        providers that are cooling down or have an open circuit. Ties keep the
+        given priority order. If every provider is unavailable, only the one
+        that recovers first is returned (as a probe).
+        """
+        if not candidates:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            health = {c[0]: self._get(c[0]) for c in candidates}
+            ranked = sorted(enumerate(candidates), key=lambda ic: (health[ic[1][0]].expected_latency(), ic[0]))
+            up = [c for _, c in ranked if health[c[0]].available(now)]
+            if up:
+                return up
+            return [min(candidates, key=lambda c: max(health[c[0]].cooldown_until, health[c[0]].open_until))]
+
+    def record_success(self, name: str, latency: float):
+        with self._lock:
+            health = self._get(name)
+            health._observe(latency, failed=False)
+            health.consecutive_failures = 0
+            health.open_until = 0.0
+
+    def record_failure(self, name: str, error: Optional[Exception] = None, latency: Optional[float] = None):
+        """
+        Record a failed call. A 429 puts the provider on cool-down; other
+        failures count toward the circuit breaker.
+        """
+        now = time.monotonic()
+        with self._lock:
+            health = self._get(name)
+            health._observe(latency, failed=True)
+            health.failures += 1
+
+            if getattr(error, "status_code", None) == 429:
+                cooldown = _retry_after(error) or settings.LLM_RATE_LIMIT_COOLDOWN
+                health.cooldown_until = now + cooldown
+                print(f"LLM router: {name} rate-limited, cooling down {cooldown:.0f}s")
+                return
+
+            health.consecutive_failures += 1
+            if health.consecutive_failures >= settings.LLM_CIRCUIT_FAILURES:
+                health.open_until = now + settings.LLM_CIRCUIT_OPEN_SECONDS
+                print(f"LLM router: circuit open for {name} "
+                      f"({health.consecutive_failures} consecutive failures)")
+
+    async def complete(self, candidates: list, *, label: str = "completion", **kwargs):
+        """
+        chat.completions.create(model=..., **kwargs) on the best available
+        provider, falling back down the ranked list. Works with both sync and
+        async OpenAI clients. Returns (name, response); raises the last error
+        if every provider fails.
+        """
+        last_error: Optional[Exception] = None
+        for name, client, model in self.order(candidates):
+            start = time.monotonic()
+            try:
+                response = client.chat.completions.create(model=model, **kwargs)
+                if inspect.isawaitable(response):
+                    response = await response
+            except Exception as e:
+                self.record_failure(name, e, time.monotonic() - start)
+                print(f"{name} {label} failed: {e}")
+                last_error = e
+                continue
+            self.record_success(name, time.monotonic() - start)
+            return name, response
+        raise last_error or RuntimeError("No LLM provider configured")
+
+    def snapshot(self) -> dict:
+        """Current per-provider stats (for logs / health endpoints)."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    "latency_ewma": round(h.latency, 3) if h.latency is not None else None,
+                    "error_rate": round(h.error_rate, 3),
+                    "consecutive_failures": h.consecutive_failures,
+                    "cooldown_s": round(max(h.cooldown_until - now, 0), 1),
+                    "circuit_open_s": round(max(h.open_until - now, 0), 1),
+                    "calls": h.calls,
+                    "failures": h.failures,
+                }
+                for name, h in self._health.items()
+            }
+
+
+llm_router = LLMRouter()
+
+
+# --- Shared provider clients ---
+_candidates: Optional[list] = None
+
+
+def llm_candidates() -> list:
+    """
+    (name, AsyncOpenAI client, model) for every configured provider in
+    priority order: Gemini proxy, then the Groq keys. Clients are created
+    once and reused.
+    """
+    global _candidates
+    if _candidates is None:
+        candidates = []
+        if settings.GEMINI_API_KEY:
+            candidates.append((
+                "GeminiProxy",
+                AsyncOpenAI(
+                    api_key=settings.GEMINI_API_KEY,
+                    base_url=settings.GEMINI_BASE_URL or GEMINI_DEFAULT_BASE_URL,
+                    http_client=httpx.AsyncClient(timeout=30.0),
+                ),
+                settings.GEMINI_MODEL,
+            ))
+        for idx, key in enumerate(settings.groq_api_keys):
+            candidates.append((
+                f"Groq-{idx+1}",
+                AsyncOpenAI(
+                    api_key=key,
+                    base_url=settings.GROQ_BASE_URL,
+                    http_client=httpx.AsyncClient(timeout=30.0),
+                ),
+                settings.GROQ_MODEL,
+            ))
+        _candidates = candidates
+    return _candidates
@@ -0,0 +1,92 @@
+"""
+Content-addressed OCR result cache.
+
+The same receipt photo often arrives several times (Telegram retries,
+re-uploads, batch re-submits).  Results are keyed by the SHA-256 of the
+image bytes so a duplicate skips Tesseract and both LLM calls.
+
+Stored in Redis with OCR_CACHE_TTL; when Redis is unavailable a small
+in-process LRU is used instead.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config.redis_client import RedisClient
+from config.settings import settings
+
+OCR_CACHE_PREFIX = "ocr_cache:"
+LOCAL_CACHE_MAX = 256
+
+# content key -> (expires_at, result)
+_local_cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
+
+def hash_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _key(content_hash: str, mode: str) -> str:
+    return f"{OCR_CACHE_PREFIX}{mode}:{content_hash}"
+
+
+def get_cached_result(content_hash: str, mode: str = "ai") -> Optional[dict]:
+    """Return the cached OCR result for this image hash, or None."""
+    if settings.OCR_CACHE_TTL <= 0 or not content_hash:
+        return None
+    key = _key(content_hash, mode)
+
+    client = RedisClient.get_client()
+    if client:
+        try:
+            raw = client.get(key)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            print(f"⚠️ OCR cache get error: {e}")
+
+    entry = _local_cache.get(key)
+    if not entry:
+        return None
+    expires_at, result = entry
+    if expires_at < time.time():
+        _local_cache.pop(key, None)
+        return None
+    _local_cache.move_to_end(key)
+    return result
+
+
+def set_cached_result(content_hash: str, result: dict, mode: str = "ai", ttl: Optional[int] = None) -> None:
+    """Store an OCR result. Only the text/fields are kept, not timings. ttl defaults to OCR_CACHE_TTL."""
+    ttl = settings.OCR_CACHE_TTL if ttl is None else min(ttl, settings.OCR_CACHE_TTL)
+    if ttl <= 0 or not content_hash:
+        return
+    key = _key(content_hash, mode)
+    payload = {
+        "raw_text": result.get("raw_text", ""),
+        "enhanced_text": result.get("enhanced_text", ""),
+        "structured_fields": result.get("structured_fields", {}),
+        "confidence_score": result.get("confidence_score", 0),
+    }
+
+    client = RedisClient.get_client()
+    if client:
+        try:
+            client.setex(key, ttl, json.dumps(payload))
+            return
+        except Exception as e:
+            print(f"⚠️ OCR cache set error: {e}")
+
+    _local_cache[key] = (time.time() + ttl, payload)
+    _local_cache.move_to_end(key)
+    while len(_local_cache) > LOCAL_CACHE_MAX:
+        _local_cache.popitem(last=False)
@@ -0,0 +1,520 @@
+"""
+Process-pool runner for Tesseract OCR.
+
+pytesseract blocks the calling thread for the whole 1–3 s Tesseract run, so
+calling it from an async handler freezes the uvicorn event loop for every
+other request on that worker.  This module keeps a bounded pool of warm
+worker processes and exposes an awaitable entry point:
+
+    text, confidence, elapsed = await run_tesseract(path)
+    text, confidence, elapsed = await run_tesseract_bytes(content)
+    text, confidence, elapsed = await run_tesseract_pdf(pdf_bytes)
+
+Engines (settings.OCR_ENGINE):
+    cli          the tesseract binary with a raw PGM on stdin and TSV on
+                 stdout, so an OCR run touches no temp files (default)
+    tesserocr    the Tesseract C API via the optional tesserocr package; each
+                 pool process keeps one engine with ind+eng loaded, so there
+                 is no process start / traineddata load per document
+    pytesseract  the original subprocess-per-call path
+Failures fall back down that list (tesserocr -> cli -> pytesseract).
+
+Profiles (PROFILES, picked by name or by doc_type via profile_for) set the
+page segmentation mode, OCR engine mode, traineddata flavour (tessdata_fast
+or tessdata_best, see OCR_TESSDATA_*_DIR), working resolution and an
+optional character whitelist. "default" is plain `-l ind+eng` at 1500 px.
+A profile with a fallback re-runs with that profile when its mean word
+confidence is below min_confidence, so fast profiles are only kept where
+they read the document well enough.
+
+Before OCR the image is cropped to the paper and deskewed
+(services.ocr_preprocess, settings.OCR_PREPROCESS).
+
+Only light imports live here (pytesseract + Pillow + NumPy) because every
+pool process imports this module on start-up.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple, Union
+
+import pytesseract
+from PIL import Image
+
+from services.ocr_preprocess import crop_and_deskew
+
+MAX_DIM = 1500  # Longest side fed to Tesseract (balanced speed/quality)
+OCR_LANG = "ind+eng"
+ENGINES = ("cli", "tesserocr", "pytesseract")
+
+# psm/oem None = Tesseract's default; model None = the installed tessdata
+PROFILES = {
+    # Unchanged behaviour for callers that don't pick a profile
+    "default": {"psm": None, "oem": None, "model": None, "max_dim": MAX_DIM, "whitelist": None},
+    # Thermal / shop receipts: one narrow column of short lines
+    "receipt": {"psm": 6, "oem": 1, "model": "fast", "max_dim": 1200, "whitelist": None,
+                "fallback": "document", "min_confidence": 70},
+    # Dense invoices, tax invoices, delivery notes: multi-column layout, small print
+    "document": {"psm": 3, "oem": 1, "model": "best", "max_dim": 2000, "whitelist": None},
+    # KTP / kasbon forms: sparse labelled fields on a patterned background
+    "id_card": {"psm": 11, "oem": 1, "model": "best", "max_dim": 1500, "whitelist": None},
+    # Amount / number regions cropped out of a document
+    "digits": {"psm": 6, "oem": 1, "model": "fast", "max_dim": 1200, "whitelist": "0123456789.,:-/Rp"},
+}
+
+DOC_TYPE_PROFILES = {
+    "nota_toko": "receipt",
+    "struk_edc": "receipt",
+    "qris": "receipt",
+    "bon_manual": "receipt",
+    "receipt": "receipt",
+    "invoice": "document",
+    "faktur_pajak": "document",
+    "surat_jalan": "document",
+    "kuitansi": "document",
+    "ktp": "id_card",
+    "form": "id_card",
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_preprocess: Optional[bool] = None  # set by _init_worker in pool processes
+_tessdata_dirs: Optional[dict] = None  # {"fast": dir, "best": dir}, set by _init_worker
+
+
+def profile_for(name_or_doc_type: Optional[str]) -> str:
+    """Profile name for a profile name or a doc_type; the configured default otherwise."""
+    if name_or_doc_type in PROFILES:
+        return name_or_doc_type
+    if name_or_doc_type in DOC_TYPE_PROFILES:
+        return DOC_TYPE_PROFILES[name_or_doc_type]
+    from config.settings import settings
+    default = settings.OCR_DEFAULT_PROFILE
+    return default if default in PROFILES else "default"
+
+
+# ── Runs inside the pool processes ──────────────────────────────────────────
+
+def _init_worker(
+    tesseract_cmd: str, engine: str = "cli", preprocess: bool = True, tessdata_dirs: Optional[dict] = None,
+) -> None:
+    """
+    Pool initializer — point pytesseract at the same binary as the parent
+    and, for the tesserocr engine, load the language models up front.
+    """
+    global _preprocess, _tessdata_dirs
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    _preprocess = preprocess
+    _tessdata_dirs = tessdata_dirs or {}
+    if engine == "tesserocr":
+        _tesserocr_api()
+
+
+def _noop() -> int:
+    """Used to force the pool to spawn (warm) its processes up front."""
+    return os.getpid()
+
+
+def _prepare(img: Image.Image, max_dim: int = MAX_DIM) -> Image.Image:
+    """Grayscale + paper crop / deskew + downscale before OCR."""
+    # ── Pre-processing: reduce RAM usage ──
+    # 1. Convert to grayscale (reduces memory ~66%, improves OCR)
+    if img.mode != "L":
+        img = img.convert("L")
+
+    # 2. Crop away the table/background around the paper and level the text
+    #    (downscales to max_dim itself, before the rotation)
+    if _preprocess_enabled():
+        w, h = img.size
+        ratio = min(1.0, max_dim / max(w, h))
+        try:
+            img = crop_and_deskew(img, max_dim)
+        except Exception as e:
+            print(f"⚠️ Crop/deskew skipped: {e}")
+        if img.size != (int(w * ratio), int(h * ratio)):
+            print(f"✂️ Cropped/deskewed image {w}x{h} → {img.size[0]}x{img.size[1]}")
+
+    # 3. Resize large images (max 1500px on longest side, or the profile's max_dim)
+    w, h = img.size
+    if max(w, h) > max_dim:
+        ratio = max_dim / max(w, h)
+        img = img.resize((int(w * ratio), int(h * ratio)), Image.LANCZOS)
+        print(f"📐 Resized image from {w}x{h} → {img.size[0]}x{img.size[1]}")
+    return img
+
+
+def _summarize(words: list, confs: list, line_ids: Optional[list] = None) -> Tuple[str, float]:
+    """
+    Join recognised words into text and average the word confidences.
+    With line_ids (Tesseract's block/par/line per word) the original line
+    breaks are kept, which the field extraction relies on.
+    """
+    if line_ids is None:
+        text = " ".join(w for w in words if w.strip())
+    else:
+        lines: dict = {}
+        for word, line_id in zip(words, line_ids):
+            if word.strip():
+                lines.setdefault(line_id, []).append(word.strip())
+        text = "\n".join(" ".join(ws) for ws in lines.values())
+    confidences = [c for c in confs if c > 0]
+    avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+    return text.strip(), avg_confidence
+
+
+def _model_dir(model: Optional[str]) -> Optional[str]:
+    dirs = _tessdata_dirs
+    if dirs is None:
+        dirs = _configured_tessdata_dirs()
+    return dirs.get(model) or None
+
+
+def _profile_args(profile: dict) -> list:
+    """Tesseract command-line options for a profile (also used as pytesseract config)."""
+    args = []
+    path = _model_dir(profile.get("model"))
+    if path:
+        args += ["--tessdata-dir", path]
+    if profile.get("oem") is not None:
+        args += ["--oem", str(profile["oem"])]
+    if profile.get("psm") is not None:
+        args += ["--psm", str(profile["psm"])]
+    if profile.get("whitelist"):
+        args += ["-c", f"tessedit_char_whitelist={profile['whitelist']}"]
+    return args
+
+
+def _tesseract_stdin(img: Image.Image, timeout: float, profile: dict = PROFILES["default"]) -> Tuple[str, float]:
+    """Run the tesseract binary with the image on stdin and TSV on stdout."""
+    buf = io.BytesIO()
+    img.save(buf, format="PPM")  # "L" images are written as PGM; no compression cost
+    try:
+        proc = subprocess.run(
+            [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout", "-l", OCR_LANG, *_profile_args(profile), "tsv"],
+            input=buf.getvalue(),
+            capture_output=True,
+            timeout=timeout or None,
+        )
+    except subprocess.TimeoutExpired:
+        raise RuntimeError("Tesseract process timeout")
+    except FileNotFoundError:
+        raise pytesseract.TesseractNotFoundError()
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.decode(errors="replace").strip() or "tesseract failed")
+
+    words, confs, line_ids = [], [], []
+    for line in proc.stdout.decode("utf-8", errors="replace").splitlines()[1:]:
+        cols = line.split("\t")
+        if len(cols) < 12:
+            continue
+        words.append(cols[11])
+        line_ids.append((cols[1], cols[2], cols[3], cols[4]))
+        try:
+            confs.append(int(float(cols[10])))
+        except ValueError:
+            continue
+    return _summarize(words, confs, line_ids)
+
+
+def _tesseract_pytesseract(img: Image.Image, timeout: float, profile: dict = PROFILES["default"]) -> Tuple[str, float]:
+    # Single Tesseract call — extract text + confidence from data dict
+    data = pytesseract.image_to_data(
+        img, output_type=pytesseract.Output.DICT, lang=OCR_LANG, timeout=timeout,
+        config=shlex.join(_profile_args(profile)),
+    )
+    line_ids = list(zip(data['page_num'], data['block_num'], data['par_num'], data['line_num']))
+    return _summarize(data['text'], [int(conf) for conf in data['conf']], line_ids)
+
+
+# One engine per thread and (traineddata, OEM) pair (PyTessBaseAPI is not
+# thread-safe); in the pool that means one set per process.
+# False = tesserocr unavailable in this process.
+_tesserocr_local = threading.local()
+
+
+def _tesserocr_api(model: Optional[str] = None, oem: Optional[int] = None):
+    apis = getattr(_tesserocr_local, "apis", None)
+    if apis is None:
+        apis = _tesserocr_local.apis = {}
+    path = _model_dir(model) or os.getenv("TESSDATA_PREFIX")
+    key = (path, oem)
+    api = apis.get(key)
+    if api is None:
+        try:
+            import tesserocr
+
+            kwargs = {"lang": OCR_LANG}
+            if path:
+                kwargs["path"] = path
+            if oem is not None:
+                kwargs["oem"] = oem
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            print(f"🔤 tesserocr engine loaded ({OCR_LANG}, {model or 'default'} model) in pid {os.getpid()}")
+        except Exception as e:
+            print(f"⚠️ tesserocr unavailable ({e}), using the tesseract CLI")
+            api = False
+        apis[key] = api
+    return api
+
+
+def _tesseract_tesserocr(img: Image.Image, timeout: float, profile: dict = PROFILES["default"]) -> Tuple[str, float]:
+    api = _tesserocr_api(profile.get("model"), profile.get("oem"))
+    if not api:
+        return _tesseract_stdin(img, timeout, profile)
+    api.SetPageSegMode(profile["psm"] if profile.get("psm") is not None else 3)
+    api.SetVariable("tessedit_char_whitelist", profile.get("whitelist") or "")
+    api.SetImage(img)
+    if not api.Recognize(int(timeout * 1000)):
+        api.Clear()
+        raise RuntimeError("Tesseract process timeout")
+    lines = [" ".join(line.split()) for line in api.GetUTF8Text().splitlines()]
+    confs = list(api.AllWordConfidences())
+    api.Clear()
+    return _summarize(lines, confs, list(range(len(lines))))
+
+
+def _ocr_with_profile(img: Image.Image, timeout: float, engine: str, profile: dict) -> Tuple[str, float]:
+    img = _prepare(img, profile.get("max_dim") or MAX_DIM)
+    if engine == "pytesseract":
+        return _tesseract_pytesseract(img, timeout, profile)
+    try:
+        if engine == "tesserocr":
+            return _tesseract_tesserocr(img, timeout, profile)
+        return _tesseract_stdin(img, timeout, profile)
+    except RuntimeError as e:
+        if "timeout" in str(e):
+            raise
+        print(f"⚠️ Tesseract {engine} engine failed ({e}), falling back to pytesseract")
+        return _tesseract_pytesseract(img, timeout, profile)
+
+
+def _ocr(img: Image.Image, timeout: float, engine: str = "cli", profile: str = "default") -> Tuple[str, float]:
+    spec = PROFILES.get(profile, PROFILES["default"])
+    text, confidence = _ocr_with_profile(img, timeout, engine, spec)
+
+    fallback = spec.get("fallback")
+    if fallback and confidence < spec.get("min_confidence", 0):
+        print(f"🔁 OCR profile {profile} confidence {confidence:.0f} too low, retrying with {fallback}")
+        text2, confidence2 = _ocr_with_profile(img, timeout, engine, PROFILES[fallback])
+        if confidence2 > confidence:
+            return text2, confidence2
+    return text, confidence
+
+
+def tesseract_image(
+    image_path: str, timeout: float = 0, engine: str = "cli", profile: str = "default",
+) -> Tuple[str, float]:
+    """
+    Synchronous Tesseract run on an image file.
+    Returns (text, avg_confidence).
+    """
+    return _ocr(Image.open(image_path), timeout, engine, profile)
+
+
+def tesseract_bytes(
+    content: Union[bytes, Image.Image], timeout: float = 0, engine: str = "cli", profile: str = "default",
+) -> Tuple[str, float]:
+    """
+    Same as tesseract_image for an in-memory upload (encoded bytes or an
+    already decoded PIL image). The image is decoded once, here.
+    """
+    img = content if isinstance(content, Image.Image) else Image.open(io.BytesIO(content))
+    return _ocr(img, timeout, engine, profile)
+
+
+# ── Parent-side pool management ─────────────────────────────────────────────
+
+def _pool_size() -> int:
+    from config.settings import settings
+    return max(0, int(settings.OCR_POOL_SIZE))
+
+
+def _preprocess_enabled() -> bool:
+    if _preprocess is not None:
+        return _preprocess
+    from config.settings import settings
+    return settings.OCR_PREPROCESS
+
+
+def _configured_tessdata_dirs() -> dict:
+    from config.settings import settings
+    return {"fast": settings.OCR_TESSDATA_FAST_DIR, "best": settings.OCR_TESSDATA_BEST_DIR}
+
+
+def _engine() -> str:
+    from config.settings import settings
+    engine = (settings.OCR_ENGINE or "cli").lower()
+    return engine if engine in ENGINES else "cli"
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """Lazily create the shared pool. Returns None when OCR_POOL_SIZE=0."""
+    global _executor
+    if _executor is None:
+        size = _pool_size()
+        if size == 0:
+            return None
+        # "spawn" avoids forking a parent that already holds httpx/Redis
+        # connections and background threads.
+        _executor = ProcessPoolExecutor(
+            max_workers=size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                pytesseract.pytesseract.tesseract_cmd, _engine(), _preprocess_enabled(), _configured_tessdata_dirs(),
+            ),
+        )
+        print(f"🧵 OCR process pool started with {size} worker(s), engine={_engine()}")
+    return _executor
+
+
+def warm_pool() -> None:
+    """Start every pool process now so the first scans don't pay spawn cost."""
+    executor = get_executor()
+    if executor is None:
+        return
+    futures = [executor.submit(_noop) for _ in range(_pool_size())]
+    for f in futures:
+        try:
+            f.result(timeout=60)
+        except Exception as e:
+            print(f"⚠️ OCR pool warm-up failed: {e}")
+            return
+
+
+def shutdown_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _run_on_pool(fn, source, profile: Optional[str] = None) -> Tuple[str, float, float]:
+    from config.settings import settings
+
+    start_time = time.time()
+    timeout = float(settings.OCR_TASK_TIMEOUT)
+    profile = profile_for(profile)
+    loop = asyncio.get_running_loop()
+
+    executor = get_executor()
+    try:
+        # The timeout is enforced per Tesseract call inside the pool process,
+        # so it only counts while the task runs. An asyncio timeout here would
+        # also count time spent waiting for a free pool slot, and cancelling
+        # it would not stop the task anyway.
+        text, confidence = await loop.run_in_executor(executor, fn, source, timeout, _engine(), profile)
+    except RuntimeError as e:
+        if "timeout" in str(e).lower():
+            raise asyncio.TimeoutError(str(e)) from e
+        raise
+    except BrokenProcessPool:
+        # A pool process died (OOM, segfault) — rebuild the pool for next time.
+        print("⚠️ OCR process pool broken, restarting")
+        shutdown_pool()
+        raise
+    return text, confidence, time.time() - start_time
+
+
+async def run_tesseract(image_path: str, profile: Optional[str] = None) -> Tuple[str, float, float]:
+    """
+    Run Tesseract on the pool without blocking the event loop.
+    profile is a PROFILES name or a doc_type (None = OCR_DEFAULT_PROFILE).
+    Returns (text, avg_confidence, elapsed_seconds).
+    Raises asyncio.TimeoutError when a Tesseract call exceeds OCR_TASK_TIMEOUT.
+    """
+    return await _run_on_pool(tesseract_image, image_path, profile)
+
+
+async def run_tesseract_bytes(
+    content: Union[bytes, Image.Image], profile: Optional[str] = None,
+) -> Tuple[str, float, float]:
+    """run_tesseract for in-memory images; bytes go to the pool over its pipe, not disk."""
+    return await _run_on_pool(tesseract_bytes, content, profile)
+
+
+# ── Multi-page PDF ──────────────────────────────────────────────────────────
+
+def is_pdf(content) -> bool:
+    return isinstance(content, (bytes, bytearray)) and content[:5] == b"%PDF-"
+
+
+def _parse_page_size(info: dict) -> Optional[Tuple[float, float]]:
+    """'595.276 x 841.89 pts (A4)' -> (595.276, 841.89) in points."""
+    try:
+        w, _, h = info["Page size"].split()[:3]
+        return float(w), float(h)
+    except (KeyError, ValueError):
+        return None
+
+
+def rasterize_pdf(content: bytes) -> list:
+    """
+    Render PDF pages to grayscale PIL images, capped by OCR_PDF_MAX_PAGES and
+    OCR_PDF_MAX_PIXELS (total across pages). The DPI is lowered first to fit
+    the pixel budget (not below 100), then trailing pages are dropped.
+    """
+    from config.settings import settings
+    from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+
+    max_pages = max(1, settings.OCR_PDF_MAX_PAGES)
+    max_pixels = settings.OCR_PDF_MAX_PIXELS
+    dpi = settings.OCR_PDF_DPI
+
+    info = pdfinfo_from_bytes(content)
+    total_pages = int(info.get("Pages", 1))
+    pages = min(total_pages, max_pages)
+    if total_pages > pages:
+        print(f"📄 PDF has {total_pages} pages, OCR limited to the first {pages}")
+
+    size = _parse_page_size(info)
+    if size and max_pixels > 0:
+        page_pixels = (size[0] / 72 * dpi) * (size[1] / 72 * dpi)
+        if page_pixels * pages > max_pixels:
+            dpi = max(100, int(dpi * (max_pixels / (page_pixels * pages)) ** 0.5))
+            page_pixels = (size[0] / 72 * dpi) * (size[1] / 72 * dpi)
+            pages = max(1, min(pages, int(max_pixels // page_pixels)))
+            print(f"📄 PDF over pixel budget, rasterizing {pages} page(s) at {dpi} DPI")
+
+    images = convert_from_bytes(
+        content, dpi=dpi, first_page=1, last_page=pages, grayscale=True,
+        thread_count=min(pages, 4),
+    )
+
+    # Page sizes vary; enforce the budget on what was actually rendered
+    kept, used = [], 0
+    for img in images:
+        used += img.width * img.height
+        if kept and max_pixels > 0 and used > max_pixels:
+            break
+        kept.append(img)
+    return kept
+
+
+async def run_tesseract_pdf(content: bytes, profile: Optional[str] = None) -> Tuple[str, float, float]:
+    """
+    Rasterize a PDF (on a thread) and OCR its pages concurrently on the pool.
+    At most OCR_POOL_SIZE pages of one document are in flight, so a long PDF
+    shares the pool with other jobs instead of queueing ahead of them.
+    Returns (text in page order, mean page confidence, elapsed_seconds).
+    """
+    start_time = time.time()
+    pages = await asyncio.to_thread(rasterize_pdf, content)
+    slots = asyncio.Semaphore(max(1, _pool_size()))
+
+    async def _page(img):
+        async with slots:
+            return await _run_on_pool(tesseract_bytes, img, profile)
+
+    results = await asyncio.gather(*(_page(img) for img in pages))
+    text = "\n\n".join(t for t, _, _ in results if t)
+    confidences = [c for _, c, _ in results if c > 0]
+    avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+    return text, avg_confidence, time.time() - start_time
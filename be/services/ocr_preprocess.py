@@ -0,0 +1,196 @@
+"""
+Paper crop + deskew before Tesseract.
+
+Phone photos of receipts show a lot of table / background around the paper
+and are rarely straight. Both cost Tesseract time and produce the noisy text
+that later needs LLM repair. All analysis runs on a small grayscale thumbnail
+with NumPy projection profiles; only the final rotate + crop touches the
+full-resolution image:
+
+    1. Otsu threshold -> bright (paper) mask, closed so text strokes don't
+       punch holes in it
+    2. dark pixels inside the paper = text; the rotation that makes the text
+       rows sharpest (largest squared difference between adjacent row sums)
+       is the skew angle
+    3. the rotated paper mask's row/column profiles give the crop box
+
+Scans and screenshots (paper everywhere, no skew) come back unchanged.
+Only Pillow + NumPy are imported: this runs inside the OCR pool processes.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+THUMB_DIM = 600          # longest side of the analysis thumbnail
+MAX_SKEW = 15.0          # degrees searched either way
+MIN_SKEW = 0.5           # smaller angles are left alone
+CLOSE_SIZE = 9           # closing kernel (thumbnail px) that fills text strokes
+PAPER_MIN_SHARE = 0.15   # below this the "paper" is probably just a bright object
+PAPER_FULL_SHARE = 0.97  # above this the image is all paper (scan): nothing to crop
+CROP_MARGIN = 0.01       # share of each side kept around the detected paper
+
+
+def _otsu(gray: np.ndarray) -> int:
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * np.arange(256))
+    mean_bg = cum_mean / np.maximum(weight_bg, 1)
+    mean_fg = (cum_mean[-1] - cum_mean) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def _mask_image(mask: np.ndarray) -> Image.Image:
+    return Image.fromarray(mask.astype(np.uint8) * 255, "L")
+
+
+def _box_count(mask: np.ndarray, size: int) -> np.ndarray:
+    """Number of set pixels in the size x size window around each pixel (integral image)."""
+    pad = size // 2
+    padded = np.pad(mask.astype(np.int32), pad + 1)[:-1, :-1]  # one leading zero row/col for the diffs
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    return (integral[size:, size:] - integral[:-size, size:]
+            - integral[size:, :-size] + integral[:-size, :-size])
+
+
+def _dilate(mask: np.ndarray, size: int) -> np.ndarray:
+    return _box_count(mask, size) > 0
+
+
+def _erode(mask: np.ndarray, size: int) -> np.ndarray:
+    return _box_count(mask, size) == size * size
+
+
+def _close(mask: np.ndarray, size: int) -> np.ndarray:
+    return _erode(_dilate(mask, size), size)
+
+
+def _row_sharpness(ys: np.ndarray, xs: np.ndarray, angle: float) -> float:
+    """Row-profile sharpness of the text pixels after rotating them by angle."""
+    theta = np.deg2rad(angle)
+    rows = np.floor(ys * np.cos(theta) - xs * np.sin(theta)).astype(np.int64)
+    profile = np.bincount(rows - rows.min()).astype(np.float64)
+    return float(np.sum(np.diff(profile) ** 2))
+
+
+def estimate_skew(text_mask: np.ndarray) -> float:
+    """
+    Angle (degrees, counter-clockwise as in Image.rotate) that straightens the
+    text lines: coarse 1° search over +-MAX_SKEW, then 0.1° refinement.
+    Text pixel coordinates are rotated instead of the image.
+    """
+    ys, xs = np.nonzero(text_mask)
+    if len(ys) < 50:
+        return 0.0
+    ys = ys - text_mask.shape[0] / 2
+    xs = xs - text_mask.shape[1] / 2
+    coarse = np.arange(-MAX_SKEW, MAX_SKEW + 0.5, 1.0)
+    scores = [_row_sharpness(ys, xs, a) for a in coarse]
+    best = float(coarse[int(np.argmax(scores))])
+    fine = np.arange(best - 0.9, best + 0.95, 0.1)
+    scores = [_row_sharpness(ys, xs, a) for a in fine]
+    return round(float(fine[int(np.argmax(scores))]), 1)
+
+
+def _largest_run(profile: np.ndarray, threshold: float) -> Optional[Tuple[int, int]]:
+    """[start, end) of the longest run of profile >= threshold."""
+    best, start = None, None
+    for i, on in enumerate(np.append(profile >= threshold, False)):
+        if on and start is None:
+            start = i
+        elif not on and start is not None:
+            if best is None or i - start > best[1] - best[0]:
+                best = (start, i)
+            start = None
+    return best
+
+
+def paper_box(paper: np.ndarray, share: float = 0.5) -> Optional[Tuple[int, int, int, int]]:
+    """
+    (left, top, right, bottom) of the paper in mask coordinates, or None.
+    Rows/columns count as paper when their paper share is at least `share`
+    of the fullest one.
+    """
+    rows = paper.mean(axis=1)
+    cols = paper.mean(axis=0)
+    if rows.max() == 0:
+        return None
+    row_run = _largest_run(rows, share * rows.max())
+    col_run = _largest_run(cols, share * cols.max())
+    if row_run is None or col_run is None:
+        return None
+    return col_run[0], row_run[0], col_run[1], row_run[1]
+
+
+def _fractions(box: Tuple[int, int, int, int], shape: Tuple[int, int]) -> Tuple[float, float, float, float]:
+    h, w = shape
+    left, top, right, bottom = box
+    return (
+        max(0.0, left / w - CROP_MARGIN), max(0.0, top / h - CROP_MARGIN),
+        min(1.0, right / w + CROP_MARGIN), min(1.0, bottom / h + CROP_MARGIN),
+    )
+
+
+def _apply(img: Image.Image, box: Tuple[float, float, float, float]) -> Image.Image:
+    w, h = img.size
+    return img.crop((int(box[0] * w), int(box[1] * h), int(box[2] * w), int(box[3] * h)))
+
+
+def analyze(gray: Image.Image) -> Tuple[float, Optional[tuple], Optional[tuple]]:
+    """
+    Returns (skew_angle, bounds, crop) for a grayscale image, boxes as
+    (left, top, right, bottom) fractions:
+        bounds  everything that is paper, in the input frame
+        crop    the paper after cropping to bounds and rotating by skew_angle
+    Both are None when the whole frame is paper.
+    """
+    thumb = gray.copy()
+    thumb.thumbnail((THUMB_DIM, THUMB_DIM))
+    pixels = np.asarray(thumb)
+    bright = pixels > _otsu(pixels)
+
+    paper = _close(bright, CLOSE_SIZE)
+    has_background = PAPER_MIN_SHARE <= paper.mean() <= PAPER_FULL_SHARE
+    text = ~bright & _erode(paper, CLOSE_SIZE) if has_background else ~bright
+    angle = estimate_skew(text)
+    if abs(angle) < MIN_SKEW:
+        angle = 0.0
+    if not has_background:
+        return angle, None, None
+
+    outer = paper_box(paper, share=0.02)
+    if outer is None:
+        return angle, None, None
+    left, top, right, bottom = outer
+    paper = paper[top:bottom, left:right]
+    bounds = _fractions(outer, pixels.shape)
+
+    rotated = np.asarray(_mask_image(paper).rotate(angle, resample=Image.NEAREST, expand=True)) > 127
+    inner = paper_box(rotated)
+    crop = _fractions(inner, rotated.shape) if inner else None
+    if crop and (crop[2] - crop[0]) * (crop[3] - crop[1]) > PAPER_FULL_SHARE:
+        crop = None
+    return angle, bounds, crop
+
+
+def crop_and_deskew(img: Image.Image, max_dim: int = 0) -> Image.Image:
+    """
+    Crop to the paper, level the text and crop the corners the rotation
+    exposed. Expects a grayscale ("L") image. With max_dim the paper is
+    downscaled before rotating, which is the expensive step at full size.
+    """
+    angle, bounds, crop = analyze(img)
+    if bounds:
+        img = _apply(img, bounds)
+    w, h = img.size
+    if max_dim and max(w, h) > max_dim:
+        ratio = max_dim / max(w, h)
+        img = img.resize((int(w * ratio), int(h * ratio)), Image.LANCZOS)
+    if angle:
+        img = img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if crop:
+        img = _apply(img, crop)
+    return img
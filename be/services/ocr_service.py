@@ -1,14 +1,18 @@
+import asyncio
 import pytesseract
 from PIL import Image
-from openai import OpenAI
+from openai import AsyncOpenAI
 import httpx
-from typing import Tuple, Optional
+from typing import Any, Awaitable, Callable, Tuple, Optional, Union
 import time
 import os
-import random
 import json
 import re
 from config.settings import settings
+from services.ocr_pool import run_tesseract, run_tesseract_bytes, run_tesseract_pdf, is_pdf, profile_for
+from services.ocr_cache import get_cached_result, set_cached_result, hash_file, hash_bytes
+from services.llm_router import llm_router
+from services.line_selection import select_relevant_lines
 
 # --- TESSERACT PATH ---
 DEFAULT_WIN_PATH = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
@@ -25,10 +29,10 @@ openai_client = None
 try:
     if settings.GEMINI_API_KEY:
         base_url = getattr(settings, "GEMINI_BASE_URL", "https://ai.sumopod.com/v1")
-        openai_client = OpenAI(
+        openai_client = AsyncOpenAI(
             api_key=settings.GEMINI_API_KEY,
             base_url=base_url if base_url else None,
-            http_client=httpx.Client(timeout=30.0)
+            http_client=httpx.AsyncClient(timeout=30.0)
         )
         print("Gemini OpenAI proxy client initialized for OCR")
 except Exception as e:
@@ -40,10 +44,10 @@ try:
     if settings.groq_api_keys:
         for idx, key in enumerate(settings.groq_api_keys):
             try:
-                client = OpenAI(
+                client = AsyncOpenAI(
                     api_key=key,
                     base_url=settings.GROQ_BASE_URL,
-                    http_client=httpx.Client(timeout=30.0)
+                    http_client=httpx.AsyncClient(timeout=30.0)
                 )
                 groq_clients.append(client)
             except Exception as e:
@@ -54,7 +58,7 @@ except Exception as e:
     print(f"Groq Setup Failed: {e}")
 
 
-STRUCTURED_EXTRACTION_PROMPT = """You are an OCR post-processor for Indonesian financial documents. You can handle ALL types:
+_DOC_TYPES_HEADER = """You are an OCR post-processor for Indonesian financial documents. You can handle ALL types:
 - Invoice / Faktur (Bank Indonesia standard, corporate invoice)
 - Surat Jalan / Delivery Order
 - Struk EDC / Mesin POS (DEBIT/CREDIT card receipt)
@@ -62,10 +66,9 @@ STRUCTURED_EXTRACTION_PROMPT = """You are an OCR post-processor for Indonesian f
 - Kuitansi (payment acknowledgement)
 - Nota Toko / Kasir (cashier receipt, minimarket, warung)
 - QRIS / E-wallet receipt (GoPay, OVO, Dana, LinkAja, ShopeePay)
-- Faktur Pajak (tax invoice with NPWP)
+- Faktur Pajak (tax invoice with NPWP)"""
 
-Extract these fields from the OCR text and return ONLY a valid JSON object:
-{
+_FIELD_SCHEMA = """{
   "doc_type": "<one of: invoice|surat_jalan|struk_edc|bon_manual|kuitansi|nota_toko|qris|faktur_pajak|unknown>",
   "nomor_dokumen": "<string: invoice/receipt/SJ/transaction number, null if not found>",
   "tanggal_terbit": "<string: document issue date in YYYY-MM-DD, null if not found>",
@@ -79,9 +82,9 @@ Extract these fields from the OCR text and return ONLY a valid JSON object:
   "terminal_id": "<string: EDC terminal ID or merchant ID, null if not applicable>",
   "no_referensi": "<string: approval/authorization/reference/trace number for EDC or transfer, null if not found>",
   "confidence": "<'high' if 4+ fields non-null, 'medium' if 2-3 fields non-null, 'low' if 0-1 fields non-null>"
-}
+}"""
 
-Extraction rules by document type:
+_FIELD_RULES = """Extraction rules by document type:
 - invoice/faktur_pajak: nomor_dokumen=Invoice No./No.Faktur, nama_klien=Kepada/Bill To/Yth., tanggal_jatuh_tempo=Jatuh Tempo/Due Date, nominal_ppn=PPN 11%
 - surat_jalan: nomor_dokumen=No.SJ/Nomor Surat Jalan, nama_klien=Penerima/Kepada, tanggal_terbit=Tanggal SJ
 - struk_edc: nomor_dokumen=No.Transaksi/Trace, terminal_id=TID/MID, no_referensi=Approval/Auth Code, metode_bayar=DEBIT/CREDIT, nama_penjual=Merchant Name
@@ -93,13 +96,310 @@ General rules:
 - nominal values: integer IDR, strip all dots/commas ("1.500.000" → 1500000)
 - dates: normalize to YYYY-MM-DD; if only DD/MM/YYYY given, convert it
 - If field not found: use null, never empty string
-- confidence counts: doc_type + nomor_dokumen + nama_penjual + nominal_total + any other non-null field
+- confidence counts: doc_type + nomor_dokumen + nama_penjual + nominal_total + any other non-null field"""
+
+STRUCTURED_EXTRACTION_PROMPT = f"""{_DOC_TYPES_HEADER}
+
+Extract these fields from the OCR text and return ONLY a valid JSON object:
+{_FIELD_SCHEMA}
+
+{_FIELD_RULES}
+- Return ONLY the JSON object, no explanation"""
+
+# One-call variant (settings.OCR_COMBINED_EXTRACTION): cleanup + extraction
+COMBINED_EXTRACTION_PROMPT = f"""{_DOC_TYPES_HEADER}
+
+The OCR text may contain recognition typos. In ONE response:
+1. Fix the OCR typos in the text. Keep the original lines and their order; do not summarize, translate or add content.
+2. Extract the fields below from the corrected text.
+
+Return ONLY a valid JSON object with exactly two keys:
+{{"cleaned_text": "<the full corrected text, line breaks as \\n>", "fields": <field object>}}
+
+where <field object> is:
+{_FIELD_SCHEMA}
+
+{_FIELD_RULES}
+- Return ONLY the JSON object, no explanation"""
+
+
+# Several documents in one request (scan worker batches, settings.SCAN_LLM_BATCH_SIZE)
+BATCH_EXTRACTION_PROMPT = f"""{_DOC_TYPES_HEADER}
+
+You will receive several documents. Each one starts with a line "### DOCUMENT <id>".
+Extract the fields below from EACH document separately — never mix values between documents.
+
+Return ONLY a valid JSON object of the form:
+{{"documents": [{{"id": "<id exactly as given>", "fields": <field object>}}, ...]}}
+with one entry per document.
+
+where <field object> is:
+{_FIELD_SCHEMA}
+
+{_FIELD_RULES}
 - Return ONLY the JSON object, no explanation"""
 
+# ── LLM provider hedging ─────────────────────────────────────────────────────
+
+def _llm_candidates() -> list:
+    """
+    Providers ranked by services.llm_router (expected latency, skipping
+    rate-limited keys and open circuits). Gemini proxy is first on ties.
+    """
+    clients_to_try = []
+    if openai_client:
+        model_name = getattr(settings, "GEMINI_MODEL", "gemini/gemini-2.5-flash")
+        clients_to_try.append(("GeminiProxy", openai_client, model_name))
+    for i, c in enumerate(groq_clients):
+        clients_to_try.append((f"Groq-{i+1}", c, settings.GROQ_MODEL))
+    return llm_router.order(clients_to_try)
+
+
+def _parse_json_object(raw: str) -> Optional[dict]:
+    json_match = re.search(r'\{.*\}', raw, re.DOTALL)
+    if not json_match:
+        return None
+    return json.loads(json_match.group())
+
+
+def _parse_combined(raw: str) -> Optional[Tuple[str, dict]]:
+    """Parse a COMBINED_EXTRACTION_PROMPT answer into (cleaned_text, fields)."""
+    parsed = _parse_json_object(raw)
+    if not parsed:
+        return None
+    cleaned, fields = parsed.get("cleaned_text"), parsed.get("fields")
+    if not isinstance(cleaned, str) or not cleaned.strip() or not isinstance(fields, dict):
+        return None
+    return cleaned.strip(), fields
+
+
+def _parse_batch(raw: str) -> Optional[dict]:
+    """Parse a BATCH_EXTRACTION_PROMPT answer into {id: fields}; None if unusable."""
+    parsed = _parse_json_object(raw)
+    documents = parsed.get("documents") if isinstance(parsed, dict) else None
+    if not isinstance(documents, list):
+        return None
+    results = {
+        str(doc.get("id")): doc["fields"]
+        for doc in documents
+        if isinstance(doc, dict) and isinstance(doc.get("fields"), dict)
+    }
+    return results or None
+
+
+async def _hedged_completion(
+    candidates: list,
+    messages: list,
+    *,
+    parse: Callable[[str], Any],
+    temperature: float,
+    json_mode: bool = False,
+    label: str = "completion",
+    hedge_delay: Optional[float] = None,
+) -> Optional[Tuple[str, Any]]:
+    """
+    Hedged chat completion across (name, client, model) candidates.
+
+    The first candidate starts immediately. If no valid answer has arrived
+    after `hedge_delay` seconds (settings.LLM_HEDGE_DELAY, roughly the
+    provider p95), the next candidate is fired concurrently; a failed
+    request also fires the next one straight away. The first response that
+    `parse` turns into a non-None value wins and the other in-flight
+    requests are cancelled. Returns (name, parsed) or None if all fail.
+    A delay <= 0 disables hedging (strict one-after-another fallback).
+    """
+    if hedge_delay is None:
+        hedge_delay = settings.LLM_HEDGE_DELAY
+    wait_timeout = hedge_delay if hedge_delay > 0 else None
+
+    async def _call(name, client, model):
+        kwargs = {}
+        if json_mode:
+            kwargs["response_format"] = {"type": "json_object"} if "gpt" in model else None
+        start = time.monotonic()
+        try:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                **kwargs,
+            )
+            value = parse(response.choices[0].message.content.strip())
+        except Exception as e:
+            llm_router.record_failure(name, e, time.monotonic() - start)
+            raise
+        if value is None:
+            llm_router.record_failure(name, latency=time.monotonic() - start)
+        else:
+            llm_router.record_success(name, time.monotonic() - start)
+        return value
+
+    remaining = iter(candidates)
+    names: dict = {}
+    pending: set = set()
+
+    def _launch_next() -> bool:
+        nxt = next(remaining, None)
+        if nxt is None:
+            return False
+        name, client, model = nxt
+        task = asyncio.create_task(_call(name, client, model))
+        names[task] = name
+        pending.add(task)
+        return True
+
+    _launch_next()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if _launch_next():
+                    print(f"LLM {label}: hedging, {len(pending)} provider(s) in flight")
+                continue
+            for task in done:
+                pending.discard(task)
+                try:
+                    value = task.result()
+                except Exception as e:
+                    print(f"{names[task]} {label} failed: {e}")
+                    value = None
+                if value is not None:
+                    return names[task], value
+                _launch_next()
+    finally:
+        for task in pending:
+            task.cancel()
+    return None
+
+
+# ── Regex fallback extraction ────────────────────────────────────────────────
+# Hot path whenever every LLM provider is down. All patterns are compiled
+# once. Each is paired with the literal keywords a match has to start with:
+# the text is lower-cased once and str.find() on those anchors gives the
+# earliest offset a match can begin at, so the regex runs from there, or not
+# at all when no anchor occurs. A pattern without anchors (None) scans the
+# whole text. Results are identical to a plain re.search over the text.
+
+_DATE_SPLIT = re.compile(r'[/\-\.]')
+
+# Searched on the lower-cased text, in priority order
+_DOC_TYPE_PATTERNS = [
+    ("faktur_pajak", re.compile(r'faktur\s*pajak|npwp|pkp'), ("faktur", "npwp", "pkp")),
+    ("surat_jalan", re.compile(r'surat\s*jalan|delivery\s*order|\bsj\b'), ("surat", "delivery", "sj")),
+    ("struk_edc", re.compile(r'tid\s*:|mid\s*:|terminal\s*id|approval\s*code|auth\s*code|debit|kredit\s*card'),
+     ("tid", "mid", "terminal", "approval", "auth", "debit", "kredit")),
+    ("qris", re.compile(r'qris|gopay|ovo\b|dana\b|shopeepay|linkaja|e-?wallet'),
+     ("qris", "gopay", "ovo", "dana", "shopeepay", "linkaja", "e-wallet", "ewallet")),
+    ("kuitansi", re.compile(r'kuitansi|telah\s*diterima\s*dari|yang\s*membayar'), ("kuitansi", "telah", "yang")),
+    ("invoice", re.compile(r'invoice|faktur|bill\s*to|due\s*date|jatuh\s*tempo'),
+     ("invoice", "faktur", "bill", "due", "jatuh")),
+    ("nota_toko", re.compile(r'\bkasir\b|\bstruk\b|\bnota\b|\bbon\b|minimarket|indomaret|alfamart'),
+     ("kasir", "struk", "nota", "bon", "minimarket", "indomaret", "alfamart")),
+]
+
+_I = re.IGNORECASE
+_NOMINAL_PATTERNS = [
+    (re.compile(r'(?:grand\s*total|total\s*tagihan|total\s*bayar|total\s*pembayaran)[:\s]*Rp\.?\s*([\d.,]+)', _I),
+     ("grand", "total")),
+    (re.compile(r'(?:total|jumlah|amount|tagihan)[:\s]*Rp\.?\s*([\d.,]+)', _I), ("total", "jumlah", "amount", "tagihan")),
+    (re.compile(r'(?:telah\s*diterima|sebesar\s*Rp)[:\s]*Rp?\.?\s*([\d.,]+)', _I), ("telah", "sebesar")),
+    (re.compile(r'Rp\.?\s*([\d.,]+)', _I), ("rp",)),
+    (re.compile(r'(?:total|jumlah)[:\s]*([\d.,]+)', _I), ("total", "jumlah")),
+]
+_SUBTOTAL_PATTERN = (re.compile(r'(?:subtotal|sub\s*total|dpp)[:\s]*Rp?\.?\s*([\d.,]+)', _I), ("sub", "dpp"))
+_PPN_PATTERN = (re.compile(r'(?:ppn|vat|tax)[\s\d%]*[:\s]*Rp?\.?\s*([\d.,]+)', _I), ("ppn", "vat", "tax"))
+_DOC_NUM_PATTERNS = [
+    (re.compile(r'(?:no\.?\s*faktur|invoice\s*no\.?|no\.?\s*invoice)[:\s]*([A-Z0-9/\-\.]+)', _I), ("no", "invoice")),
+    (re.compile(r'(?:no\.?\s*sj|nomor\s*sj|surat\s*jalan\s*no\.?)[:\s]*([A-Z0-9/\-\.]+)', _I), ("no", "surat")),
+    (re.compile(r'(?:no\.?\s*kuitansi|receipt\s*no\.?)[:\s]*([A-Z0-9/\-\.]+)', _I), ("no", "receipt")),
+    (re.compile(r'(?:no\.?\s*transaksi|transaction\s*id)[:\s]*([A-Z0-9/\-\.]+)', _I), ("no", "transaction")),
+    (re.compile(r'(?:no\.|nomor)[:\s]*([A-Z0-9/\-\.]{5,25})', _I), ("no",)),
+]
+_COMPANY_PATTERN = (re.compile(r'(?:PT\.|CV\.|UD\.|Toko\s|PD\.\s)([^\n]{2,50})', _I), ("pt.", "cv.", "ud.", "toko", "pd."))
+_SELLER_PATTERNS = [
+    (re.compile(r'(?:merchant|toko|nama\s*toko|penjual|dari\s*:)[:\s]*([^\n]{3,60})', _I | re.MULTILINE),
+     ("merchant", "toko", "nama", "penjual", "dari")),
+    (re.compile(r'^([A-Z][^\n]{3,50})(?:\s*\n)', _I | re.MULTILINE), None),  # first line often merchant name
+    (re.compile(_COMPANY_PATTERN[0].pattern, _I | re.MULTILINE), _COMPANY_PATTERN[1]),
+]
+_CLIENT_PATTERNS = [
+    (re.compile(r'(?:kepada\s*yth\.?|kepada|penerima|customer|client|bill\s*to|ditujukan\s*kepada|yang\s*membayar)'
+                r'[:\s]*([^\n]{3,80})', _I),
+     ("kepada", "penerima", "customer", "client", "bill", "ditujukan", "yang")),
+    _COMPANY_PATTERN,
+]
+_ISSUE_DATE_PATTERNS = [
+    (re.compile(r'(?:tanggal|tgl\.?|date|tanggal\s*terbit)[:\s]*(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4})', _I),
+     ("tanggal", "tgl", "date")),
+    (re.compile(r'(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{4})', _I), None),
+]
+_DUE_DATE_PATTERNS = [
+    (re.compile(r'(?:jatuh\s*tempo|due\s*date|tgl\.?\s*tempo|batas\s*pembayaran)[:\s]*(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4})', _I),
+     ("jatuh", "due", "tgl", "batas")),
+    (re.compile(r'(?:jatuh\s*tempo|due\s*date)[:\s]*(\d{4}-\d{2}-\d{2})', _I), ("jatuh", "due")),
+]
+_PAYMENT_WORDS = ("tunai", "cash", "debit", "kredit", "credit", "transfer", "qris", "gopay", "ovo", "dana",
+                  "shopeepay", "linkaja")
+_PAYMENT_PATTERN = (re.compile(r'\b(' + "|".join(_PAYMENT_WORDS) + r')\b', _I), _PAYMENT_WORDS)
+_TID_PATTERN = (re.compile(r'(?:tid|terminal\s*id|mid|merchant\s*id)[:\s]*([A-Z0-9]{4,20})', _I),
+                ("tid", "terminal", "mid", "merchant"))
+_REF_PATTERN = (
+    re.compile(r'(?:approval|auth\s*code|authorization|kode\s*autorisasi|trace|ref(?:erence)?)[:\s#]*([A-Z0-9]{4,20})', _I),
+    ("approval", "auth", "kode", "trace", "ref"),
+)
+# Characters whose case folding changes length or maps onto ASCII letters
+# (İ, ı, ſ, Kelvin sign): offsets from text.lower() are not reliable then.
+_UNSAFE_FOLD = re.compile('[\u0130\u0131\u017f\u212a]')
+
+_CORE_KEYS = ["nomor_dokumen", "nama_penjual", "nama_klien", "nominal_total",
+              "tanggal_terbit", "metode_bayar", "no_referensi", "terminal_id"]
+
+
+class _AnchoredText:
+    """Text plus its lower-cased copy and a per-call cache of anchor offsets."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = text.lower()
+        self.exact = len(self.lower) == len(text) and not _UNSAFE_FOLD.search(text)
+        self._offsets: dict = {}
+
+    def _start(self, anchors) -> int:
+        best = -1
+        for anchor in anchors:
+            pos = self._offsets.get(anchor)
+            if pos is None:
+                pos = self._offsets[anchor] = self.lower.find(anchor)
+            if pos != -1 and (best == -1 or pos < best):
+                best = pos
+        return best
+
+    def search(self, pattern, anchors):
+        if anchors is None or not self.exact:
+            return pattern.search(self.text)
+        start = self._start(anchors)
+        return pattern.search(self.text, start) if start != -1 else None
+
+    def search_lower(self, pattern, anchors):
+        start = self._start(anchors)
+        return pattern.search(self.lower, start) if start != -1 else None
+
+    def first(self, patterns):
+        for pattern, anchors in patterns:
+            match = self.search(pattern, anchors)
+            if match:
+                return match
+        return None
+
+
+def _parse_amount(match) -> Optional[int]:
+    raw = match.group(1).replace('.', '').replace(',', '')
+    return int(raw) if raw.isdigit() else None
+
 
 def _normalize_date(raw_date: str) -> str:
     """Normalize various date formats to YYYY-MM-DD."""
-    parts = re.split(r'[/\-\.]', raw_date.strip())
+    parts = _DATE_SPLIT.split(raw_date.strip())
     if len(parts) == 3:
         try:
             if len(parts[2]) == 4:  # DD/MM/YYYY
@@ -111,6 +411,14 @@ def _normalize_date(raw_date: str) -> str:
     return raw_date.strip()
 
 
+class FallbackText(str):
+    """Text returned unchanged because every LLM provider failed; behaves like str."""
+
+
+class FallbackFields(dict):
+    """Regex fallback fields returned because every LLM provider failed; behaves like dict."""
+
+
 def _regex_fallback_extraction(text: str) -> dict:
     """Regex-based universal extraction as fallback when AI fails."""
     result: dict = {
@@ -128,36 +436,18 @@ def _regex_fallback_extraction(text: str) -> dict:
         "no_referensi": None,
         "confidence": "low",
     }
+    doc = _AnchoredText(text)
 
     # ── Document type detection ──────────────────────────────────────────────
-    text_lower = text.lower()
-    if re.search(r'faktur\s*pajak|npwp|pkp', text_lower):
-        result["doc_type"] = "faktur_pajak"
-    elif re.search(r'surat\s*jalan|delivery\s*order|\bsj\b', text_lower):
-        result["doc_type"] = "surat_jalan"
-    elif re.search(r'tid\s*:|mid\s*:|terminal\s*id|approval\s*code|auth\s*code|debit|kredit\s*card', text_lower):
-        result["doc_type"] = "struk_edc"
-    elif re.search(r'qris|gopay|ovo\b|dana\b|shopeepay|linkaja|e-?wallet', text_lower):
-        result["doc_type"] = "qris"
-    elif re.search(r'kuitansi|telah\s*diterima\s*dari|yang\s*membayar', text_lower):
-        result["doc_type"] = "kuitansi"
-    elif re.search(r'invoice|faktur|bill\s*to|due\s*date|jatuh\s*tempo', text_lower):
-        result["doc_type"] = "invoice"
-    elif re.search(r'\bkasir\b|\bstruk\b|\bnota\b|\bbon\b|minimarket|indomaret|alfamart', text_lower):
-        result["doc_type"] = "nota_toko"
-    else:
-        result["doc_type"] = "bon_manual"
+    result["doc_type"] = "bon_manual"
+    for doc_type, pattern, anchors in _DOC_TYPE_PATTERNS:
+        if doc.search_lower(pattern, anchors):
+            result["doc_type"] = doc_type
+            break
 
     # ── Nominal total ────────────────────────────────────────────────────────
-    nominal_patterns = [
-        r'(?:grand\s*total|total\s*tagihan|total\s*bayar|total\s*pembayaran)[:\s]*Rp\.?\s*([\d.,]+)',
-        r'(?:total|jumlah|amount|tagihan)[:\s]*Rp\.?\s*([\d.,]+)',
-        r'(?:telah\s*diterima|sebesar\s*Rp)[:\s]*Rp?\.?\s*([\d.,]+)',
-        r'Rp\.?\s*([\d.,]+)',
-        r'(?:total|jumlah)[:\s]*([\d.,]+)',
-    ]
-    for pat in nominal_patterns:
-        match = re.search(pat, text, re.IGNORECASE)
+    for pattern, anchors in _NOMINAL_PATTERNS:
+        match = doc.search(pattern, anchors)
         if match:
             raw = match.group(1).replace('.', '').replace(',', '').strip()
             if raw.isdigit() and len(raw) >= 3:
@@ -165,100 +455,54 @@ def _regex_fallback_extraction(text: str) -> dict:
                 break
 
     # ── Subtotal + PPN ───────────────────────────────────────────────────────
-    sub_match = re.search(r'(?:subtotal|sub\s*total|dpp)[:\s]*Rp?\.?\s*([\d.,]+)', text, re.IGNORECASE)
+    sub_match = doc.search(*_SUBTOTAL_PATTERN)
     if sub_match:
-        raw = sub_match.group(1).replace('.', '').replace(',', '')
-        if raw.isdigit():
-            result["nominal_subtotal"] = int(raw)
+        result["nominal_subtotal"] = _parse_amount(sub_match)
 
-    ppn_match = re.search(r'(?:ppn|vat|tax)[\s\d%]*[:\s]*Rp?\.?\s*([\d.,]+)', text, re.IGNORECASE)
+    ppn_match = doc.search(*_PPN_PATTERN)
     if ppn_match:
-        raw = ppn_match.group(1).replace('.', '').replace(',', '')
-        if raw.isdigit():
-            result["nominal_ppn"] = int(raw)
+        result["nominal_ppn"] = _parse_amount(ppn_match)
 
     # ── Document number ──────────────────────────────────────────────────────
-    doc_num_patterns = [
-        r'(?:no\.?\s*faktur|invoice\s*no\.?|no\.?\s*invoice)[:\s]*([A-Z0-9/\-\.]+)',
-        r'(?:no\.?\s*sj|nomor\s*sj|surat\s*jalan\s*no\.?)[:\s]*([A-Z0-9/\-\.]+)',
-        r'(?:no\.?\s*kuitansi|receipt\s*no\.?)[:\s]*([A-Z0-9/\-\.]+)',
-        r'(?:no\.?\s*transaksi|transaction\s*id)[:\s]*([A-Z0-9/\-\.]+)',
-        r'(?:no\.|nomor)[:\s]*([A-Z0-9/\-\.]{5,25})',
-    ]
-    for pat in doc_num_patterns:
-        match = re.search(pat, text, re.IGNORECASE)
-        if match:
-            result["nomor_dokumen"] = match.group(1).strip()[:50]
-            break
+    match = doc.first(_DOC_NUM_PATTERNS)
+    if match:
+        result["nomor_dokumen"] = match.group(1).strip()[:50]
 
     # ── Seller / merchant name ───────────────────────────────────────────────
-    seller_patterns = [
-        r'(?:merchant|toko|nama\s*toko|penjual|dari\s*:)[:\s]*([^\n]{3,60})',
-        r'^([A-Z][^\n]{3,50})(?:\s*\n)',  # first line often merchant name
-        r'(?:PT\.|CV\.|UD\.|Toko\s|PD\.\s)([^\n]{2,50})',
-    ]
-    for pat in seller_patterns:
-        match = re.search(pat, text, re.IGNORECASE | re.MULTILINE)
-        if match:
-            result["nama_penjual"] = match.group(1).strip()[:100]
-            break
+    match = doc.first(_SELLER_PATTERNS)
+    if match:
+        result["nama_penjual"] = match.group(1).strip()[:100]
 
     # ── Client / buyer name ──────────────────────────────────────────────────
-    client_patterns = [
-        r'(?:kepada\s*yth\.?|kepada|penerima|customer|client|bill\s*to|ditujukan\s*kepada|yang\s*membayar)[:\s]*([^\n]{3,80})',
-        r'(?:PT\.|CV\.|UD\.|Toko\s|PD\.\s)([^\n]{2,50})',
-    ]
-    for pat in client_patterns:
-        match = re.search(pat, text, re.IGNORECASE)
-        if match:
-            result["nama_klien"] = match.group(1).strip()[:100]
-            break
+    match = doc.first(_CLIENT_PATTERNS)
+    if match:
+        result["nama_klien"] = match.group(1).strip()[:100]
 
     # ── Dates ────────────────────────────────────────────────────────────────
-    issue_date_patterns = [
-        r'(?:tanggal|tgl\.?|date|tanggal\s*terbit)[:\s]*(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4})',
-        r'(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{4})',
-    ]
-    for pat in issue_date_patterns:
-        match = re.search(pat, text, re.IGNORECASE)
-        if match:
-            result["tanggal_terbit"] = _normalize_date(match.group(1))
-            break
+    match = doc.first(_ISSUE_DATE_PATTERNS)
+    if match:
+        result["tanggal_terbit"] = _normalize_date(match.group(1))
 
-    due_date_patterns = [
-        r'(?:jatuh\s*tempo|due\s*date|tgl\.?\s*tempo|batas\s*pembayaran)[:\s]*(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4})',
-        r'(?:jatuh\s*tempo|due\s*date)[:\s]*(\d{4}-\d{2}-\d{2})',
-    ]
-    for pat in due_date_patterns:
-        match = re.search(pat, text, re.IGNORECASE)
-        if match:
-            result["tanggal_jatuh_tempo"] = _normalize_date(match.group(1))
-            break
+    match = doc.first(_DUE_DATE_PATTERNS)
+    if match:
+        result["tanggal_jatuh_tempo"] = _normalize_date(match.group(1))
 
     # ── Payment method ───────────────────────────────────────────────────────
-    pay_match = re.search(
-        r'\b(tunai|cash|debit|kredit|credit|transfer|qris|gopay|ovo|dana|shopeepay|linkaja)\b',
-        text, re.IGNORECASE
-    )
+    pay_match = doc.search(*_PAYMENT_PATTERN)
     if pay_match:
         result["metode_bayar"] = pay_match.group(1).upper()
 
     # ── EDC-specific ─────────────────────────────────────────────────────────
-    tid_match = re.search(r'(?:tid|terminal\s*id|mid|merchant\s*id)[:\s]*([A-Z0-9]{4,20})', text, re.IGNORECASE)
+    tid_match = doc.search(*_TID_PATTERN)
     if tid_match:
         result["terminal_id"] = tid_match.group(1).strip()
 
-    ref_match = re.search(
-        r'(?:approval|auth\s*code|authorization|kode\s*autorisasi|trace|ref(?:erence)?)[:\s#]*([A-Z0-9]{4,20})',
-        text, re.IGNORECASE
-    )
+    ref_match = doc.search(*_REF_PATTERN)
     if ref_match:
         result["no_referensi"] = ref_match.group(1).strip()
 
     # ── Confidence score ─────────────────────────────────────────────────────
-    core_keys = ["nomor_dokumen", "nama_penjual", "nama_klien", "nominal_total",
-                 "tanggal_terbit", "metode_bayar", "no_referensi", "terminal_id"]
-    found = sum(1 for k in core_keys if result.get(k) is not None)
+    found = sum(1 for k in _CORE_KEYS if result.get(k) is not None)
     result["confidence"] = "high" if found >= 4 else ("medium" if found >= 2 else "low")
     return result
 
@@ -266,37 +510,45 @@ def _regex_fallback_extraction(text: str) -> dict:
 class OCRService:
 
     @staticmethod
-    async def extract_text_tesseract(image_path: str) -> Tuple[str, float, float]:
+    async def extract_text_tesseract(image_path: str, profile: Optional[str] = None) -> Tuple[str, float, float]:
+        """Run Tesseract off the event loop. Kept for existing callers."""
+        return await OCRService.extract_text_async(image_path, profile)
+
+    @staticmethod
+    async def extract_text_async(image_path: str, profile: Optional[str] = None) -> Tuple[str, float, float]:
+        """
+        OCR an image on the shared process pool (services.ocr_pool).
+        profile is an OCR profile name or a doc_type (ocr_pool.PROFILES);
+        None uses OCR_DEFAULT_PROFILE.
+        Returns (text, avg_confidence, processing_time).
+        """
+        return await OCRService._extract_text(run_tesseract, image_path, image_path, profile)
+
+    @staticmethod
+    async def extract_text_bytes(
+        content: Union[bytes, Image.Image], profile: Optional[str] = None,
+    ) -> Tuple[str, float, float]:
+        """extract_text_async for an in-memory image (no temp files)."""
+        return await OCRService._extract_text(run_tesseract_bytes, content, "<in-memory image>", profile)
+
+    @staticmethod
+    async def extract_text_pdf(content: bytes, profile: Optional[str] = None) -> Tuple[str, float, float]:
+        """OCR every page of a PDF (page-parallel on the pool), text in page order."""
+        return await OCRService._extract_text(run_tesseract_pdf, content, "<pdf>", profile)
+
+    @staticmethod
+    async def _extract_text(runner, source, label: str, profile: Optional[str] = None) -> Tuple[str, float, float]:
         start_time = time.time()
         try:
             cmd = pytesseract.pytesseract.tesseract_cmd
             if not os.path.exists(cmd) and cmd != "tesseract":
                 return "Error: Tesseract OCR tidak ditemukan.", 0.0, 0.0
 
-            img = Image.open(image_path)
-
-            # ── Pre-processing: reduce RAM usage ──
-            # 1. Convert to grayscale (reduces memory ~66%, improves OCR)
-            if img.mode != "L":
-                img = img.convert("L")
-
-            # 2. Resize large images (max 1500px on longest side — balanced speed/quality)
-            MAX_DIM = 1500
-            w, h = img.size
-            if max(w, h) > MAX_DIM:
-                ratio = MAX_DIM / max(w, h)
-                img = img.resize((int(w * ratio), int(h * ratio)), Image.LANCZOS)
-                print(f"📐 Resized image from {w}x{h} → {img.size[0]}x{img.size[1]}")
-
-            # Single Tesseract call — extract text + confidence from data dict
-            data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, lang='ind+eng')
-            text = " ".join(w for w in data['text'] if w.strip())
-
-            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-
-            return text.strip(), avg_confidence, time.time() - start_time
+            return await runner(source, profile)
 
+        except asyncio.TimeoutError:
+            print(f"Tesseract timeout after {settings.OCR_TASK_TIMEOUT}s: {label}")
+            return "", 0.0, time.time() - start_time
         except Exception as e:
             if "not installed" in str(e) or "not found" in str(e):
                 return "Tesseract tidak ditemukan.", 0.0, 0.0
@@ -306,33 +558,21 @@ class OCRService:
     @staticmethod
     async def enhance_with_openai(text: str) -> str:
         """Fix OCR typos using AI."""
-        clients_to_try = []
-        if openai_client:
-            model_name = getattr(settings, "GEMINI_MODEL", "gemini/gemini-2.5-flash")
-            clients_to_try.append(("GeminiProxy", openai_client, model_name))
-        if groq_clients:
-            shuffled = groq_clients.copy()
-            random.shuffle(shuffled)
-            for i, c in enumerate(shuffled):
-                clients_to_try.append((f"Groq-{i+1}", c, settings.GROQ_MODEL))
-
-        for name, client, model in clients_to_try:
-            try:
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": "Fix OCR typos in this Indonesian logistics document. Return only corrected text."},
-                        {"role": "user", "content": text}
-                    ],
-                    temperature=0.2
-                )
-                print(f"Enhanced with {name}")
-                return response.choices[0].message.content.strip()
-            except Exception as e:
-                print(f"{name} enhancement failed: {e}")
-                continue
-
-        return text
+        winner = await _hedged_completion(
+            _llm_candidates(),
+            [
+                {"role": "system", "content": "Fix OCR typos in this Indonesian logistics document. Return only corrected text."},
+                {"role": "user", "content": text}
+            ],
+            parse=lambda raw: raw or None,
+            temperature=0.2,
+            label="enhancement",
+        )
+        if winner:
+            name, enhanced = winner
+            print(f"Enhanced with {name}")
+            return enhanced
+        return FallbackText(text)
 
     @staticmethod
     async def extract_fields_structured(text: str) -> dict:
@@ -341,59 +581,198 @@ class OCRService:
         Uses OpenAI JSON mode first, falls back to regex.
         Returns: {nominal_total, nama_klien, nomor_surat_jalan, tanggal_jatuh_tempo, confidence}
         """
-        clients_to_try = []
-        if openai_client:
-            model_name = getattr(settings, "GEMINI_MODEL", "gemini/gemini-2.5-flash")
-            clients_to_try.append(("GeminiProxy", openai_client, model_name))
-        if groq_clients:
-            shuffled = groq_clients.copy()
-            random.shuffle(shuffled)
-            for i, c in enumerate(shuffled):
-                clients_to_try.append((f"Groq-{i+1}", c, settings.GROQ_MODEL))
-
-        for name, client, model in clients_to_try:
-            try:
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": STRUCTURED_EXTRACTION_PROMPT},
-                        {"role": "user", "content": f"OCR TEXT:\n{text[:3000]}"}
-                    ],
-                    temperature=0.1,
-                    response_format={"type": "json_object"} if "gpt" in model else None
-                )
-                raw = response.choices[0].message.content.strip()
-                # Parse JSON
-                json_match = re.search(r'\{.*\}', raw, re.DOTALL)
-                if json_match:
-                    parsed = json.loads(json_match.group())
-                    print(f"Structured extraction with {name}: confidence={parsed.get('confidence', 'unknown')}")
-                    return parsed
-            except Exception as e:
-                print(f"{name} structured extraction failed: {e}")
-                continue
+        winner = await _hedged_completion(
+            _llm_candidates(),
+            [
+                {"role": "system", "content": STRUCTURED_EXTRACTION_PROMPT},
+                {"role": "user", "content": f"OCR TEXT:\n{select_relevant_lines(text)}"}
+            ],
+            parse=_parse_json_object,
+            temperature=0.1,
+            json_mode=True,
+            label="structured extraction",
+        )
+        if winner:
+            name, parsed = winner
+            print(f"Structured extraction with {name}: confidence={parsed.get('confidence', 'unknown')}")
+            return parsed
 
         # All AI failed, use regex fallback
         print("All AI failed, using regex fallback for field extraction")
-        return _regex_fallback_extraction(text)
+        return FallbackFields(_regex_fallback_extraction(text))
+
+    @staticmethod
+    async def extract_fields_batch(texts: dict) -> dict:
+        """
+        Structured extraction for several documents in one LLM request.
+        texts: {job_id: ocr_text}. Returns {job_id: fields} for every document
+        the model answered for; documents missing from the answer (or all of
+        them, if every provider fails) fall back to extract_fields_structured.
+        """
+        if len(texts) == 1:
+            (job_id, text), = texts.items()
+            return {job_id: await OCRService.extract_fields_structured(text)}
+
+        aliases = {f"d{i+1}": job_id for i, job_id in enumerate(texts)}
+        body = "\n\n".join(
+            f"### DOCUMENT {alias}\n{select_relevant_lines(texts[job_id])}"
+            for alias, job_id in aliases.items()
+        )
+        winner = await _hedged_completion(
+            _llm_candidates(),
+            [
+                {"role": "system", "content": BATCH_EXTRACTION_PROMPT},
+                {"role": "user", "content": body}
+            ],
+            parse=_parse_batch,
+            temperature=0.1,
+            json_mode=True,
+            label=f"batch extraction ({len(texts)} docs)",
+            # The answer grows with every document; a single-document hedge
+            # delay would fire the second provider on almost every batch
+            hedge_delay=settings.LLM_HEDGE_DELAY * len(texts),
+        )
+        answered = winner[1] if winner else {}
+        results = {aliases[a]: fields for a, fields in answered.items() if a in aliases}
+        if winner:
+            print(f"Batch extraction with {winner[0]}: {len(results)}/{len(texts)} document(s)")
+
+        missing = [job_id for job_id in texts if job_id not in results]
+        if missing:
+            print(f"Batch extraction: per-document fallback for {len(missing)} document(s)")
+            fallback = await asyncio.gather(
+                *(OCRService.extract_fields_structured(texts[job_id]) for job_id in missing)
+            )
+            results.update(zip(missing, fallback))
+        return results
 
     @staticmethod
-    async def process_image(image_path: str, use_ai_enhancement: bool = True) -> dict:
-        raw_text, confidence, processing_time = await OCRService.extract_text_tesseract(image_path)
+    async def enhance_and_extract(text: str) -> Tuple[str, dict]:
+        """
+        Cleanup + structured extraction in a single LLM round trip
+        (settings.OCR_COMBINED_EXTRACTION).
+        Returns (enhanced_text, structured_fields); if every provider fails,
+        the raw text and the regex fallback fields, same as the two-step path.
+        """
+        winner = await _hedged_completion(
+            _llm_candidates(),
+            [
+                {"role": "system", "content": COMBINED_EXTRACTION_PROMPT},
+                {"role": "user", "content": f"OCR TEXT:\n{text}"}
+            ],
+            parse=_parse_combined,
+            temperature=0.1,
+            json_mode=True,
+            label="combined extraction",
+        )
+        if winner:
+            name, (enhanced, fields) = winner
+            print(f"Combined extraction with {name}: confidence={fields.get('confidence', 'unknown')}")
+            return enhanced, fields
 
-        enhanced_text = raw_text
-        if use_ai_enhancement and raw_text and "Error" not in raw_text:
-            enhanced_text = await OCRService.enhance_with_openai(raw_text)
+        print("All AI failed, using raw text and regex fallback for field extraction")
+        return FallbackText(text), FallbackFields(_regex_fallback_extraction(text))
+
+    @staticmethod
+    async def process_image(
+        image_path: str,
+        use_ai_enhancement: bool = True,
+        content_hash: Optional[str] = None,
+        field_extractor: Optional[Callable[[str], Awaitable[dict]]] = None,
+        profile: Optional[str] = None,
+    ) -> dict:
+        """
+        OCR + AI cleanup + structured extraction for one image (or PDF).
+        Results are cached by the image's SHA-256 (pass content_hash if the
+        caller already computed it); a cache hit skips Tesseract and the LLMs.
+        field_extractor replaces extract_fields_structured (e.g. the scan
+        worker's batcher); it is ignored with OCR_COMBINED_EXTRACTION. profile picks the OCR profile (name or doc_type).
+        """
+        if image_path.lower().endswith(".pdf"):
+            with open(image_path, "rb") as f:
+                return await OCRService.process_image_bytes(
+                    f.read(), use_ai_enhancement, content_hash, field_extractor, profile
+                )
+
+        if content_hash is None:
+            try:
+                content_hash = hash_file(image_path)
+            except OSError:
+                content_hash = None
+        return await OCRService._process(
+            OCRService.extract_text_tesseract, image_path, use_ai_enhancement, content_hash, field_extractor, profile
+        )
+
+    @staticmethod
+    async def process_image_bytes(
+        content: Union[bytes, Image.Image],
+        use_ai_enhancement: bool = True,
+        content_hash: Optional[str] = None,
+        field_extractor: Optional[Callable[[str], Awaitable[dict]]] = None,
+        profile: Optional[str] = None,
+    ) -> dict:
+        """
+        process_image for an upload that is already in memory: the buffer is
+        hashed and decoded once and goes to Tesseract without touching disk.
+        A PIL image is accepted too (hashed on its pixels), and so is a PDF,
+        whose pages are OCR'd in parallel and joined in page order.
+        """
+        if content_hash is None:
+            if isinstance(content, Image.Image):
+                content_hash = hash_bytes(
+                    f"{content.mode}:{content.size}".encode() + content.tobytes()
+                )
+            else:
+                content_hash = hash_bytes(content)
+        extract = OCRService.extract_text_pdf if is_pdf(content) else OCRService.extract_text_bytes
+        return await OCRService._process(extract, content, use_ai_enhancement, content_hash, field_extractor, profile)
+
+    @staticmethod
+    async def _process(
+        extract, source, use_ai_enhancement: bool, content_hash: Optional[str], field_extractor=None,
+        profile: Optional[str] = None,
+    ) -> dict:
+        profile = profile_for(profile)
+        mode = "ai" if use_ai_enhancement else "raw"
+        if profile != "default":
+            mode = f"{mode}:{profile}"  # another profile reads the same image differently
+        extract_fields = field_extractor or OCRService.extract_fields_structured
+        cached = get_cached_result(content_hash, mode) if content_hash else None
+        if cached:
+            print(f"OCR cache hit: {content_hash[:12]}")
+            return {**cached, "processing_time": 0.0, "cache_hit": True}
+
+        raw_text, confidence, processing_time = await extract(source, profile)
 
-        # Structured field extraction
+        enhanced_text = raw_text
         structured_fields = {}
-        if enhanced_text and "Error" not in enhanced_text:
-            structured_fields = await OCRService.extract_fields_structured(enhanced_text)
+        ocr_ok = bool(raw_text) and "Error" not in raw_text
+
+        if use_ai_enhancement and ocr_ok and settings.OCR_COMBINED_EXTRACTION:
+            # One round trip returns both the cleaned text and the fields;
+            # field_extractor (the scan worker's batcher) is not used here
+            enhanced_text, structured_fields = await OCRService.enhance_and_extract(raw_text)
+        else:
+            if use_ai_enhancement and ocr_ok:
+                enhanced_text = await OCRService.enhance_with_openai(raw_text)
+
+            # Structured field extraction
+            if enhanced_text and "Error" not in enhanced_text:
+                structured_fields = await extract_fields(enhanced_text)
 
-        return {
+        result = {
             "raw_text": raw_text,
             "enhanced_text": enhanced_text,
             "confidence_score": confidence,
             "processing_time": processing_time,
             "structured_fields": structured_fields
-        }
\ No newline at end of file
+        }
+        # Don't cache failed OCR runs — a retry might succeed. Results the LLM
+        # step could not produce (providers down) are kept only briefly, so
+        # duplicates after the outage get the real fields.
+        if content_hash and raw_text and "Error" not in raw_text and "tidak ditemukan" not in raw_text:
+            degraded = isinstance(enhanced_text, FallbackText) or isinstance(structured_fields, FallbackFields)
+            set_cached_result(
+                content_hash, result, mode, ttl=settings.OCR_CACHE_FALLBACK_TTL if degraded else None,
+            )
+        return result
@@ -1,6 +1,17 @@
 """
 Redis-backed scan processing queue service.
 Supports enqueueing jobs, polling status, and dequeuing for workers.
+Jobs are batch scans (enqueue_scan, written to Supabase) or OCR for a local
+upload (enqueue_scan_ocr, kind "scan_ocr").
+
+Delivery is at-least-once: a dequeued job is moved (BLMOVE) onto a
+processing list and leased for SCAN_VISIBILITY_TIMEOUT seconds.  The worker
+acks it when done; failed or expired jobs are re-queued with exponential
+backoff until SCAN_MAX_ATTEMPTS, then parked on the dead-letter list.
+
+Each dequeue gets a lease token (LEASE_OWNERS_KEY). The worker renews the
+lease while the job runs (extend_lease); once a lease has expired and the
+job was handed out again, the old worker's ack_scan/retry_scan are no-ops.
 """
 import json
 import uuid
@@ -12,9 +23,54 @@ import redis
 _redis_client: Optional[redis.Redis] = None
 
 QUEUE_KEY = "scan_queue"
+PROCESSING_KEY = "scan_queue:processing"  # jobs currently held by a worker
+LEASES_KEY = "scan_queue:leases"          # zset job_id -> lease deadline
+LEASE_OWNERS_KEY = "scan_queue:owners"    # hash job_id -> lease token of the current holder
+DELAYED_KEY = "scan_queue:delayed"        # zset job_id -> retry-at timestamp
+DEAD_KEY = "scan_queue:dead"              # job payloads that ran out of attempts
 JOB_PREFIX = "scan_job:"
 JOB_TTL = 3600  # 1 hour
 
+# Release a job (processing list, lease, owner). With a token only while that
+# lease is still live: once the reaper has taken an expired lease the job is
+# being retried and belongs to nobody.
+# KEYS: processing, leases, owners  ARGV: job_id, token ("" = any holder)
+_RELEASE_SCRIPT = """
+if ARGV[2] ~= '' then
+    if redis.call('HGET', KEYS[3], ARGV[1]) ~= ARGV[2] or not redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+        return 0
+    end
+end
+redis.call('LREM', KEYS[1], 1, ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Push the lease deadline out, only if the lease still exists and is ours.
+# KEYS: leases, owners  ARGV: job_id, token, deadline
+_EXTEND_SCRIPT = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] or not redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], 'XX', ARGV[3], ARGV[1])
+return 1
+"""
+
+# Lease a job found on the processing list without one (its worker died
+# between BLMOVE and setting the lease); skips jobs acked in the meantime.
+# KEYS: processing, leases  ARGV: job_id, deadline
+_ORPHAN_SCRIPT = """
+if redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+    return 0
+end
+if not redis.call('LPOS', KEYS[1], ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return 1
+"""
+
 
 def get_redis() -> redis.Redis:
     global _redis_client
@@ -40,6 +96,7 @@ def enqueue_scan(user_id: str, file_path: str, file_name: str,
         "signature_url": signature_url,
         "image_url": image_url,
         "status": "pending",
+        "attempts": 0,
         "created_at": time.time(),
         "result": None,
         "error": None
@@ -54,6 +111,37 @@ def enqueue_scan(user_id: str, file_path: str, file_name: str,
     return job_id
 
 
+def scan_ocr_job_id(scan_id: int) -> str:
+    return f"scan-ocr-{scan_id}"
+
+
+def enqueue_scan_ocr(user_id: str, scan_id: int, file_path: str) -> str:
+    """
+    Queue OCR for a file uploaded through /api/scans/upload (kind "scan_ocr";
+    the worker updates the local Scan row). The job id is derived from the
+    scan id so its status can be looked up per scan. Returns job_id.
+    """
+    job_id = scan_ocr_job_id(scan_id)
+    job_data = {
+        "job_id": job_id,
+        "kind": "scan_ocr",
+        "user_id": user_id,
+        "scan_id": scan_id,
+        "file_path": file_path,
+        "status": "pending",
+        "attempts": 0,
+        "created_at": time.time(),
+        "result": None,
+        "error": None
+    }
+
+    r = get_redis()
+    r.setex(f"{JOB_PREFIX}{job_id}", JOB_TTL, json.dumps(job_data))
+    r.rpush(QUEUE_KEY, job_id)
+
+    return job_id
+
+
 def get_job_status(job_id: str) -> Optional[dict]:
     """Get job status and result. Returns None if job not found."""
     r = get_redis()
@@ -81,21 +169,148 @@ def update_job_status(job_id: str, status: str, result: dict = None, error: str
 
 def dequeue_scan(timeout: int = 5) -> Optional[dict]:
     """
-    Blocking pop from queue. Returns job data dict or None.
+    Blocking move from queue to the processing list. Returns job data dict or None.
     timeout: seconds to wait for a job (0 = block forever)
+
+    The job stays leased until ack_scan()/retry_scan() is called or the
+    visibility timeout expires and reap_scan_queue() re-queues it.
     """
+    from config.settings import settings
+
     r = get_redis()
-    result = r.blpop(QUEUE_KEY, timeout=timeout)
-    if not result:
+    job_id = r.blmove(QUEUE_KEY, PROCESSING_KEY, timeout, "LEFT", "RIGHT")
+    if not job_id:
         return None
-    _, job_id = result
     raw = r.get(f"{JOB_PREFIX}{job_id}")
     if not raw:
+        # Job data expired while queued — nothing left to process
+        r.lrem(PROCESSING_KEY, 1, job_id)
         return None
-    return json.loads(raw)
+    token = uuid.uuid4().hex
+    pipe = r.pipeline()
+    pipe.zadd(LEASES_KEY, {job_id: time.time() + settings.SCAN_VISIBILITY_TIMEOUT})
+    pipe.hset(LEASE_OWNERS_KEY, job_id, token)
+    pipe.execute()
+
+    job_data = json.loads(raw)
+    job_data["attempts"] = int(job_data.get("attempts") or 0) + 1
+    r.setex(f"{JOB_PREFIX}{job_id}", JOB_TTL, json.dumps(job_data))
+    job_data["lease_token"] = token
+    return job_data
+
+
+def extend_lease(job_id: str, token: str) -> bool:
+    """
+    Renew a running job's lease for another SCAN_VISIBILITY_TIMEOUT seconds.
+    Returns False when the lease is gone (expired and reaped, or taken over).
+    """
+    from config.settings import settings
+
+    r = get_redis()
+    deadline = time.time() + settings.SCAN_VISIBILITY_TIMEOUT
+    return bool(r.eval(_EXTEND_SCRIPT, 2, LEASES_KEY, LEASE_OWNERS_KEY, job_id, token, deadline))
+
+
+def ack_scan(job_id: str, token: Optional[str] = None) -> bool:
+    """
+    Mark a dequeued job as finished and release its lease. With a token this
+    is a no-op (returns False) once the lease has expired or the job has been
+    handed to another worker.
+    """
+    r = get_redis()
+    return bool(r.eval(_RELEASE_SCRIPT, 3, PROCESSING_KEY, LEASES_KEY, LEASE_OWNERS_KEY, job_id, token or ""))
+
+
+def mark_job_step(job_id: str, step: str, value: str = "1") -> bool:
+    """
+    Record that a side effect of the job (e.g. "charged") has happened,
+    optionally with its result (e.g. the id of the row it wrote).
+    Returns True only the first time, so a retried job can skip it.
+    """
+    r = get_redis()
+    return bool(r.set(f"{JOB_PREFIX}{job_id}:{step}", value, nx=True, ex=JOB_TTL))
+
+
+def get_job_step(job_id: str, step: str) -> Optional[str]:
+    """Value recorded by mark_job_step, or None if the step has not happened."""
+    r = get_redis()
+    return r.get(f"{JOB_PREFIX}{job_id}:{step}")
+
+
+def unmark_job_step(job_id: str, step: str):
+    """Forget a step whose side effect failed, so the retry performs it."""
+    r = get_redis()
+    r.delete(f"{JOB_PREFIX}{job_id}:{step}")
+
+
+def retry_scan(job_id: str, error: str, token: Optional[str] = None) -> bool:
+    """
+    Release a failed job. Schedules a retry with exponential backoff, or moves
+    it to the dead-letter list once SCAN_MAX_ATTEMPTS is reached.
+    Returns True if the job will be retried (also when another worker holds
+    it now and the call was a no-op).
+    """
+    from config.settings import settings
+
+    r = get_redis()
+    if not ack_scan(job_id, token) and token:
+        return True
+
+    job_data = get_job_status(job_id) or {"job_id": job_id}
+    attempts = int(job_data.get("attempts") or 0)
+
+    if attempts >= settings.SCAN_MAX_ATTEMPTS:
+        job_data["status"] = "failed"
+        job_data["error"] = error
+        job_data["updated_at"] = time.time()
+        r.setex(f"{JOB_PREFIX}{job_id}", JOB_TTL, json.dumps(job_data))
+        # Keep the full payload — job keys expire, the dead list does not
+        r.rpush(DEAD_KEY, json.dumps(job_data))
+        return False
+
+    delay = settings.SCAN_RETRY_BASE_DELAY * (2 ** max(0, attempts - 1))
+    r.zadd(DELAYED_KEY, {job_id: time.time() + delay})
+    update_job_status(job_id, "retrying", error=error)
+    return True
+
+
+def reap_scan_queue() -> dict:
+    """
+    Housekeeping, safe to run from any number of workers:
+    - re-queue (with backoff) jobs whose lease expired, e.g. the worker crashed
+    - lease jobs left on the processing list without one, so they expire too
+    - move delayed retries whose backoff elapsed back onto the main queue
+    ZREM decides which worker claims each entry, so nothing is handled twice.
+    """
+    from config.settings import settings
+
+    r = get_redis()
+    now = time.time()
+    expired = requeued = 0
+
+    for job_id in r.lrange(PROCESSING_KEY, 0, -1):
+        r.eval(_ORPHAN_SCRIPT, 2, PROCESSING_KEY, LEASES_KEY, job_id, now + settings.SCAN_VISIBILITY_TIMEOUT)
+
+    for job_id in r.zrangebyscore(LEASES_KEY, 0, now):
+        if r.zrem(LEASES_KEY, job_id):
+            expired += 1
+            retry_scan(job_id, "Visibility timeout expired")
+
+    for job_id in r.zrangebyscore(DELAYED_KEY, 0, now):
+        if r.zrem(DELAYED_KEY, job_id):
+            requeued += 1
+            r.rpush(QUEUE_KEY, job_id)
+
+    return {"expired": expired, "requeued": requeued}
 
 
 def get_queue_length() -> int:
     """Get number of jobs waiting in queue."""
     r = get_redis()
     return r.llen(QUEUE_KEY)
+
+
+def get_dead_letter_length() -> int:
+    """Get number of jobs that exhausted their retries."""
+    r = get_redis()
+    return r.llen(DEAD_KEY)
@@ -3,17 +3,20 @@ Shared helpers for scan processing — credit check, ImageKit upload,
 OCR pipeline, Supabase sync.  Used by scans.py, fraud.py, etc.
 """
 
-import os
+import asyncio
 import hashlib
-import tempfile
+import uuid
 from datetime import date as dt_date
 from typing import Optional, Tuple
 
 from fastapi import HTTPException
 
+from config.settings import settings
 from models.models import User, Scan, CreditHistory
 from services.ocr_service import OCRService
 from services.imagekit_qr_service import ImageKitQRService
+from services.credit_service import deduct_credits
+from services import scan_outbox
 
 SCAN_COST = 1  # Credit cost per scan
 
@@ -59,15 +62,24 @@ async def check_and_deduct_credits(
     supabase_admin = get_supabase_admin()
 
     if supabase_admin:
-        resp = (
-            supabase_admin.table("profiles")
-            .select("credits")
-            .eq("id", str(user.id))
-            .limit(1)
-            .execute()
-        )
-        profile_rows = resp.data or []
-        if not profile_rows:
+        # Single atomic round trip on the common path
+        new_balance = deduct_credits(supabase_admin, str(user.id), SCAN_COST)
+        if new_balance is None:
+            resp = (
+                supabase_admin.table("profiles")
+                .select("credits")
+                .eq("id", str(user.id))
+                .limit(1)
+                .execute()
+            )
+            profile_rows = resp.data or []
+            if profile_rows:
+                profile = profile_rows[0] if isinstance(profile_rows[0], dict) else {}
+                available = int(profile.get("credits") or 0)
+                raise HTTPException(
+                    status_code=402,
+                    detail=f"Insufficient credits. Required: {SCAN_COST}, Available: {available}",
+                )
             # New user — auto-initialize profile with default credits
             DEFAULT_CREDITS = 10
             try:
@@ -76,28 +88,19 @@ async def check_and_deduct_credits(
                 if email_val:
                     upsert_data["user_email"] = email_val
                 supabase_admin.table("profiles").upsert(upsert_data, on_conflict="id").execute()
+                new_balance = deduct_credits(supabase_admin, str(user.id), SCAN_COST)
             except Exception as e:
                 print(f"[credits] Failed to auto-init profile for {user.id}: {e}")
-            available = DEFAULT_CREDITS
-        else:
-            profile = profile_rows[0] if isinstance(profile_rows[0], dict) else {}
-            available = int(profile.get("credits") or 0)
+            if new_balance is None:
+                new_balance = DEFAULT_CREDITS - SCAN_COST
     else:
         available = int(getattr(user, "credits", 0) or 0)
-
-    if available < SCAN_COST:
-        raise HTTPException(
-            status_code=402,
-            detail=f"Insufficient credits. Required: {SCAN_COST}, Available: {available}",
-        )
-
-    # Deduct
-    new_balance = available - SCAN_COST
-    if supabase_admin:
-        supabase_admin.table("profiles").update({"credits": new_balance}).eq(
-            "id", str(user.id)
-        ).execute()
-    else:
+        if available < SCAN_COST:
+            raise HTTPException(
+                status_code=402,
+                detail=f"Insufficient credits. Required: {SCAN_COST}, Available: {available}",
+            )
+        new_balance = available - SCAN_COST
         setattr(user, "credits", new_balance)
         db.commit()
 
@@ -125,30 +128,28 @@ async def upload_and_ocr(
     folder: str = "/qr-scans",
 ) -> Tuple[str, str, dict]:
     """
-    1. Upload to ImageKit
-    2. OCR the image via temp file
+    Concurrently:
+    1. Upload to ImageKit (blocking SDK call, on a thread)
+    2. OCR the image straight from memory
+
+    Both read the same bytes and neither needs the other's result, so the
+    caller waits for the slower of the two instead of their sum. If either
+    fails the other is cancelled and the error is raised as before.
 
     Returns (image_url, extracted_text, ocr_result_dict).
     """
-    # ImageKit
-    ik = ImageKitQRService.upload_file(
-        file=content, file_name=filename, folder=folder
-    )
-    image_url = ik.get("url", "")
-
-    # Temp file → OCR
-    suffix = os.path.splitext(filename)[1] or ".jpg"
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    tmp.write(content)
-    tmp.close()
-
+    upload = asyncio.create_task(asyncio.to_thread(
+        ImageKitQRService.upload_file, file=content, file_name=filename, folder=folder
+    ))
+    # In-memory OCR: no temp file, the buffer is hashed and decoded once
+    ocr = asyncio.create_task(OCRService.process_image_bytes(content, use_ai_enhancement=True))
     try:
-        ocr_result = await OCRService.process_image(tmp.name, use_ai_enhancement=True)
-    finally:
-        try:
-            os.unlink(tmp.name)
-        except OSError:
-            pass
+        ik, ocr_result = await asyncio.gather(upload, ocr)
+    except BaseException:
+        upload.cancel()
+        ocr.cancel()
+        raise
+    image_url = ik.get("url", "")
 
     extracted = (
         ocr_result.get("enhanced_text")
@@ -171,48 +172,122 @@ def sync_to_supabase(
     structured: dict,
     ocr_result: dict,
     is_fraud: bool = False,
-) -> None:
+    scan_id: Optional[str] = None,
+) -> Optional[dict]:
     """
     Insert into Supabase `documents` + `extracted_finance_data`,
-    and optionally `fraud_scans`.
+    and optionally `fraud_scans` (save_scan_records, see
+    database/scan_persistence_migration.sql). The fraud_scans row is
+    sealed by the database at insert time.
+
+    With SCAN_OUTBOX_ENABLED the record is appended to the Redis outbox
+    (services.scan_outbox) and written in the background; returns
+    {"idempotency_key", "status": "queued", "entry_id"}. Without it, or when
+    Redis is unavailable, it is written here and the save_scan_records
+    result is returned with "status" "saved" or "duplicate".
+    The idempotency key is scoped to scan_id (the local scan row, or a
+    fresh id per call), so only a redelivery of this record is a duplicate.
+    Returns None when Supabase is unavailable or the write failed.
     """
     supabase_admin = get_supabase_admin()
     if not supabase_admin:
-        return
+        return None
 
     nominal_amount = structured.get("nominal_total") or 0
 
-    # documents + finance
-    try:
-        doc_data = {
+    doc_data = {
+        "user_id": user_id,
+        "file_name": filename,
+        "file_url": image_url,
+        "doc_hash": content_hash,
+        "status": confidence_to_status(structured.get("confidence", "low")),
+    }
+    data_hash = hashlib.sha256(
+        f"{recipient_name}_{dt_date.today()}_{nominal_amount}_{signature_url}".encode()
+    ).hexdigest()
+    finance_data = {
+        "user_id": user_id,
+        "vendor_name": recipient_name or "Unknown Vendor",
+        "client_name": structured.get("nama_klien"),
+        "invoice_number": structured.get("nomor_surat_jalan"),
+        "due_date": structured.get("tanggal_jatuh_tempo"),
+        "transaction_date": dt_date.today().isoformat(),
+        "nominal_amount": nominal_amount,
+        "field_confidence": structured.get("confidence", "low"),
+        "data_hash": data_hash,
+    }
+
+    fraud_data = None
+    if is_fraud:
+        fraud_status = confidence_to_status(structured.get("confidence", "low"))
+        # Tampered docs get nominal = 0 (rejected, no valid amount)
+        tampered = fraud_status == "tampered"
+        fraud_data_full = {
             "user_id": user_id,
-            "file_name": filename,
+            "original_filename": filename,
             "file_url": image_url,
+            "imagekit_url": image_url,
+            "signature_url": signature_url,
+            "recipient_name": recipient_name,
+            "extracted_text": ocr_result.get("enhanced_text") or "",
+            "confidence_score": ocr_result.get("confidence_score", 0),
+            "processing_time": ocr_result.get("processing_time", 0),
+            "nominal_total": 0 if tampered else nominal_amount,
+            # Legacy fields (kept for backward compat)
+            "nama_klien": structured.get("nama_klien"),
+            "nomor_surat_jalan": structured.get("nomor_surat_jalan"),
+            "tanggal_jatuh_tempo": structured.get("tanggal_jatuh_tempo"),
+            "field_confidence": structured.get("confidence", "low"),
             "doc_hash": content_hash,
-            "status": confidence_to_status(structured.get("confidence", "low")),
+            "status": fraud_status,
+            # Universal invoice fields
+            "doc_type": structured.get("doc_type"),
+            "nomor_dokumen": structured.get("nomor_dokumen"),
+            "tanggal_terbit": structured.get("tanggal_terbit"),
+            "nama_penjual": structured.get("nama_penjual"),
+            "nominal_subtotal": None if tampered else structured.get("nominal_subtotal"),
+            "nominal_ppn": None if tampered else structured.get("nominal_ppn"),
+            "metode_bayar": structured.get("metode_bayar"),
+            "terminal_id": structured.get("terminal_id"),
+            "no_referensi": structured.get("no_referensi"),
         }
-        doc_result = supabase_admin.table("documents").insert(doc_data).execute()
-        if doc_result.data:
-            doc_id = doc_result.data[0]["id"]
-            data_hash = hashlib.sha256(
-                f"{recipient_name}_{dt_date.today()}_{nominal_amount}_{signature_url}".encode()
-            ).hexdigest()
-            finance_data = {
-                "document_id": doc_id,
-                "user_id": user_id,
-                "vendor_name": recipient_name or "Unknown Vendor",
-                "client_name": structured.get("nama_klien"),
-                "invoice_number": structured.get("nomor_surat_jalan"),
-                "due_date": structured.get("tanggal_jatuh_tempo"),
-                "transaction_date": dt_date.today().isoformat(),
-                "nominal_amount": nominal_amount,
-                "field_confidence": structured.get("confidence", "low"),
-                "data_hash": data_hash,
-            }
-            supabase_admin.table("extracted_finance_data").insert(finance_data).execute()
-            print(f"✅ Synced to documents + finance_data")
+        # Remove None values so the column defaults apply
+        fraud_data = {k: v for k, v in fraud_data_full.items() if v is not None}
+
+    record = {
+        "idempotency_key": scan_outbox.idempotency_key(
+            user_id, content_hash, is_fraud, str(scan_id) if scan_id is not None else uuid.uuid4().hex
+        ),
+        "document": doc_data,
+        "finance": finance_data,
+        "fraud": fraud_data,
+    }
+    if settings.SCAN_OUTBOX_ENABLED:
+        try:
+            entry_id = scan_outbox.append(record)
+            print(f"📮 Scan record queued for Supabase ({record['idempotency_key'][:24]}...)")
+            return {"idempotency_key": record["idempotency_key"], "status": "queued", "entry_id": entry_id}
+        except Exception as e:
+            print(f"⚠️ Scan outbox unavailable, writing to Supabase directly: {e}")
+
+    try:
+        results = scan_outbox.write_records(supabase_admin, [record])
     except Exception as e:
-        return False
+        print(f"❌ save_scan_records failed: {e}")
+        return None
+
+    saved = results[0] if results else {"status": "failed", "error": "no result returned"}
+    if saved.get("status") == "failed":
+        print(f"❌ save_scan_records failed: {saved.get('error')}")
+        return None
+    if saved.get("status") == "duplicate":
+        print(f"ℹ️ Scan already in Supabase ({record['idempotency_key'][:24]}...)")
+    elif saved.get("fraud_scan_id"):
+        print(f"✅ Synced to documents + finance_data + fraud_scans "
+              f"(doc_type={structured.get('doc_type')}, sealed {str(saved['fraud_scan_id'])[:8]}...)")
+    else:
+        print(f"✅ Synced to documents + finance_data")
+    return saved
 
 
 async def handle_save_scan_with_signature(request, file, recipient_name: str, signature_url: str, is_fraud_scan: str, current_user, db) -> dict:
@@ -289,6 +364,7 @@ async def handle_save_scan_with_signature(request, file, recipient_name: str, si
                 structured=structured,
                 ocr_result=ocr_result,
                 is_fraud=True,
+                scan_id=tampered_scan.id,
             )
 
             print(f"🟠 FRAUD ACCEPTED (tampered) - id={tampered_scan.id}, confidence=low, file={file.filename}")
@@ -372,6 +448,7 @@ async def handle_save_scan_with_signature(request, file, recipient_name: str, si
         structured=structured,
         ocr_result=ocr_result,
         is_fraud=is_fraud,
+        scan_id=new_scan.id,
     )
 
     return {
@@ -388,79 +465,3 @@ async def handle_save_scan_with_signature(request, file, recipient_name: str, si
         "credits_remaining": new_balance,
         "rejected": False,
     }
-
-
-    # fraud_scans (only when is_fraud)
-    if is_fraud:
-        try:
-            fraud_status = confidence_to_status(structured.get("confidence", "low"))
-            # Tampered docs get nominal = 0 (rejected, no valid amount)
-            fraud_nominal_total = 0 if fraud_status == "tampered" else (structured.get("nominal_total") or 0)
-            fraud_nominal_subtotal = None if fraud_status == "tampered" else structured.get("nominal_subtotal")
-            fraud_nominal_ppn = None if fraud_status == "tampered" else structured.get("nominal_ppn")
-
-            fraud_data_full = {
-                "user_id": user_id,
-                "original_filename": filename,
-                "file_url": image_url,
-                "imagekit_url": image_url,
-                "signature_url": signature_url,
-                "recipient_name": recipient_name,
-                "extracted_text": ocr_result.get("enhanced_text") or "",
-                "confidence_score": ocr_result.get("confidence_score", 0),
-                "processing_time": ocr_result.get("processing_time", 0),
-                "nominal_total": fraud_nominal_total,
-                # Legacy fields (kept for backward compat)
-                "nama_klien": structured.get("nama_klien"),
-                "nomor_surat_jalan": structured.get("nomor_surat_jalan"),
-                "tanggal_jatuh_tempo": structured.get("tanggal_jatuh_tempo"),
-                "field_confidence": structured.get("confidence", "low"),
-                "doc_hash": content_hash,
-                "status": fraud_status,
-                # Universal invoice fields
-                "doc_type": structured.get("doc_type"),
-                "nomor_dokumen": structured.get("nomor_dokumen"),
-                "tanggal_terbit": structured.get("tanggal_terbit"),
-                "nama_penjual": structured.get("nama_penjual"),
-                "nominal_subtotal": fraud_nominal_subtotal,
-                "nominal_ppn": fraud_nominal_ppn,
-                "metode_bayar": structured.get("metode_bayar"),
-                "terminal_id": structured.get("terminal_id"),
-                "no_referensi": structured.get("no_referensi"),
-            }
-            # Remove None values
-            fraud_data = {k: v for k, v in fraud_data_full.items() if v is not None}
-            try:
-                supabase_admin.table("fraud_scans").insert(fraud_data).execute()
-                print(f"✅ Fraud scan saved to Supabase fraud_scans (doc_type={structured.get('doc_type')})")
-                # Apply SHA-256 integrity seal
-                try:
-                    from services.ledger_service import seal_scan as _seal
-                    # Re-fetch the inserted row to get its id + created_at
-                    last_row = (
-                        supabase_admin.table("fraud_scans")
-                        .select("id, user_id, nominal_total, created_at")
-                        .eq("user_id", user_id)
-                        .order("created_at", desc=True)
-                        .limit(1)
-                        .execute()
-                    )
-                    if getattr(last_row, "data", None):
-                        _seal(supabase_admin, last_row.data[0])
-                except Exception as seal_err:
-                    print(f"⚠️ Ledger seal failed (non-blocking): {seal_err}")
-            except Exception as insert_err:
-                err_str = str(insert_err)
-                # If new columns don't exist yet, fall back to legacy-only insert
-                new_cols = {"doc_type", "nomor_dokumen", "tanggal_terbit", "nama_penjual",
-                            "nominal_subtotal", "nominal_ppn", "metode_bayar", "terminal_id", "no_referensi"}
-                if any(col in err_str for col in new_cols):
-                    print(f"⚠️ New columns not yet in DB, retrying with legacy fields: {insert_err}")
-                    legacy_data = {k: v for k, v in fraud_data.items() if k not in new_cols}
-                    supabase_admin.table("fraud_scans").insert(legacy_data).execute()
-                    print(f"✅ Fraud scan saved (legacy fallback)")
-                else:
-                    raise
-        except Exception as e:
-            print(f"❌ fraud_scans insert failed: {e}")
-
@@ -0,0 +1,85 @@
+"""
+OCR jobs for files uploaded through /api/scans/upload.
+
+The upload request only stores the file and a "processing" Scan row, then
+hands OCR to the scan worker through the Redis scan queue (kind "scan_ocr",
+see workers/scan_worker.py). OCR capacity therefore scales with the number
+of workers and their SCAN_WORKER_CONCURRENCY, not with the API processes.
+Jobs open their own session from the config.database pool instead of
+borrowing the request's, which is closed once the response is sent.
+
+When Redis is unavailable the job runs in the API process instead, at most
+SCAN_WORKER_CONCURRENCY at a time.
+"""
+import asyncio
+from typing import Optional
+
+from config.database import SessionLocal
+from config.settings import settings
+from models.models import Scan
+from services.ocr_service import OCRService
+from services.queue_service import enqueue_scan_ocr
+
+_local_slots: Optional[asyncio.Semaphore] = None
+_local_tasks: set = set()
+
+
+def _update_scan(scan_id: int, **values) -> bool:
+    db = SessionLocal()
+    try:
+        scan = db.query(Scan).filter(Scan.id == scan_id).first()
+        if not scan:
+            return False
+        for key, value in values.items():
+            setattr(scan, key, value)
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+async def process_upload_scan(scan_id: int, file_path: str) -> dict:
+    """OCR the uploaded file and store the result on its Scan row. Raises when OCR fails."""
+    result = await OCRService.process_image(file_path, use_ai_enhancement=True)
+    await asyncio.to_thread(
+        _update_scan,
+        scan_id,
+        extracted_text=result["enhanced_text"],
+        confidence_score=result["confidence_score"],
+        processing_time=result["processing_time"],
+        status="completed",
+        error_message=None,
+    )
+    return result
+
+
+async def fail_upload_scan(scan_id: int, error: str):
+    await asyncio.to_thread(_update_scan, scan_id, status="failed", error_message=error)
+
+
+async def _run_local(scan_id: int, file_path: str):
+    global _local_slots
+    if _local_slots is None:
+        _local_slots = asyncio.Semaphore(max(1, settings.SCAN_WORKER_CONCURRENCY))
+    async with _local_slots:
+        try:
+            await process_upload_scan(scan_id, file_path)
+        except Exception as e:
+            print(f"❌ Upload OCR failed for scan {scan_id}: {e}")
+            await fail_upload_scan(scan_id, str(e))
+
+
+def submit_upload_scan(user_id: str, scan_id: int, file_path: str) -> Optional[str]:
+    """
+    Queue OCR for an uploaded scan. Returns the job id, or None when Redis is
+    unavailable and the job was started in this process.
+    """
+    try:
+        return enqueue_scan_ocr(user_id, scan_id, file_path)
+    except Exception as e:
+        print(f"⚠️ Scan queue unavailable, running OCR for scan {scan_id} in-process: {e}")
+
+    task = asyncio.get_running_loop().create_task(_run_local(scan_id, file_path))
+    _local_tasks.add(task)
+    task.add_done_callback(_local_tasks.discard)
+    return None
@@ -0,0 +1,259 @@
+"""
+Write-behind outbox for Supabase scan persistence (Redis Stream).
+
+sync_to_supabase appends the scan record to the `scan_outbox` stream and
+returns; consumers in the `supabase_writer` group (one per API process,
+started in main.py) drain the stream in batches of SCAN_OUTBOX_BATCH_SIZE
+with one save_scan_records_batch call (database/scan_outbox_migration.sql).
+Slow or unavailable Supabase no longer shows up in scan latency, and
+records survive the outage in Redis.
+
+Delivery is at-least-once. Every record carries an idempotency key (scan
+kind, user, document hash) that the database stores on the documents row,
+so a record delivered twice is acked as a duplicate instead of written twice.
+
+- Supabase unreachable: the batch stays pending and the consumer backs off
+  and retries until it is back; nothing counts against the record.
+- Record rejected by the database: retried with exponential backoff
+  (SCAN_OUTBOX_RETRY_BASE_DELAY), after SCAN_OUTBOX_MAX_ATTEMPTS moved to
+  the `scan_outbox:dead` stream.
+- Consumer stopped with records in flight: another consumer claims them
+  once they have been idle for SCAN_OUTBOX_CLAIM_IDLE seconds.
+
+Written records are acked and deleted, so the stream only holds records that
+are not in Supabase yet; outbox_stats() reports that as the lag metric.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Optional
+
+import redis
+
+from config.settings import settings
+from services.queue_service import get_redis
+
+STREAM_KEY = "scan_outbox"
+GROUP = "supabase_writer"
+DEAD_KEY = "scan_outbox:dead"          # records that ran out of attempts
+ATTEMPTS_KEY = "scan_outbox:attempts"  # hash entry_id -> {"attempts", "retry_at", "error"}
+BLOCK_MS = 1000          # XREADGROUP block; stays below the client socket timeouts
+CLAIM_INTERVAL = 30      # seconds between sweeps for records of stopped consumers
+MAX_BACKOFF = 60         # seconds, cap while Supabase is unreachable
+LAG_WARN = 60            # seconds; log the outbox stats when the oldest record is older
+
+_running = True
+_group_ready = False
+_last_claim = 0.0
+
+
+def idempotency_key(user_id: str, content_hash: str, is_fraud: bool, scan_id: str) -> str:
+    """One key per scan event: a re-scan of the same file is a new record, a redelivery is not."""
+    return f"{'fraud' if is_fraud else 'scan'}:{user_id}:{content_hash}:{scan_id}"
+
+
+def append(record: dict) -> str:
+    """Queue a scan record ({"idempotency_key", "document", "finance", "fraud"}). Returns the entry id."""
+    r = get_redis()
+    return r.xadd(STREAM_KEY, {
+        "key": record["idempotency_key"],
+        "record": json.dumps(record, default=str),
+    })
+
+
+def write_records(supabase_admin, records: list) -> list:
+    """
+    Save records in one save_scan_records_batch call. Returns one result per
+    record with status "saved", "duplicate" or "failed". Raises when the
+    call itself fails (Supabase unreachable).
+    """
+    result = supabase_admin.rpc("save_scan_records_batch", {
+        "p_records": records,
+        "p_seal_salt": settings.LEDGER_SECRET_SALT,
+    }).execute()
+    return result.data or []
+
+
+# ── Consumer ────────────────────────────────────────────────────────────────
+
+def _ensure_group(r: redis.Redis):
+    global _group_ready
+    if _group_ready:
+        return
+    try:
+        r.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+    _group_ready = True
+
+
+def _entries(response) -> list:
+    """[(entry_id, fields), ...] from an XREADGROUP response."""
+    return [(entry_id, fields) for _, entries in (response or []) for entry_id, fields in entries if fields]
+
+
+def _due(r: redis.Redis, entries: list) -> list:
+    """Drop entries whose retry backoff has not elapsed yet."""
+    if not entries:
+        return []
+    now = time.time()
+    states = r.hmget(ATTEMPTS_KEY, [entry_id for entry_id, _ in entries])
+    return [
+        entry for entry, state in zip(entries, states)
+        if not state or json.loads(state).get("retry_at", 0) <= now
+    ]
+
+
+def _finish(r: redis.Redis, entry_ids: list):
+    if not entry_ids:
+        return
+    pipe = r.pipeline()
+    pipe.xack(STREAM_KEY, GROUP, *entry_ids)
+    pipe.xdel(STREAM_KEY, *entry_ids)
+    pipe.hdel(ATTEMPTS_KEY, *entry_ids)
+    pipe.execute()
+
+
+def _fail(r: redis.Redis, entry_id: str, fields: dict, error: str) -> bool:
+    """Schedule a retry, or dead-letter the record. Returns True if it was dead-lettered."""
+    state = r.hget(ATTEMPTS_KEY, entry_id)
+    attempts = (json.loads(state).get("attempts", 0) if state else 0) + 1
+    if attempts >= settings.SCAN_OUTBOX_MAX_ATTEMPTS:
+        r.xadd(DEAD_KEY, {
+            "entry_id": entry_id,
+            "key": fields.get("key", ""),
+            "record": fields.get("record", ""),
+            "error": error or "",
+        })
+        _finish(r, [entry_id])
+        print(f"❌ Scan outbox: {fields.get('key')} dead-lettered after {attempts} attempts: {error}")
+        return True
+    delay = settings.SCAN_OUTBOX_RETRY_BASE_DELAY * (2 ** (attempts - 1))
+    r.hset(ATTEMPTS_KEY, entry_id, json.dumps({
+        "attempts": attempts, "retry_at": time.time() + delay, "error": error,
+    }))
+    return False
+
+
+def _claim(r: redis.Redis, consumer: str, count: int) -> list:
+    """Take over records left pending by stopped consumers; forget stopped consumers that hold nothing."""
+    global _last_claim
+    now = time.time()
+    if now - _last_claim < CLAIM_INTERVAL:
+        return []
+    _last_claim = now
+
+    _, claimed, *_ = r.xautoclaim(
+        STREAM_KEY, GROUP, consumer,
+        min_idle_time=settings.SCAN_OUTBOX_CLAIM_IDLE * 1000, start_id="0-0", count=count,
+    )
+    idle_ms = max(settings.SCAN_OUTBOX_CLAIM_IDLE * 1000, 3600 * 1000)
+    for info in r.xinfo_consumers(STREAM_KEY, GROUP):
+        if info["name"] != consumer and not info["pending"] and info["idle"] > idle_ms:
+            r.xgroup_delconsumer(STREAM_KEY, GROUP, info["name"])
+
+    stats = outbox_stats()
+    if stats["lag_seconds"] > LAG_WARN:
+        print(f"⚠️ Scan outbox lagging: {stats}")
+    return [(entry_id, fields) for entry_id, fields in claimed if fields]
+
+
+def drain_once(consumer: str, block_ms: int = BLOCK_MS) -> dict:
+    """
+    Write one batch: this consumer's due retries first, then records claimed
+    from stopped consumers, then new records (blocking up to block_ms).
+    Raises when Supabase or Redis is unreachable; the batch stays pending.
+    """
+    global _group_ready
+    from utils.auth import supabase_admin
+
+    r = get_redis()
+    _ensure_group(r)
+    count = max(1, settings.SCAN_OUTBOX_BATCH_SIZE)
+    try:
+        entries = _due(r, _entries(r.xreadgroup(GROUP, consumer, {STREAM_KEY: "0"}, count=count)))
+        if not entries:
+            entries = _due(r, _claim(r, consumer, count))
+        if not entries:
+            entries = _entries(r.xreadgroup(GROUP, consumer, {STREAM_KEY: ">"}, count=count, block=block_ms))
+    except redis.ResponseError as e:
+        if "NOGROUP" in str(e):  # stream was deleted; recreate on the next call
+            _group_ready = False
+        raise
+
+    stats = {"read": len(entries), "saved": 0, "duplicate": 0, "failed": 0, "dead": 0}
+    if not entries:
+        return stats
+    if not supabase_admin:
+        raise RuntimeError("Supabase admin not available")
+
+    batch, done = [], []
+    for entry_id, fields in entries:
+        try:
+            batch.append((entry_id, fields, json.loads(fields["record"])))
+        except (KeyError, ValueError) as e:
+            stats["dead"] += _fail(r, entry_id, fields, f"unreadable record: {e}")
+            stats["failed"] += 1
+
+    results = write_records(supabase_admin, [record for _, _, record in batch]) if batch else []
+    for i, (entry_id, fields, _) in enumerate(batch):
+        result = results[i] if i < len(results) else {"status": "failed", "error": "no result returned"}
+        status = result.get("status")
+        if status in ("saved", "duplicate"):
+            stats[status] += 1
+            done.append(entry_id)
+        else:
+            stats["failed"] += 1
+            stats["dead"] += _fail(r, entry_id, fields, result.get("error"))
+    _finish(r, done)
+    return stats
+
+
+async def run_consumer(consumer: Optional[str] = None):
+    """Drain the outbox until stop_consumer() is called."""
+    global _running
+    _running = True
+    consumer = consumer or f"{socket.gethostname()}:{os.getpid()}"
+    print(f"📮 Scan outbox consumer started ({consumer})")
+    failures = 0
+    while _running:
+        try:
+            stats = await asyncio.to_thread(drain_once, consumer)
+            failures = 0
+            if stats["saved"] or stats["failed"]:
+                print(f"📮 Scan outbox: {stats['saved']} saved, {stats['duplicate']} duplicate, "
+                      f"{stats['failed']} failed")
+        except Exception as e:
+            failures += 1
+            delay = min(settings.SCAN_OUTBOX_RETRY_BASE_DELAY * (2 ** (failures - 1)), MAX_BACKOFF)
+            print(f"⚠️ Scan outbox: write failed ({e}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+    print("📮 Scan outbox consumer stopped")
+
+
+def stop_consumer():
+    global _running
+    _running = False
+
+
+def outbox_stats() -> dict:
+    """
+    Lag metric: records not in Supabase yet, how many of them a consumer
+    holds, age of the oldest one, and dead-lettered records.
+    """
+    r = get_redis()
+    length = r.xlen(STREAM_KEY)
+    oldest = r.xrange(STREAM_KEY, count=1) if length else []
+    lag = time.time() - int(oldest[0][0].split("-")[0]) / 1000 if oldest else 0.0
+    pending = 0
+    if length:
+        pending = next((g["pending"] for g in r.xinfo_groups(STREAM_KEY) if g["name"] == GROUP), 0)
+    return {
+        "length": length,
+        "pending": pending,
+        "lag_seconds": round(max(lag, 0.0), 1),
+        "dead": r.xlen(DEAD_KEY),
+    }
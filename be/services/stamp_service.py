@@ -21,6 +21,7 @@ import base64
 from datetime import datetime, timezone
 from typing import Optional
 
+import numpy as np
 import requests
 from PIL import Image, ImageDraw, ImageFont
 
@@ -228,36 +229,27 @@ def _make_transparent(img: Image.Image, threshold: int = 220, softness: int = 30
                    Larger = smoother edge; 0 = hard cut.
     """
     img = img.convert("RGBA")
-    r, g, b, a = img.split()
-
-    import struct
+    px = np.asarray(img)
+    rv = px[..., 0].astype(np.float64)
+    gv = px[..., 1].astype(np.float64)
+    bv = px[..., 2].astype(np.float64)
+    av = px[..., 3].astype(np.int64)
 
-    pixels_r = list(r.getdata())
-    pixels_g = list(g.getdata())
-    pixels_b = list(b.getdata())
-    pixels_a = list(a.getdata())
+    # Luminance (perceptual) — same float64 evaluation order as int(0.299*r + ...)
+    lum = (0.299 * rv + 0.587 * gv + 0.114 * bv).astype(np.int64)
 
-    new_a = []
     low = threshold - softness
-    for i, (rv, gv, bv, av) in enumerate(zip(pixels_r, pixels_g, pixels_b, pixels_a)):
-        # Luminance (perceptual)
-        lum = int(0.299 * rv + 0.587 * gv + 0.114 * bv)
-        if lum >= threshold:
-            new_a.append(0)
-        elif lum <= low:
-            new_a.append(av)  # Keep original alpha (fully opaque ink)
-        else:
-            # Linear gradient in the softness band
-            fade = int(av * (threshold - lum) / max(softness, 1))
-            new_a.append(fade)
-
-    r2 = r.copy()
-    g2 = g.copy()
-    b2 = b.copy()
-    a2 = a.copy()
-    a2.putdata(new_a)
-    result = Image.merge("RGBA", (r2, g2, b2, a2))
-    return result
+    # Linear gradient in the softness band
+    fade = (av * (threshold - lum) / max(softness, 1)).astype(np.int64)
+    new_a = np.select(
+        [lum >= threshold, lum <= low],
+        [0, av],  # fully transparent / keep original alpha (opaque ink)
+        default=fade,
+    ).astype(np.uint8)
+
+    out = px.copy()
+    out[..., 3] = new_a
+    return Image.fromarray(out)
 
 
 def _create_signature_block(
@@ -1,10 +1,9 @@
 import hashlib
 from typing import Any
-from openai import AsyncOpenAI
 
-from config.settings import settings
 from config.redis_client import RedisClient
 from services.scan_helpers import get_supabase_admin
+from services.llm_router import llm_router, llm_candidates
 
 async def answer_finance_question_with_context(user_id: str, question: str) -> str:
     """Answers a financial question using Otaru's persona, enriched with Supabase user context."""
@@ -126,18 +125,15 @@ async def answer_finance_question_with_context(user_id: str, question: str) -> s
         "'Apakah ada cicilan lain yang belum kamu laporkan ke sistem?'"
     )
 
-    # ── Sumopod Gemini Proxy via OpenAI client ──
-    api_key = settings.GEMINI_API_KEY or ""
-    if not api_key:
+    # ── Gemini proxy / Groq keys via the shared LLM router ──
+    candidates = llm_candidates()
+    if not candidates:
         return "Otaru sedang offline untuk konsultasi saat ini. Coba lagi sebentar."
 
-    base_url = getattr(settings, "GEMINI_BASE_URL", "https://ai.sumopod.com/v1")
-    model_name = getattr(settings, "GEMINI_MODEL", "gemini/gemini-2.5-flash")
-    client = AsyncOpenAI(api_key=api_key, base_url=base_url)
-
     try:
-        resp = await client.chat.completions.create(
-            model=model_name,
+        _, resp = await llm_router.complete(
+            candidates,
+            label="finance Q&A",
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": q},
@@ -182,15 +178,11 @@ async def answer_freeform_question(
             "Ringkas dulu ya, biar Otaru jawab cepat dan tepat."
         )
 
-    # ── Sumopod Gemini Proxy via OpenAI client ──
-    api_key = getattr(settings, "GEMINI_API_KEY", "") or ""
-    if not api_key:
+    # ── Gemini proxy / Groq keys via the shared LLM router ──
+    candidates = llm_candidates()
+    if not candidates:
         return "Otaru sedang offline untuk Q&A saat ini. Coba lagi sebentar lagi."
 
-    base_url = getattr(settings, "GEMINI_BASE_URL", "https://ai.sumopod.com/v1")
-    model_name = getattr(settings, "GEMINI_MODEL", "gemini/gemini-2.5-flash")
-    client = AsyncOpenAI(api_key=api_key, base_url=base_url)
-
     system_prompt = (
         "Kamu adalah Otaru, asisten Telegram OtaruChain. "
         "Karakter: to-the-point, praktis, profesional, tidak bertele-tele. "
@@ -200,8 +192,9 @@ async def answer_freeform_question(
     )
 
     try:
-        resp = await client.chat.completions.create(
-            model=model_name,
+        _, resp = await llm_router.complete(
+            candidates,
+            label="freeform Q&A",
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": q},
@@ -247,7 +247,7 @@ async def process_fraud_scan_from_telegram(*, user_id: str, recipient_name: str,
     confidence = structured.get("confidence", "low")
     fraud_status = confidence_to_status(confidence)
 
-    sync_to_supabase(
+    saved = sync_to_supabase(
         user_id=user_id,
         filename=filename,
         image_url=image_url,
@@ -260,9 +260,9 @@ async def process_fraud_scan_from_telegram(*, user_id: str, recipient_name: str,
     )
     print(f"âœ… [Telegram] sync_to_supabase completed for user={user_id}, file={filename}, status={fraud_status}")
 
-    # Ensure a fraud history row exists even if sync helper insert is skipped by DB constraints.
+    # Ensure a fraud history row exists when the sync helper could neither write nor queue it.
     sb = get_supabase_admin()
-    if sb:
+    if sb and not saved:
         try:
             existing = (
                 sb.table("fraud_scans")
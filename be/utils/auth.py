@@ -1,8 +1,11 @@
 """
 Authentication and authorization utilities
 """
+import time
 from datetime import datetime, timedelta
 from typing import Optional
+
+import requests
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -74,6 +77,153 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     
     return encoded_jwt
 
+# ── Local Supabase JWT verification ──────────────────────────────────────────
+# Verifying the access token locally (HS256 project secret or the project's
+# JWKS for asymmetric keys) saves a network call to Supabase Auth on every
+# request. The sub -> local user id mapping is cached briefly; the User row
+# itself (credits, is_active) is always read fresh.
+
+JWKS_TTL = 3600  # seconds
+# Asymmetric algorithms accepted from the JWKS, and the default per key type
+# for keys published without "alg"
+JWKS_ALGORITHMS = {"RS256", "ES256"}
+_KTY_ALGORITHMS = {"RSA": "RS256", "EC": "ES256"}
+_jwks_cache: dict = {"keys": [], "fetched_at": 0.0}
+
+# sub -> (expires_at, user_id)
+_user_cache: dict[str, tuple[float, str]] = {}
+USER_CACHE_MAX = 2048
+
+
+def _get_jwks(force: bool = False) -> list:
+    """Fetch (and cache) the Supabase project's JSON Web Key Set."""
+    now = time.time()
+    if not force and _jwks_cache["keys"] and now - _jwks_cache["fetched_at"] < JWKS_TTL:
+        return _jwks_cache["keys"]
+    if not settings.SUPABASE_URL:
+        return []
+    try:
+        resp = requests.get(f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json", timeout=5)
+        resp.raise_for_status()
+        _jwks_cache["keys"] = resp.json().get("keys", [])
+        _jwks_cache["fetched_at"] = now
+    except Exception as e:
+        print(f"⚠️ Supabase JWKS fetch failed: {e}")
+    return _jwks_cache["keys"]
+
+
+def verify_supabase_jwt(token: str) -> Optional[dict]:
+    """
+    Verify a Supabase access token without calling Supabase.
+    Returns the claims, raises JWTError for an invalid/expired token,
+    or returns None when no key is configured for the token's algorithm.
+    """
+    header = jwt.get_unverified_header(token)
+    alg = header.get("alg", "")
+
+    # The algorithm is pinned by the key, never taken from the token header
+    if alg == "HS256":
+        if not settings.SUPABASE_JWT_SECRET:
+            return None
+        key = settings.SUPABASE_JWT_SECRET
+        algorithms = ["HS256"]
+    else:
+        kid = header.get("kid")
+        keys = _get_jwks()
+        key = next((k for k in keys if k.get("kid") == kid), None)
+        if key is None and keys:
+            # Key rotation — refresh once
+            key = next((k for k in _get_jwks(force=True) if k.get("kid") == kid), None)
+        if key is None:
+            return None
+        key_alg = key.get("alg") or _KTY_ALGORITHMS.get(key.get("kty", ""))
+        if key_alg not in JWKS_ALGORITHMS or alg != key_alg:
+            raise JWTError(f"Token algorithm {alg!r} not allowed for key {kid!r}")
+        algorithms = [key_alg]
+
+    # Checks signature, exp and aud
+    claims = jwt.decode(token, key, algorithms=algorithms, audience="authenticated")
+    if not claims.get("sub"):
+        raise JWTError("Token has no subject")
+    return claims
+
+
+def _cached_user(db: Session, sub: str) -> Optional[User]:
+    entry = _user_cache.get(sub)
+    if not entry:
+        return None
+    expires_at, user_id = entry
+    if expires_at < time.time():
+        _user_cache.pop(sub, None)
+        return None
+    # Primary-key lookup: skips the email lookup, signup and daily bonus,
+    # but credits and is_active always come from the database
+    user = db.get(User, user_id)
+    if user is None:
+        _user_cache.pop(sub, None)
+    return user
+
+
+def _cache_user(sub: str, user: User) -> None:
+    if settings.AUTH_USER_CACHE_TTL <= 0:
+        return
+    if len(_user_cache) >= USER_CACHE_MAX:
+        now = time.time()
+        for key in [k for k, (exp, _) in _user_cache.items() if exp < now]:
+            _user_cache.pop(key, None)
+        if len(_user_cache) >= USER_CACHE_MAX:
+            _user_cache.clear()
+    _user_cache[sub] = (time.time() + settings.AUTH_USER_CACHE_TTL, str(user.id))
+
+
+def _resolve_supabase_user(db: Session, sub: str, email: str) -> User:
+    """Map a verified Supabase identity to the local User (cached per sub)."""
+    user = _cached_user(db, sub)
+    if user is not None:
+        return user
+
+    # Get or create user in local DB
+    user = db.query(User).filter(User.email == email).first()
+
+    if not user:
+        # Create user if doesn't exist — use Supabase auth UID as local ID
+        now = datetime.utcnow()
+        user = User(
+            id=sub,
+            email=email,
+            username=email.split('@')[0] if email else "user",
+            hashed_password="",  # No password for OAuth users
+            credits=10,  # Initial 10 credits for user (1 per scan)
+            is_active=True,
+            created_at=now,
+            updated_at=now,
+        )
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        # Also ensure Supabase profiles row exists with initial credits
+        try:
+            sb = supabase_admin or supabase
+            if sb:
+                sb.table("profiles").upsert(
+                    {"id": sub, "credits": 10, "user_email": email, "subscription_plan": "free"},
+                    on_conflict="id",
+                ).execute()
+        except Exception as profile_err:
+            print(f"⚠️ Could not init Supabase profile for {email}: {profile_err}")
+
+    # Best-effort daily credit bonus (+1/day, capped at 10) — once per cache miss
+    try:
+        sb = supabase_admin or supabase
+        if sb:
+            grant_daily_credit_bonus(sb, sub)
+    except Exception as bonus_err:
+        print(f"⚠️ Daily credit bonus skipped: {bonus_err}")
+
+    _cache_user(sub, user)
+    return user
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
@@ -97,50 +247,22 @@ async def get_current_user(
     if credentials:
         try:
             supabase_token = credentials.credentials
-            auth_client = supabase_admin if supabase_admin else supabase
-            user_response = auth_client.auth.get_user(supabase_token)
-            
-            if user_response and user_response.user:
-                # Get or create user in local DB
-                email = user_response.user.email or ""
-                user = db.query(User).filter(User.email == email).first()
-                
-                if not user:
-                    # Create user if doesn't exist — use Supabase auth UID as local ID
-                    now = datetime.utcnow()
-                    user = User(
-                        id=str(user_response.user.id),
-                        email=email,
-                        username=email.split('@')[0] if email else "user",
-                        hashed_password="",  # No password for OAuth users
-                        credits=10,  # Initial 10 credits for user (1 per scan)
-                        is_active=True,
-                        created_at=now,
-                        updated_at=now,
-                    )
-                    db.add(user)
-                    db.commit()
-                    db.refresh(user)
-                    # Also ensure Supabase profiles row exists with initial credits
-                    try:
-                        sb = supabase_admin or supabase
-                        if sb:
-                            sb.table("profiles").upsert(
-                                {"id": str(user_response.user.id), "credits": 10, "user_email": email, "subscription_plan": "free"},
-                                on_conflict="id",
-                            ).execute()
-                    except Exception as profile_err:
-                        print(f"⚠️ Could not init Supabase profile for {email}: {profile_err}")
-
-                # Best-effort daily credit bonus (+1/day, capped at 10)
-                try:
-                    sb = supabase_admin or supabase
-                    if sb:
-                        grant_daily_credit_bonus(sb, str(user_response.user.id))
-                except Exception as bonus_err:
-                    print(f"⚠️ Daily credit bonus skipped: {bonus_err}")
-                
-                return user
+            identity = None
+
+            claims = verify_supabase_jwt(supabase_token)
+            if claims is not None:
+                identity = (str(claims["sub"]), claims.get("email") or "")
+            else:
+                # No local key material configured — ask Supabase Auth
+                auth_client = supabase_admin if supabase_admin else supabase
+                user_response = auth_client.auth.get_user(supabase_token)
+                if user_response and user_response.user:
+                    identity = (str(user_response.user.id), user_response.user.email or "")
+
+            if identity:
+                return _resolve_supabase_user(db, *identity)
+        except JWTError:
+            pass  # Not a (valid) Supabase token — try app JWT below
         except Exception as e:
             print(f"⚠️ Supabase auth failed: {str(e)}")
             print(f"   Debug Info -> URL: {settings.SUPABASE_URL}, Key: {settings.SUPABASE_ANON_KEY[:5]}...")
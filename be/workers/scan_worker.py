@@ -1,6 +1,16 @@
 """
 Background worker that processes scan jobs from the Redis queue.
 Run with: python -m workers.scan_worker
+
+Up to SCAN_WORKER_CONCURRENCY jobs are in flight at once. OCR runs on the
+shared process pool (services.ocr_pool); Supabase writes go to threads and
+LLM calls are awaited, so one job's I/O overlaps with another job's OCR.
+Structured extraction for jobs that are in flight together is batched into
+one LLM request (services.extraction_batcher).
+
+Besides batch scans the queue carries OCR for single uploads from
+/api/scans/upload (kind "scan_ocr", services.scan_jobs), which update the
+local scans table through their own database sessions.
 """
 import asyncio
 import os
@@ -10,21 +20,41 @@ import re
 import signal
 import tempfile
 from datetime import date
+from typing import Optional
 
 # Add parent dir to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.queue_service import dequeue_scan, update_job_status
+from config.settings import settings
+from services.queue_service import (
+    dequeue_scan,
+    update_job_status,
+    ack_scan,
+    retry_scan,
+    reap_scan_queue,
+    extend_lease,
+    mark_job_step,
+    get_job_step,
+    unmark_job_step,
+)
 from services.ocr_service import OCRService
-from services.credit_service import grant_daily_credit_bonus
+from services.extraction_batcher import FieldExtractionBatcher
+from services.ocr_pool import warm_pool, shutdown_pool
+from services.ocr_cache import hash_bytes
+from services.credit_service import grant_daily_credit_bonus, deduct_credits
+from services.scan_jobs import process_upload_scan, fail_upload_scan
 
 # Supabase admin client
 from utils.auth import supabase_admin
 
 SCAN_COST = 1
+REAP_INTERVAL = 5  # seconds between lease/backoff sweeps
 
 running = True
 
+# Jobs in flight share structured-extraction LLM requests (SCAN_LLM_BATCH_SIZE)
+field_batcher = FieldExtractionBatcher()
+
 
 def handle_shutdown(signum, frame):
     global running
@@ -36,9 +66,95 @@ signal.signal(signal.SIGTERM, handle_shutdown)
 signal.signal(signal.SIGINT, handle_shutdown)
 
 
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _insert_row(table: str, row: dict):
+    return supabase_admin.table(table).insert(row).execute()
+
+
+def _find_row(table: str, column: str, value) -> Optional[dict]:
+    result = supabase_admin.table(table).select("*").eq(column, value).limit(1).execute()
+    return result.data[0] if result.data else None
+
+
+def _deduct_scan_cost(user_id: str) -> int:
+    new_credits = deduct_credits(supabase_admin, user_id, SCAN_COST, allow_partial=True)
+    return new_credits if new_credits is not None else 0
+
+
+def _charge_scan(job_id: str, user_id: str) -> int:
+    """Deduct the scan cost once per job, however often the job is retried."""
+    if not mark_job_step(job_id, "charged"):
+        profile = _find_row("profiles", "id", user_id)
+        return int(profile.get("credits") or 0) if profile else 0
+    try:
+        return _deduct_scan_cost(user_id)
+    except Exception:
+        unmark_job_step(job_id, "charged")
+        raise
+
+
+async def _renew_lease(job_id: str, token: str):
+    """Heartbeat: keep the job leased while it runs, however long OCR takes."""
+    interval = max(1.0, settings.SCAN_VISIBILITY_TIMEOUT / 3)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not await asyncio.to_thread(extend_lease, job_id, token):
+                print(f"⚠️ Job {job_id} lost its lease; another worker may pick it up")
+                return
+        except Exception as e:
+            print(f"⚠️ Lease renewal for job {job_id} failed: {e}")
+
+
+async def process_scan_ocr_job(job: dict):
+    """OCR for a file uploaded through /api/scans/upload; the result goes to its local Scan row."""
+    job_id = job["job_id"]
+    token = job.get("lease_token")
+    scan_id = job["scan_id"]
+
+    update_job_status(job_id, "processing")
+    print(f"Processing upload OCR job {job_id} for scan {scan_id} (attempt {job.get('attempts', 1)})")
+    try:
+        result = await process_upload_scan(scan_id, job["file_path"])
+        update_job_status(job_id, "done", result={
+            "scan_id": scan_id,
+            "confidence_score": result.get("confidence_score"),
+            "processing_time": result.get("processing_time"),
+        })
+        ack_scan(job_id, token)
+        print(f"Job {job_id} completed successfully")
+    except Exception as e:
+        print(f"Job {job_id} failed: {e}")
+        if not retry_scan(job_id, str(e), token):
+            await fail_upload_scan(scan_id, str(e))
+
+
 async def process_job(job: dict):
-    """Process a single scan job."""
+    """Process a single job, renewing its lease until it is done."""
+    token = job.get("lease_token")
+    heartbeat = asyncio.create_task(_renew_lease(job["job_id"], token)) if token else None
+    try:
+        if job.get("kind") == "scan_ocr":
+            return await process_scan_ocr_job(job)
+        return await process_scan_job(job)
+    finally:
+        if heartbeat:
+            heartbeat.cancel()
+
+
+async def process_scan_job(job: dict):
+    """
+    Process a batch scan job. Safe to run again for the same job: each
+    side effect (documents row, finance row, credit charge) is recorded as
+    a job step in Redis, so a retry after a crash or an expired lease
+    neither duplicates rows nor charges twice.
+    """
     job_id = job["job_id"]
+    token = job.get("lease_token")
     user_id = job["user_id"]
     file_path = job["file_path"]
     recipient_name = job["recipient_name"]
@@ -47,11 +163,20 @@ async def process_job(job: dict):
     file_name = job.get("file_name", "scan.jpg")
 
     update_job_status(job_id, "processing")
-    print(f"Processing job {job_id} for user {user_id}")
+    print(f"Processing job {job_id} for user {user_id} (attempt {job.get('attempts', 1)})")
 
+    will_retry = False
     try:
-        # 1. Run OCR + structured extraction
-        ocr_result = await OCRService.process_image(file_path, use_ai_enhancement=True)
+        # 1. Read the upload once; the same buffer is hashed (OCR cache /
+        #    doc_hash) and handed to Tesseract without further disk I/O
+        content = await asyncio.to_thread(_read_file, file_path)
+        doc_hash = hash_bytes(content)
+
+        # 2. Run OCR + structured extraction
+        ocr_result = await OCRService.process_image_bytes(
+            content, use_ai_enhancement=True, content_hash=doc_hash,
+            field_extractor=lambda text: field_batcher.extract(text, job_id),
+        )
         extracted = ocr_result.get("enhanced_text") or ocr_result.get("raw_text") or ""
         structured = ocr_result.get("structured_fields", {})
 
@@ -61,23 +186,24 @@ async def process_job(job: dict):
             import random
             nominal_amount = random.randint(500, 5000) * 1000
 
-        # 2. Save to Supabase documents table
-        with open(file_path, "rb") as f:
-            content = f.read()
-        doc_hash = hashlib.sha256(content).hexdigest()
-
-        doc_data = {
-            "user_id": user_id,
-            "file_name": file_name,
-            "file_url": image_url,
-            "doc_hash": doc_hash,
-            "status": "verified"
-        }
-        doc_result = supabase_admin.table("documents").insert(doc_data).execute()
-        doc_id = doc_result.data[0]['id'] if doc_result.data else None
-
-        if doc_id:
-            # 3. Save extracted finance data with structured fields
+        # 3. Save to Supabase documents table (reused when a previous
+        #    attempt of this job already wrote it)
+        doc_id = await asyncio.to_thread(get_job_step, job_id, "document")
+        if not doc_id:
+            doc_data = {
+                "user_id": user_id,
+                "file_name": file_name,
+                "file_url": image_url,
+                "doc_hash": doc_hash,
+                "status": "verified"
+            }
+            doc_result = await asyncio.to_thread(_insert_row, "documents", doc_data)
+            doc_id = doc_result.data[0]['id'] if doc_result.data else None
+            if doc_id:
+                await asyncio.to_thread(mark_job_step, job_id, "document", str(doc_id))
+
+        if doc_id and not await asyncio.to_thread(get_job_step, job_id, "finance"):
+            # 4. Save extracted finance data with structured fields
             data_hash = hashlib.sha256(
                 f"{recipient_name}_{date.today()}_{nominal_amount}_{signature_url}".encode()
             ).hexdigest()
@@ -94,27 +220,17 @@ async def process_job(job: dict):
                 "field_confidence": structured.get("confidence", "low"),
                 "data_hash": data_hash
             }
-            supabase_admin.table("extracted_finance_data").insert(finance_data).execute()
+            await asyncio.to_thread(_insert_row, "extracted_finance_data", finance_data)
+            await asyncio.to_thread(mark_job_step, job_id, "finance")
 
-        # 4. Apply daily +1 bonus (max 10), then deduct scan cost
+        # 5. Apply daily +1 bonus (max 10), then deduct scan cost
         try:
-            grant_daily_credit_bonus(supabase_admin, str(user_id))
+            await asyncio.to_thread(grant_daily_credit_bonus, supabase_admin, str(user_id))
         except Exception:
             pass
 
-        # 5. Deduct 1 credit from Supabase profiles
-        profile = (
-            supabase_admin.table("profiles")
-            .select("credits")
-            .eq("id", user_id)
-            .limit(1)
-            .execute()
-        )
-        profile_rows = getattr(profile, "data", None) or []
-        profile_data = profile_rows[0] if profile_rows and isinstance(profile_rows[0], dict) else {}
-        current_credits = int(profile_data.get("credits", 0) or 0)
-        new_credits = max(0, current_credits - SCAN_COST)
-        supabase_admin.table("profiles").update({"credits": new_credits}).eq("id", user_id).execute()
+        # 6. Deduct 1 credit from Supabase profiles (once per job)
+        new_credits = await asyncio.to_thread(_charge_scan, job_id, user_id)
 
         update_job_status(job_id, "done", result={
             "image_url": image_url,
@@ -126,31 +242,74 @@ async def process_job(job: dict):
             "confidence": structured.get("confidence", "low"),
             "credits_remaining": new_credits
         })
+        # Lost the lease meanwhile: the job is queued again, keep its file
+        will_retry = not ack_scan(job_id, token) and bool(token)
         print(f"Job {job_id} completed successfully")
 
     except Exception as e:
         print(f"Job {job_id} failed: {e}")
-        update_job_status(job_id, "failed", error=str(e))
+        will_retry = retry_scan(job_id, str(e), token)
     finally:
-        # Cleanup temp file
+        # Cleanup temp file (kept while a retry is pending)
+        if not will_retry:
+            try:
+                if os.path.exists(file_path):
+                    os.unlink(file_path)
+            except:
+                pass
+
+
+async def run_reaper():
+    """Periodically re-queue expired leases and due retries."""
+    while running:
         try:
-            if os.path.exists(file_path):
-                os.unlink(file_path)
-        except:
-            pass
+            result = await asyncio.to_thread(reap_scan_queue)
+            if result["expired"] or result["requeued"]:
+                print(f"Queue reaper: {result['expired']} expired, {result['requeued']} re-queued")
+        except Exception as e:
+            print(f"Queue reaper error: {e}")
+        await asyncio.sleep(REAP_INTERVAL)
 
 
 async def run_worker():
-    print("Scan worker started. Waiting for jobs...")
+    concurrency = max(1, settings.SCAN_WORKER_CONCURRENCY)
+    await asyncio.to_thread(warm_pool)
+    print(f"Scan worker started (concurrency={concurrency}). Waiting for jobs...")
+    if settings.OCR_COMBINED_EXTRACTION and settings.SCAN_LLM_BATCH_SIZE > 1:
+        print("⚠️ OCR_COMBINED_EXTRACTION is on: one LLM call per document, "
+              "SCAN_LLM_BATCH_SIZE batching is not used")
+
+    slots = asyncio.Semaphore(concurrency)
+    in_flight: set[asyncio.Task] = set()
+    reaper = asyncio.create_task(run_reaper())
+
+    def _on_done(task: asyncio.Task):
+        in_flight.discard(task)
+        slots.release()
+
     while running:
+        # Only pull a job when there is a free slot, so jobs stay in Redis
+        # (visible to other workers) instead of piling up in this process.
+        await slots.acquire()
         try:
-            job = dequeue_scan(timeout=5)
-            if job:
-                await process_job(job)
+            job = await asyncio.to_thread(dequeue_scan, 5)
         except Exception as e:
+            slots.release()
             print(f"Worker loop error: {e}")
             await asyncio.sleep(1)
+            continue
+        if not job:
+            slots.release()
+            continue
+        task = asyncio.create_task(process_job(job))
+        in_flight.add(task)
+        task.add_done_callback(_on_done)
 
+    if in_flight:
+        print(f"Waiting for {len(in_flight)} in-flight job(s)...")
+        await asyncio.gather(*in_flight, return_exceptions=True)
+    reaper.cancel()
+    shutdown_pool()
     print("Worker stopped.")
 
 
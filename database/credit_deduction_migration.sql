@@ -0,0 +1,93 @@
+-- ============================================================================
+-- OtaruChain — Atomic credit deduction
+-- Run this migration in your Supabase SQL Editor
+-- ============================================================================
+-- Replaces the read-then-write credit updates in the backend (2–3 round trips,
+-- lost updates under concurrent batch scans) with a single conditional
+-- UPDATE ... RETURNING. Called from Python via supabase.rpc(...).
+
+
+-- ============================================================================
+-- 1. profiles.credits (main credit balance)
+-- ============================================================================
+-- Returns the new balance, or NULL when the profile does not exist or has
+-- fewer than p_amount credits (nothing is deducted in that case).
+-- With p_allow_partial = TRUE the balance is clamped at 0 instead.
+
+CREATE OR REPLACE FUNCTION deduct_credits(
+    p_user_id UUID,
+    p_amount INTEGER DEFAULT 1,
+    p_allow_partial BOOLEAN DEFAULT FALSE
+)
+RETURNS INTEGER AS $$
+DECLARE
+    new_balance INTEGER;
+BEGIN
+    IF p_allow_partial THEN
+        UPDATE profiles
+           SET credits = GREATEST(COALESCE(credits, 0) - p_amount, 0)
+         WHERE id = p_user_id
+        RETURNING credits INTO new_balance;
+    ELSE
+        UPDATE profiles
+           SET credits = credits - p_amount
+         WHERE id = p_user_id
+           AND credits >= p_amount
+        RETURNING credits INTO new_balance;
+    END IF;
+
+    RETURN new_balance;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+
+-- ============================================================================
+-- 2. users.credits (legacy balance used by /api/dashboard/credits/deduct)
+-- ============================================================================
+
+-- users.id is UUID; p_user_id stays TEXT (local user ids arrive as strings)
+-- and is cast explicitly. Ids that are not UUIDs match no row (NULL).
+
+CREATE OR REPLACE FUNCTION deduct_user_credits(
+    p_user_id TEXT,
+    p_amount INTEGER DEFAULT 1,
+    p_allow_partial BOOLEAN DEFAULT FALSE
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_user_id UUID;
+    new_balance INTEGER;
+BEGIN
+    BEGIN
+        v_user_id := p_user_id::uuid;
+    EXCEPTION WHEN invalid_text_representation THEN
+        RETURN NULL;
+    END;
+
+    IF p_allow_partial THEN
+        UPDATE users
+           SET credits = GREATEST(COALESCE(credits, 0) - p_amount, 0)
+         WHERE id = v_user_id
+        RETURNING credits INTO new_balance;
+    ELSE
+        UPDATE users
+           SET credits = credits - p_amount
+         WHERE id = v_user_id
+           AND credits >= p_amount
+        RETURNING credits INTO new_balance;
+    END IF;
+
+    RETURN new_balance;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+
+-- ============================================================================
+-- 3. Permissions — backend (service_role) only
+-- ============================================================================
+-- SECURITY DEFINER bypasses RLS, so clients must not be able to call these.
+
+REVOKE ALL ON FUNCTION deduct_credits(UUID, INTEGER, BOOLEAN) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION deduct_user_credits(TEXT, INTEGER, BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION deduct_credits(UUID, INTEGER, BOOLEAN) TO service_role;
+GRANT EXECUTE ON FUNCTION deduct_user_credits(TEXT, INTEGER, BOOLEAN) TO service_role;
@@ -0,0 +1,97 @@
+-- ============================================================================
+-- OtaruChain — Batched, idempotent scan persistence for the scan outbox
+-- Run this migration in your Supabase SQL Editor
+-- (after scan_persistence_migration.sql)
+-- ============================================================================
+-- The backend appends scan records to a Redis Stream and a consumer writes
+-- them here in batches (services/scan_outbox.py). Delivery is at-least-once:
+-- a record can arrive again after a consumer crash or a timed-out call, so
+-- every record carries an idempotency key (scan kind, user, document hash)
+-- that is stored on its documents row and written only once.
+
+
+-- ============================================================================
+-- 1. documents.idempotency_key
+-- ============================================================================
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS documents_idempotency_key_uidx
+    ON documents (idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
+
+
+-- ============================================================================
+-- 2. save_scan_records_batch
+-- ============================================================================
+-- p_records  [{"idempotency_key", "document", "finance", "fraud"}, ...]
+-- Returns one result per record, in order:
+--   {"idempotency_key", "status": "saved", <save_scan_records result>}
+--   {"idempotency_key", "status": "duplicate", "document_id"}
+--   {"idempotency_key", "status": "failed", "error"}
+-- Each record is saved in its own subtransaction, so one bad record does not
+-- fail the batch.
+
+CREATE OR REPLACE FUNCTION save_scan_records_batch(
+    p_records JSONB,
+    p_seal_salt TEXT DEFAULT ''
+)
+RETURNS JSONB AS $$
+DECLARE
+    rec JSONB;
+    rec_key TEXT;
+    existing_id UUID;
+    saved JSONB;
+    results JSONB := '[]'::JSONB;
+BEGIN
+    FOR rec IN SELECT value FROM jsonb_array_elements(p_records) LOOP
+        rec_key := rec ->> 'idempotency_key';
+
+        SELECT id INTO existing_id FROM documents WHERE idempotency_key = rec_key;
+        IF existing_id IS NOT NULL THEN
+            results := results || jsonb_build_array(jsonb_build_object(
+                'idempotency_key', rec_key, 'status', 'duplicate', 'document_id', existing_id
+            ));
+            CONTINUE;
+        END IF;
+
+        BEGIN
+            saved := save_scan_records(
+                COALESCE(rec -> 'document', '{}'::JSONB) || jsonb_build_object('idempotency_key', rec_key),
+                COALESCE(rec -> 'finance', '{}'::JSONB),
+                NULLIF(rec -> 'fraud', 'null'::JSONB),
+                p_seal_salt
+            );
+            results := results || jsonb_build_array(
+                jsonb_build_object('idempotency_key', rec_key, 'status', 'saved') || saved
+            );
+        EXCEPTION
+            WHEN unique_violation THEN
+                -- Another consumer wrote the same record concurrently
+                SELECT id INTO existing_id FROM documents WHERE idempotency_key = rec_key;
+                IF existing_id IS NOT NULL THEN
+                    results := results || jsonb_build_array(jsonb_build_object(
+                        'idempotency_key', rec_key, 'status', 'duplicate', 'document_id', existing_id
+                    ));
+                ELSE
+                    results := results || jsonb_build_array(jsonb_build_object(
+                        'idempotency_key', rec_key, 'status', 'failed', 'error', SQLERRM
+                    ));
+                END IF;
+            WHEN OTHERS THEN
+                results := results || jsonb_build_array(jsonb_build_object(
+                    'idempotency_key', rec_key, 'status', 'failed', 'error', SQLERRM
+                ));
+        END;
+    END LOOP;
+    RETURN results;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+
+-- ============================================================================
+-- 3. Permissions — backend (service_role) only
+-- ============================================================================
+
+REVOKE ALL ON FUNCTION save_scan_records_batch(JSONB, TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION save_scan_records_batch(JSONB, TEXT) TO service_role;
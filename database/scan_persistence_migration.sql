@@ -0,0 +1,145 @@
+-- ============================================================================
+-- OtaruChain — Single-call scan persistence + integrity seal at insert time
+-- Run this migration in your Supabase SQL Editor
+-- ============================================================================
+-- sync_to_supabase used to insert documents, then extracted_finance_data,
+-- then fraud_scans, re-select the newest fraud_scans row to learn its id and
+-- created_at, and finally UPDATE it with the ledger seal — 5+ sequential
+-- round trips, and a crash in between left half-written scans or unsealed
+-- rows. save_scan_records does all of it in one transaction and one call.
+--
+-- Seal (must match services/ledger_service.py):
+--   SHA-256( user_id | scan_id | nominal_total | created_at | LEDGER_SECRET_SALT )
+-- computed from the values Postgres generated for the row. The salt stays in
+-- the backend environment and is passed per call; it is never stored.
+
+
+-- ============================================================================
+-- 1. fraud_scans columns written by the backend
+-- ============================================================================
+-- The backend used to retry without these when they were missing.
+
+ALTER TABLE fraud_scans ADD COLUMN IF NOT EXISTS integrity_hash TEXT;
+ALTER TABLE fraud_scans ADD COLUMN IF NOT EXISTS doc_type TEXT;
+ALTER TABLE fraud_scans ADD COLUMN IF NOT EXISTS nomor_dokumen TEXT;
+ALTER TABLE fraud_scans ADD COLUMN IF NOT EXISTS tanggal_terbit TEXT;
+ALTER TABLE fraud_scans ADD COLUMN IF NOT EXISTS nama_penjual TEXT;
+ALTER TABLE fraud_scans ADD COLUMN IF NOT EXISTS nominal_subtotal NUMERIC;
+ALTER TABLE fraud_scans ADD COLUMN IF NOT EXISTS nominal_ppn NUMERIC;
+ALTER TABLE fraud_scans ADD COLUMN IF NOT EXISTS metode_bayar TEXT;
+ALTER TABLE fraud_scans ADD COLUMN IF NOT EXISTS terminal_id TEXT;
+ALTER TABLE fraud_scans ADD COLUMN IF NOT EXISTS no_referensi TEXT;
+
+
+-- ============================================================================
+-- 2. Helpers
+-- ============================================================================
+-- Insert one row from a JSON object. Only keys that are columns of the table
+-- are written, so omitted keys keep their column defaults (id, created_at,
+-- ...). Returns the inserted row as JSON, formatted exactly like PostgREST
+-- returns it.
+
+CREATE OR REPLACE FUNCTION insert_jsonb_row(p_table REGCLASS, p_row JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    cols TEXT;
+    inserted JSONB;
+BEGIN
+    SELECT string_agg(quote_ident(a.attname), ', ' ORDER BY a.attnum)
+      INTO cols
+      FROM pg_attribute a
+     WHERE a.attrelid = p_table
+       AND a.attnum > 0
+       AND NOT a.attisdropped
+       AND a.attgenerated = ''
+       AND p_row ? a.attname;
+
+    IF cols IS NULL THEN
+        EXECUTE format('INSERT INTO %s AS t DEFAULT VALUES RETURNING to_jsonb(t)', p_table)
+           INTO inserted;
+    ELSE
+        EXECUTE format(
+            'INSERT INTO %1$s AS t (%2$s) SELECT %2$s FROM jsonb_populate_record(NULL::%1$s, $1) RETURNING to_jsonb(t)',
+            p_table, cols
+        ) USING p_row INTO inserted;
+    END IF;
+    RETURN inserted;
+END;
+$$ LANGUAGE plpgsql SET search_path = public;
+
+
+-- Python's str(float(x)) for the amounts we store: "150000.0", "1234.5".
+CREATE OR REPLACE FUNCTION ledger_nominal_text(p_value NUMERIC)
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN p_value IS NULL THEN '0.0'
+        WHEN p_value = trunc(p_value) AND abs(p_value) < 1e16 THEN trunc(p_value)::TEXT || '.0'
+        ELSE trim_scale(p_value)::TEXT
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+
+-- ============================================================================
+-- 3. save_scan_records
+-- ============================================================================
+-- p_document  documents row
+-- p_finance   extracted_finance_data row (document_id is filled in here)
+-- p_fraud     fraud_scans row, or NULL for non-fraud scans; sealed in place
+-- Returns {"document_id", "finance_id", "fraud_scan_id", "created_at",
+-- "integrity_hash"} (fraud keys are null without p_fraud). Any failure
+-- rolls back all three inserts.
+
+CREATE OR REPLACE FUNCTION save_scan_records(
+    p_document JSONB,
+    p_finance JSONB,
+    p_fraud JSONB DEFAULT NULL,
+    p_seal_salt TEXT DEFAULT ''
+)
+RETURNS JSONB AS $$
+DECLARE
+    doc JSONB;
+    finance JSONB;
+    fraud JSONB;
+    seal TEXT;
+BEGIN
+    doc := insert_jsonb_row('documents', p_document);
+    finance := insert_jsonb_row(
+        'extracted_finance_data',
+        p_finance || jsonb_build_object('document_id', doc -> 'id')
+    );
+
+    IF p_fraud IS NOT NULL THEN
+        fraud := insert_jsonb_row('fraud_scans', p_fraud);
+        seal := encode(sha256(convert_to(
+            COALESCE(fraud ->> 'user_id', 'None') || '|' ||
+            (fraud ->> 'id') || '|' ||
+            ledger_nominal_text((fraud ->> 'nominal_total')::NUMERIC) || '|' ||
+            COALESCE(fraud ->> 'created_at', 'None') || '|' ||
+            COALESCE(p_seal_salt, ''),
+            'UTF8'
+        )), 'hex');
+        UPDATE fraud_scans
+           SET integrity_hash = seal
+         WHERE id = (jsonb_populate_record(NULL::fraud_scans, fraud)).id;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'document_id', doc -> 'id',
+        'finance_id', finance -> 'id',
+        'fraud_scan_id', fraud -> 'id',
+        'created_at', fraud -> 'created_at',
+        'integrity_hash', seal
+    );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+
+-- ============================================================================
+-- 4. Permissions — backend (service_role) only
+-- ============================================================================
+-- SECURITY DEFINER bypasses RLS, so clients must not be able to call these.
+-- insert_jsonb_row is only called from inside save_scan_records.
+
+REVOKE ALL ON FUNCTION insert_jsonb_row(REGCLASS, JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION save_scan_records(JSONB, JSONB, JSONB, TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION save_scan_records(JSONB, JSONB, JSONB, TEXT) TO service_role;
@@ -75,7 +75,8 @@ export default function DgtnzTab({ onBack }: { onBack: () => void; initialMode?:
       if (!session) return;
 
       // Strategy 1: Load from /api/scans (tabel scans via SQLAlchemy)
-      const res = await fetch(`${API_BASE_URL}/api/scans`, {
+      const fields = "id,created_at,status,recipient_name,extracted_text,imagekit_url,file_path,signature_url,is_fraud_scan";
+      const res = await fetch(`${API_BASE_URL}/api/scans?fields=${fields}`, {
         headers: { "Authorization": `Bearer ${session.access_token}` },
       });
 